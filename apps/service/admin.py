@@ -3,8 +3,8 @@ from django.contrib import admin
 from django.db.models import Case, When
 from django.db.models.fields import IntegerField
 
-from .models import (Booking, Location, Service, ServiceCategory,
-                     ServiceSchedule, WeekdayChoices)
+from .models import (Booking, Location, OutboxMessage, Service,
+                     ServiceCategory, ServiceSchedule, WeekdayChoices)
 
 
 @admin.register(Location)
@@ -70,3 +70,10 @@ class BookingAdmin(admin.ModelAdmin):
     list_select_related = ['service', 'user']
     list_filter = 'date',
     search_fields = 'user__name', 'date', 'service__name'
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = 'id', 'kind', 'chat_id', 'status', 'attempts', 'available_at'
+    list_filter = 'status', 'kind'
+    search_fields = 'chat_id',
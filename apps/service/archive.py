@@ -0,0 +1,47 @@
+from django.db import connection, transaction
+from django.utils import timezone
+from service.models import ArchivedBooking, Booking
+
+ARCHIVED_COLUMNS = ", ".join(
+    field.column for field in ArchivedBooking._meta.concrete_fields if field.name != "archived_at"
+)
+
+# one batch: the oldest bookings before the cutoff are deleted and their rows inserted
+# into the archive by the same statement
+ARCHIVE_SQL = """
+WITH batch AS (
+    SELECT id, date FROM {booking_table}
+    WHERE date < %(cutoff)s AND NOT (status = %(pending)s AND date >= %(today)s)
+    ORDER BY date
+    LIMIT %(batch_size)s
+    FOR UPDATE SKIP LOCKED
+),
+moved AS (
+    DELETE FROM {booking_table} AS booking
+    USING batch
+    WHERE booking.id = batch.id AND booking.date = batch.date
+    RETURNING booking.*
+)
+INSERT INTO {archive_table} ({columns}, archived_at)
+SELECT {columns}, %(now)s FROM moved
+""".format(booking_table=Booking._meta.db_table, archive_table=ArchivedBooking._meta.db_table,
+           columns=ARCHIVED_COLUMNS)
+
+
+def archive_bookings(cutoff, batch_size: int):
+    """
+    Move bookings dated before ``cutoff`` to the archive, ``batch_size`` rows per transaction.
+
+    Yields the number of bookings moved by every batch. Slot occupancy is left alone,
+    so pending bookings from today on are never archived, whatever the cutoff.
+    """
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(ARCHIVE_SQL, {"cutoff": cutoff, "batch_size": batch_size, "now": timezone.now(),
+                                         "pending": Booking.StatusType.PENDING, "today": timezone.localdate()})
+            moved = cursor.rowcount
+        if not moved:
+            return
+        yield moved
+        if moved < batch_size:
+            return
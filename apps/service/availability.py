@@ -0,0 +1,282 @@
+import heapq
+from collections import defaultdict
+from datetime import date, time, timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from django.utils import timezone
+from service.cache import availability_cache
+from service.models import (Booking, ServiceSchedule, SlotOccupancy,
+                            WeekdayChoices)
+
+MINUTES_IN_DAY = 24 * 60
+CACHE_WINDOW_DAYS = 31
+
+
+def to_minutes(value: time) -> int:
+    return value.hour * 60 + value.minute
+
+
+def format_minutes(value: int) -> str:
+    value %= MINUTES_IN_DAY
+    return f"{value // 60:02d}:{value % 60:02d}"
+
+
+def build_slots(start_time: time, end_time: time, duration) -> list[tuple[int, int]]:
+    step = int(duration.total_seconds() // 60)
+    start, end = to_minutes(start_time), to_minutes(end_time)
+    return [(slot_start, slot_start + step) for slot_start in range(start, end - step + 1, step)]
+
+
+def booking_interval(start_time: time, end_time: time) -> tuple[int, int]:
+    start, end = to_minutes(start_time), to_minutes(end_time)
+    if end <= start:
+        # booking runs past midnight
+        end += MINUTES_IN_DAY
+    return start, end
+
+
+def free_slots(slots: list[tuple[int, int]], taken: list[int], capacity: int) -> list[dict]:
+    result = []
+    for (slot_start, slot_end), seats in zip(slots, taken):
+        available_capacity = capacity - seats
+        if available_capacity > 0:
+            result.append({
+                "time": f"{format_minutes(slot_start)} - {format_minutes(slot_end)}",
+                "available_capacity": available_capacity
+            })
+    return result
+
+
+def weekday_of(day: date) -> str:
+    return WeekdayChoices.values[day.weekday()]
+
+
+def schedule_free_slots(service, schedule, occupied: dict) -> list[dict]:
+    slots = build_slots(schedule.start_time, schedule.end_time, service.duration)
+    taken = [occupied.get(slot_start, 0) for slot_start, _ in slots]
+    return free_slots(slots, taken, service.capacity)
+
+
+def day_availability(service, schedule, day: date, occupied: dict) -> dict:
+    return {
+        "date": day.isoformat(),
+        "weekday": schedule.weekday,
+        "start_time": schedule.start_time.strftime("%H:%M"),
+        "end_time": schedule.end_time.strftime("%H:%M"),
+        "free_time": schedule_free_slots(service, schedule, occupied)
+    }
+
+
+def compute_availability(service, schedules: dict, date_from: date, date_to: date):
+    """
+    Yield ``(date, availability)`` for every day between ``date_from`` and ``date_to``,
+    availability is ``None`` on closed days.
+
+    Occupied seats for the whole range come from a single range scan of the slot
+    occupancy table ordered by date and are consumed lazily, so long ranges never
+    sit in memory at once.
+    """
+    rows = SlotOccupancy.objects.filter(
+        service=service,
+        date__range=(date_from, date_to),
+        seats__gt=0
+    ).order_by("date").values_list("date", "slot_start", "seats").iterator(chunk_size=500)
+    grouped = groupby(rows, key=itemgetter(0))
+    occupied_day, day_rows = next(grouped, (None, ()))
+
+    day = date_from
+    while day <= date_to:
+        occupied = {}
+        while occupied_day is not None and occupied_day <= day:
+            if occupied_day == day:
+                occupied = {to_minutes(slot_start): seats for _, slot_start, seats in day_rows}
+            occupied_day, day_rows = next(grouped, (None, ()))
+
+        schedule = schedules.get(weekday_of(day))
+        if schedule:
+            yield day, day_availability(service, schedule, day, occupied)
+        else:
+            yield day, None
+        day += timedelta(days=1)
+
+
+def iter_availability(service, date_from: date, date_to: date):
+    """
+    Yield the availability of every open day between ``date_from`` and ``date_to``.
+
+    Days are read from the cache a window at a time; misses are computed from one
+    lazily consumed occupancy query shared by all windows and written back.
+    """
+    schedules = {schedule.weekday: schedule for schedule in service.schedules.all()}
+    if not schedules:
+        return
+
+    computed = None
+    window_start = date_from
+    while window_start <= date_to:
+        window_end = min(window_start + timedelta(days=CACHE_WINDOW_DAYS - 1), date_to)
+        days = [window_start + timedelta(days=offset) for offset in range((window_end - window_start).days + 1)]
+        cached = {day: value for (_, day), value in availability_cache.get_many(
+            [(service.pk, day) for day in days]
+        ).items()}
+
+        missing = [day for day in days if day not in cached]
+        if missing:
+            if computed is None:
+                computed = compute_availability(service, schedules, missing[0], date_to)
+            fresh = {}
+            for day, value in computed:
+                fresh[day] = value
+                if day == missing[-1]:
+                    break
+            availability_cache.set_many({(service.pk, day): fresh[day] for day in missing})
+            cached.update(fresh)
+
+        for day in days:
+            if cached[day] is not None:
+                yield cached[day]
+        window_start = window_end + timedelta(days=1)
+
+
+def weekly_availability(service) -> list[dict]:
+    """
+    Free slots of every open weekday, each on the date ``POST /bookings/`` would book it.
+
+    ``Booking.next_date`` moves a slot of today that already started to the same weekday
+    next week, so today's weekday mixes slots of today and of a week later.
+    """
+    today = timezone.localdate()
+    days = {
+        date.fromisoformat(day["date"]): {slot["time"]: slot for slot in day["free_time"]}
+        for day in iter_availability(service, today, today + timedelta(days=7))
+    }
+    result = []
+    for schedule in service.schedules.all():
+        free_time = []
+        for slot_start, slot_end in build_slots(schedule.start_time, schedule.end_time, service.duration):
+            day = Booking.next_date(schedule.weekday, time(slot_start // 60, slot_start % 60))
+            slot = days.get(day, {}).get(f"{format_minutes(slot_start)} - {format_minutes(slot_end)}")
+            if slot:
+                free_time.append({**slot, "date": day.isoformat()})
+        result.append({
+            "date": Booking.next_date(schedule.weekday, None).isoformat(),
+            "weekday": schedule.weekday,
+            "start_time": schedule.start_time.strftime("%H:%M"),
+            "end_time": schedule.end_time.strftime("%H:%M"),
+            "free_time": free_time
+        })
+    return result
+
+
+def batch_availability(service_ids, day: date) -> list[dict]:
+    cached = {service_id: value for (service_id, _), value in availability_cache.get_many(
+        [(service_id, day) for service_id in service_ids]
+    ).items()}
+
+    missing = [service_id for service_id in service_ids if service_id not in cached]
+    if missing:
+        schedules = ServiceSchedule.objects.filter(
+            service_id__in=missing,
+            service__is_deleted=False,
+            weekday=weekday_of(day)
+        ).select_related("service")
+        occupied = {service_id: {} for service_id in missing}
+        rows = SlotOccupancy.objects.filter(
+            service_id__in=missing,
+            date=day,
+            seats__gt=0
+        ).values_list("service_id", "slot_start", "seats")
+        for service_id, slot_start, seats in rows:
+            occupied[service_id][to_minutes(slot_start)] = seats
+
+        fresh = dict.fromkeys(missing)
+        for schedule in schedules:
+            fresh[schedule.service_id] = day_availability(schedule.service, schedule, day,
+                                                          occupied[schedule.service_id])
+        availability_cache.set_many({(service_id, day): value for service_id, value in fresh.items()})
+        cached.update(fresh)
+
+    result = []
+    for service_id in service_ids:
+        slots = cached[service_id]["free_time"] if cached[service_id] else []
+        result.append({
+            "service": service_id,
+            "next_free": slots[0]["time"] if slots else None,
+            "free_time": slots
+        })
+    return result
+
+
+def first_free_slot(service, schedule, occupied: dict, after: int = None):
+    for slot_start, slot_end in build_slots(schedule.start_time, schedule.end_time, service.duration):
+        if after is not None and slot_start < after:
+            continue
+        available_capacity = service.capacity - occupied.get(slot_start, 0)
+        if available_capacity > 0:
+            return slot_start, slot_end, available_capacity
+    return None
+
+
+def next_available(services, day_from: date, days: int, limit: int, after: int = None) -> list[dict]:
+    """
+    Services ordered by their earliest free slot within ``days`` days from ``day_from``.
+
+    Every service sits in a heap keyed by a lower bound of its next free slot (the
+    start of its next open day). Only the service on top gets its day resolved, so
+    the search stops as soon as ``limit`` services are found instead of computing
+    every service's availability. ``after`` skips slots starting before that minute
+    on ``day_from``.
+    """
+    services = list(services)
+    day_to = day_from + timedelta(days=days - 1)
+    schedules = [{schedule.weekday: schedule for schedule in service.schedules.all()} for service in services]
+
+    occupied = defaultdict(dict)
+    rows = SlotOccupancy.objects.filter(
+        service__in=services,
+        date__range=(day_from, day_to),
+        seats__gt=0
+    ).values_list("service_id", "date", "slot_start", "seats")
+    for service_id, day, slot_start, seats in rows:
+        occupied[service_id, day][to_minutes(slot_start)] = seats
+
+    heap = []
+
+    def push_open_day(position, day):
+        while day <= day_to:
+            schedule = schedules[position].get(weekday_of(day))
+            if schedule:
+                heapq.heappush(heap, (day, to_minutes(schedule.start_time), position, None))
+                return
+            day += timedelta(days=1)
+
+    for position in range(len(services)):
+        push_open_day(position, day_from)
+
+    result = []
+    while heap and len(result) < limit:
+        day, slot_start, position, slot = heapq.heappop(heap)
+        service = services[position]
+        if slot is not None:
+            slot_end, available_capacity = slot
+            result.append({
+                "service": service,
+                "date": day.isoformat(),
+                "time": f"{format_minutes(slot_start)} - {format_minutes(slot_end)}",
+                "available_capacity": available_capacity
+            })
+            continue
+
+        free = first_free_slot(
+            service,
+            schedules[position][weekday_of(day)],
+            occupied.get((service.pk, day), {}),
+            after=after if day == day_from else None
+        )
+        if free:
+            free_start, free_end, available_capacity = free
+            heapq.heappush(heap, (day, free_start, position, (free_end, available_capacity)))
+        else:
+            push_open_day(position, day + timedelta(days=1))
+    return result
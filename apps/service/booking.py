@@ -0,0 +1,295 @@
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from functools import partial
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from service.availability import booking_interval, to_minutes, weekday_of
+from service.cache import availability_cache
+from service.holds import slot_holds
+from service.models import (Booking, Service, ServiceSchedule, SlotOccupancy,
+                            WaitlistEntry)
+from service.occupancy import (LOCK_KEY_MASK, lock_service_day,
+                               lock_service_days, minutes_to_time,
+                               release_booking)
+from service.outbox import (BOOKING_CREATED_SQL, booking_created_params,
+                            enqueue_booking_created, enqueue_waitlist_promoted)
+from service.seatmap import SeatMap, load_seat_map
+
+BOOK_SQL = """
+WITH lock AS (
+    SELECT pg_advisory_xact_lock(%(lock_key)s, %(lock_day)s)
+),
+opening AS (
+    SELECT service.capacity, service.duration AS step,
+           %(day)s::date + schedule.start_time AS opens_at,
+           %(day)s::date + schedule.end_time AS closes_at,
+           %(day)s::date + %(start_time)s::time AS starts_at,
+           %(day)s::date + %(start_time)s::time + %(duration)s::interval AS ends_at
+    FROM lock, {service_table} AS service
+    JOIN {schedule_table} AS schedule ON schedule.service_id = service.id AND schedule.weekday = %(weekday)s
+    WHERE service.id = %(service_id)s AND NOT service.is_deleted
+),
+slots AS (
+    SELECT slot_start
+    FROM opening, generate_series(opening.opens_at, opening.closes_at - opening.step, opening.step) AS slot_start
+    WHERE opening.starts_at >= opening.opens_at AND opening.ends_at <= opening.closes_at
+      AND slot_start < opening.ends_at AND slot_start + opening.step > opening.starts_at
+),
+taken AS (
+    INSERT INTO {occupancy_table} AS occupancy (id, service_id, date, slot_start, seats)
+    SELECT gen_random_uuid(), %(service_id)s, %(day)s, slots.slot_start::time, %(seats)s
+    FROM slots, opening
+    WHERE %(seats)s <= opening.capacity
+    ON CONFLICT (service_id, date, slot_start) DO UPDATE SET seats = occupancy.seats + EXCLUDED.seats
+    WHERE occupancy.seats + EXCLUDED.seats <= (SELECT capacity FROM opening)
+    RETURNING occupancy.slot_start, occupancy.seats
+),
+booking AS (
+    INSERT INTO {booking_table} (id, created_at, updated_at, service_id, user_id, weekday, date, start_time,
+                                 duration, end_time, seats, status, period)
+    SELECT gen_random_uuid(), %(now)s, %(now)s, %(service_id)s, %(user_id)s, %(weekday)s, %(day)s,
+           %(start_time)s, %(duration)s, opening.ends_at::time, %(seats)s, %(status)s,
+           tstzrange(opening.starts_at AT TIME ZONE %(tz)s, opening.ends_at AT TIME ZONE %(tz)s)
+    FROM opening
+    WHERE (SELECT count(*) FROM taken) = (SELECT count(*) FROM slots)
+    RETURNING *
+),
+notified AS (
+    {notify_provider}
+)
+SELECT EXISTS (SELECT 1 FROM slots) AS is_open,
+       ARRAY(SELECT ARRAY[EXTRACT(EPOCH FROM taken.slot_start)::int / 60, taken.seats] FROM taken) AS taken,
+       booking.*
+FROM (SELECT 1) AS one
+LEFT JOIN booking ON true
+""".format(service_table=Service._meta.db_table, schedule_table=ServiceSchedule._meta.db_table,
+           occupancy_table=SlotOccupancy._meta.db_table, booking_table=Booking._meta.db_table,
+           notify_provider=BOOKING_CREATED_SQL.format(bookings="booking").strip())
+
+
+def create_booking(*, service, user, weekday, start_time, duration, seats=1, day=None, hold_id=None) -> Booking:
+    """
+    Book ``seats`` of a service, shared by the API and the bot.
+
+    Locking, the schedule window and capacity checks, the ledger update, the insert
+    and the provider's outbox message all happen in ``BOOK_SQL``, a single round trip
+    to the database. Seats held in Redis are checked right after, still under the day
+    lock, so a booking never takes held seats; ``hold_id`` is the hold being confirmed.
+    Raises ``ValidationError`` when the service is closed or one of the booked slots is out of seats.
+    """
+    day = day or Booking.next_date(weekday, start_time)
+    start_time = start_time.replace(second=0, microsecond=0)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(BOOK_SQL, {
+                "lock_key": service.pk.int & LOCK_KEY_MASK,
+                "lock_day": day.toordinal(),
+                "service_id": service.pk,
+                "user_id": user.pk,
+                "weekday": weekday_of(day),
+                "day": day,
+                "start_time": start_time,
+                "duration": duration,
+                "seats": seats,
+                "status": Booking.StatusType.PENDING,
+                **booking_created_params(),
+                "tz": settings.TIME_ZONE,
+            })
+            is_open, taken, *row = cursor.fetchone()
+            row = dict(zip((column.name for column in cursor.description[2:]), row))
+
+        if not is_open:
+            raise ValidationError("Service is closed at that time", code="closed")
+        if row["id"] is None:
+            # seats taken in the slots that still fitted are rolled back with the transaction
+            raise ValidationError("Not enough capacity for this time slot", code="capacity")
+        held = slot_holds.held(service.pk, day, exclude=hold_id)
+        if any(taken_seats + held.get(slot_start, 0) > service.capacity for slot_start, taken_seats in taken):
+            raise ValidationError("Not enough capacity for this time slot", code="capacity")
+        transaction.on_commit(partial(availability_cache.invalidate, service.pk, day))
+
+    fields = [field.attname for field in Booking._meta.concrete_fields]
+    booking = Booking.from_db(connection.alias, fields, [row[field] for field in fields])
+    booking.service, booking.user = service, user
+    return booking
+
+
+def hold_seats(*, service, user, day, start_time, duration, seats) -> dict | None:
+    """
+    Hold ``seats`` for a booking that isn't confirmed yet, ``None`` when they are taken.
+
+    The hold is taken under the day lock against occupancy read from the database, so
+    a concurrent booking is either counted here or sees the hold in its own check.
+    """
+    start = to_minutes(start_time)
+    end = start + int(duration.total_seconds() // 60)
+    with transaction.atomic():
+        lock_service_day(service.pk, day)
+        seat_map = load_seat_map(service.pk, day)
+        if not seat_map.is_open(start, end):
+            raise ValidationError("Service is closed at that time")
+        return slot_holds.hold(service_id=service.pk, day=day, start_time=start_time, duration=duration,
+                               seats=seats, user_id=user.pk, free=seat_map.slot_seats(start, end))
+
+
+def confirm_hold(hold_id, user) -> Booking | None:
+    """
+    Book a hold of ``user``, ``None`` when it doesn't exist or expired.
+
+    The hold is claimed first so a retried confirm can't book it twice. Its seats stay
+    held until the booking commits, and a refused booking puts the hold back.
+    """
+    hold = slot_holds.claim(hold_id, user.pk)
+    if hold is None:
+        return None
+    day = date.fromisoformat(hold["date"])
+    try:
+        service = Service.objects.get(pk=hold["service"])
+        booking = create_booking(service=service, user=user, weekday=weekday_of(day),
+                                 start_time=time.fromisoformat(hold["start_time"]),
+                                 duration=timedelta(seconds=hold["duration"]), seats=hold["seats"], day=day,
+                                 hold_id=hold["id"])
+    except Exception:
+        slot_holds.restore(hold)
+        raise
+    transaction.on_commit(partial(slot_holds.release, hold))
+    return booking
+
+
+def create_recurring_bookings(*, service, user, start_time, duration, seats, days) -> list[dict]:
+    """
+    Book the same time on every one of ``days`` in one transaction.
+
+    Schedules and occupancy of all dates are read with one query each, the bookable
+    occurrences are inserted with ``bulk_create`` and their seats taken from the slot
+    ledger with one update per distinct set of slots. Returns one result per date with
+    either the booking or the reason it was refused.
+    """
+    start_time = start_time.replace(second=0, microsecond=0)
+    end_time = (datetime.combine(datetime.min, start_time) + duration).time()
+    start, end = booking_interval(start_time, end_time)
+
+    with transaction.atomic():
+        lock_service_days(service.pk, days)
+        schedules = {
+            schedule.weekday: schedule
+            for schedule in ServiceSchedule.objects.filter(service=service, weekday__in={weekday_of(d) for d in days})
+        }
+        occupied = defaultdict(dict)
+        for day, slot_start, taken in SlotOccupancy.objects.filter(
+                service=service, date__in=days, seats__gt=0
+        ).values_list("date", "slot_start", "seats"):
+            occupied[day][to_minutes(slot_start)] = taken
+
+        results, bookings, ledger = [], [], defaultdict(list)
+        for day in days:
+            schedule = schedules.get(weekday_of(day))
+            seat_map = SeatMap.build(service, schedule, occupied[day]) if schedule else SeatMap(0, 0, [])
+            seat_map = seat_map.without(slot_holds.held(service.pk, day))
+            if not seat_map.is_open(start, end):
+                results.append({"date": day, "booking": None, "error": "Service is closed at that time"})
+                continue
+            if not seat_map.fits(start, end, seats):
+                results.append({"date": day, "booking": None, "error": "Not enough capacity for this time slot"})
+                continue
+
+            # ids are set here, bulk_create doesn't read database defaults back
+            booking = Booking(id=uuid4(), service=service, user=user, weekday=weekday_of(day), date=day,
+                              start_time=start_time, duration=duration, end_time=end_time, seats=seats,
+                              period=Booking.make_period(day, start_time, duration))
+            bookings.append(booking)
+            results.append({"date": day, "booking": booking, "error": None})
+            slots = seat_map.slot_range(start, end)
+            ledger[tuple(seat_map.start + index * seat_map.step for index in slots)].append(day)
+
+        Booking.objects.bulk_create(bookings)
+        _take_seats(service, ledger, seats)
+        if bookings:
+            enqueue_booking_created([booking.pk for booking in bookings])
+        transaction.on_commit(partial(availability_cache.invalidate, service.pk, *(b.date for b in bookings)))
+
+    return results
+
+
+def _take_seats(service, ledger: dict, seats: int):
+    for slot_starts, days in ledger.items():
+        slot_times = [minutes_to_time(slot_start) for slot_start in slot_starts]
+        SlotOccupancy.objects.bulk_create(
+            [SlotOccupancy(service=service, date=day, slot_start=slot_time)
+             for day in days for slot_time in slot_times],
+            ignore_conflicts=True
+        )
+        updated = SlotOccupancy.objects.filter(
+            service=service, date__in=days, slot_start__in=slot_times, seats__lte=service.capacity - seats
+        ).update(seats=F("seats") + seats)
+        if updated != len(days) * len(slot_times):
+            raise ValidationError("Not enough capacity for this time slot")
+
+
+def cancel_booking(booking) -> Booking:
+    """
+    Cancel a pending booking that hasn't started yet and give its seats back.
+
+    Only the status is written, with a queryset update that skips ``Booking.clean()``:
+    a booking made before the service's duration or capacity changed stays cancellable.
+    Waiters of the freed slots are promoted once the cancellation is committed, in
+    transactions of their own, so cancellations never wait on each other's promotions.
+    """
+    with transaction.atomic():
+        booking = Booking.objects.select_for_update(of=("self",)).select_related("service").get(pk=booking.pk)
+        if booking.status != Booking.StatusType.PENDING:
+            raise ValidationError("Only pending bookings can be cancelled")
+        if booking.period and booking.period.lower <= timezone.now():
+            raise ValidationError("Booking has already started")
+
+        release_booking(booking)
+        booking.status, booking.updated_at = Booking.StatusType.CANCELLED, timezone.now()
+        Booking.objects.filter(pk=booking.pk).update(status=booking.status, updated_at=booking.updated_at)
+        transaction.on_commit(partial(availability_cache.invalidate, booking.service_id, booking.date))
+        # the cancellation is committed by then, a failed promotion is logged instead of failing it
+        transaction.on_commit(lambda: promote_waiters(booking.service_id, booking.date, booking.start_time,
+                                                      booking.end_time), robust=True)
+    return booking
+
+
+def promote_waiters(service_id, day, start_time, end_time) -> list[Booking]:
+    """
+    Book waiters of ``[start_time, end_time)`` in order of arrival while seats allow.
+
+    Each promotion locks the earliest waiting entry with ``SKIP LOCKED``, read through
+    the partial waitlist index, and books it in the same transaction. Stops at the first
+    waiter that doesn't fit so nobody jumps the queue; a waiter whose time is no longer
+    open, after a schedule change, is cancelled and skipped.
+    """
+    promoted = []
+    while True:
+        with transaction.atomic():
+            entry = WaitlistEntry.objects.select_for_update(skip_locked=True, of=("self",)).select_related(
+                "service", "user"
+            ).filter(
+                service_id=service_id, date=day, status=WaitlistEntry.StatusType.WAITING,
+                start_time__lt=end_time, end_time__gt=start_time
+            ).order_by("created_at").first()
+            if entry is None:
+                return promoted
+            try:
+                with transaction.atomic():
+                    booking = create_booking(service=entry.service, user=entry.user, weekday=weekday_of(day),
+                                             start_time=entry.start_time, duration=entry.duration,
+                                             seats=entry.seats, day=day)
+            except ValidationError as e:
+                if e.code != "closed":
+                    return promoted
+                entry.status = WaitlistEntry.StatusType.CANCELLED
+                entry.save(update_fields=["status", "updated_at"])
+                continue
+
+            entry.status, entry.booking = WaitlistEntry.StatusType.PROMOTED, booking
+            entry.save(update_fields=["status", "booking", "updated_at"])
+            enqueue_waitlist_promoted(entry)
+        promoted.append(booking)
@@ -0,0 +1,164 @@
+import logging
+
+import orjson
+from django.conf import settings
+from django.utils.functional import cached_property
+from redis import Redis, RedisError
+
+logger = logging.getLogger(__name__)
+
+# KEYS are (generation key, value key) pairs, ARGV the expiry and then one value per pair
+SET_SCRIPT = """
+for index = 1, #KEYS, 2 do
+    local generation = redis.call('GET', KEYS[index]) or '0'
+    redis.call('SET', KEYS[index + 1], generation .. ':' .. ARGV[(index + 1) / 2 + 1], 'EX', ARGV[1])
+end
+"""
+
+
+class AvailabilityCache:
+    """
+    Computed availability of a service for one date, stored in Redis.
+
+    A cached value is either the day's availability or ``None`` for a closed day.
+    Every value is stamped with the generation of its service when written and read
+    together with it, so ``invalidate_service`` only bumps the generation.
+    Redis failures are logged and treated as misses so reads keep working.
+    """
+    HITS_KEY = "availability:stats:hits"
+    MISSES_KEY = "availability:stats:misses"
+
+    def __init__(self, expire: int = None):
+        self.expire = expire or settings.AVAILABILITY_CACHE_TTL
+
+    @cached_property
+    def redis_client(self) -> Redis:
+        # connected on first use, importing the module must not need Redis settings
+        return Redis.from_url(settings.REDIS_URL, decode_responses=False)
+
+    @cached_property
+    def set_script(self):
+        return self.redis_client.register_script(SET_SCRIPT)
+
+    def _generation_key(self, service_id) -> str:
+        return f"availability:{service_id}:generation"
+
+    def _get(self, keys: list[tuple]) -> list[bytes | None]:
+        """Values of the given ``(service_id, key)`` pairs, ``None`` for misses and stale generations."""
+        service_ids = list(dict.fromkeys(service_id for service_id, _ in keys))
+        values = self.redis_client.mget(
+            [key for _, key in keys] + [self._generation_key(service_id) for service_id in service_ids]
+        )
+        generations = dict(zip(service_ids, values[len(keys):]))
+        fresh = []
+        for (service_id, _), value in zip(keys, values):
+            generation, _, data = (value or b"").partition(b":")
+            fresh.append(data if value is not None and generation == (generations[service_id] or b"0") else None)
+        return fresh
+
+    def _set(self, values: list[tuple], expire: int):
+        """Store ``(service_id, key, data)`` triples stamped with the current generation of their service."""
+        keys = [key for service_id, value_key, _ in values for key in (self._generation_key(service_id), value_key)]
+        self.set_script(keys=keys, args=[expire, *(data for _, _, data in values)])
+
+    def _key(self, service_id, day) -> str:
+        return f"availability:{service_id}:{day.isoformat()}"
+
+    def _seat_map_key(self, service_id, day) -> str:
+        return f"{self._key(service_id, day)}:seats"
+
+    def get_many(self, pairs) -> dict:
+        """Cached values of the given ``(service_id, day)`` pairs, misses are left out."""
+        keys = [(service_id, self._key(service_id, day)) for service_id, day in pairs]
+        try:
+            values = self._get(keys) if keys else []
+        except RedisError:
+            logger.exception("Availability cache read failed")
+            return {}
+
+        found = {pair: orjson.loads(value) for pair, value in zip(pairs, values) if value is not None}
+        self._count(hits=len(found), misses=len(keys) - len(found))
+        return found
+
+    def set_many(self, values: dict):
+        if not values:
+            return
+        try:
+            self._set([(service_id, self._key(service_id, day), orjson.dumps(value))
+                       for (service_id, day), value in values.items()], self.expire)
+        except RedisError:
+            logger.exception("Availability cache write failed")
+
+    def get_seat_map(self, service_id, day) -> bytes | None:
+        try:
+            [value] = self._get([(service_id, self._seat_map_key(service_id, day))])
+        except RedisError:
+            logger.exception("Availability cache read failed")
+            return None
+        self._count(hits=int(value is not None), misses=int(value is None))
+        return value
+
+    def set_seat_map(self, service_id, day, data: bytes):
+        try:
+            self._set([(service_id, self._seat_map_key(service_id, day), data)], self.expire)
+        except RedisError:
+            logger.exception("Availability cache write failed")
+
+    def _heatmap_key(self, service_id, date_from, date_to) -> str:
+        return f"availability:{service_id}:heatmap:{date_from.isoformat()}:{date_to.isoformat()}"
+
+    def get_heatmap(self, service_id, date_from, date_to) -> list | None:
+        try:
+            [value] = self._get([(service_id, self._heatmap_key(service_id, date_from, date_to))])
+        except RedisError:
+            logger.exception("Availability cache read failed")
+            return None
+        return orjson.loads(value) if value is not None else None
+
+    def set_heatmap(self, service_id, date_from, date_to, value: list):
+        try:
+            self._set([(service_id, self._heatmap_key(service_id, date_from, date_to), orjson.dumps(value))],
+                      settings.HEATMAP_CACHE_TTL)
+        except RedisError:
+            logger.exception("Availability cache write failed")
+
+    def invalidate(self, service_id, *days):
+        days = [day for day in days if day is not None]
+        keys = [self._key(service_id, day) for day in days] + [self._seat_map_key(service_id, day) for day in days]
+        if not keys:
+            return
+        try:
+            self.redis_client.delete(*keys)
+        except RedisError:
+            logger.exception("Availability cache invalidation failed")
+
+    def invalidate_service(self, service_id):
+        """Drop every cached value of the service by moving it to a new generation."""
+        try:
+            self.redis_client.incr(self._generation_key(service_id))
+        except RedisError:
+            logger.exception("Availability cache invalidation failed")
+
+    def _count(self, hits: int, misses: int):
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            if hits:
+                pipe.incrby(self.HITS_KEY, hits)
+            if misses:
+                pipe.incrby(self.MISSES_KEY, misses)
+            pipe.execute()
+        except RedisError:
+            logger.exception("Availability cache stats update failed")
+
+    def stats(self) -> dict:
+        hits, misses = self.redis_client.mget([self.HITS_KEY, self.MISSES_KEY])
+        hits, misses = int(hits or 0), int(misses or 0)
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 4) if total else None
+        }
+
+
+availability_cache = AvailabilityCache()
@@ -0,0 +1,79 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from service.cache import availability_cache
+from service.models import Booking, ServiceSchedule
+
+HEATMAP_SQL = """
+WITH open_hours AS (
+    SELECT hours.day, hours.hour,
+           tsrange(GREATEST(hours.hour_start, hours.day + schedule.start_time),
+                   LEAST(hours.hour_start + interval '1 hour', hours.day + schedule.end_time)) AS span
+    FROM (
+        SELECT day::date AS day, hour, day + make_interval(hours => hour) AS hour_start
+        FROM generate_series(%(date_from)s::timestamp, %(date_to)s::timestamp, interval '1 day') AS day,
+             generate_series(0, 23) AS hour
+    ) AS hours
+    JOIN {schedule_table} AS schedule
+      ON schedule.service_id = %(service_id)s AND schedule.weekday = to_char(hours.day, 'fmday')
+    WHERE hours.hour_start < hours.day + schedule.end_time
+      AND hours.hour_start + interval '1 hour' > hours.day + schedule.start_time
+),
+booked AS (
+    SELECT open_hours.day, open_hours.hour,
+           SUM(booking.seats * EXTRACT(EPOCH FROM upper(open_hours.span * booking.span)
+                                                - lower(open_hours.span * booking.span))) AS seat_seconds
+    FROM open_hours
+    JOIN (
+        SELECT seats, tsrange(lower(period) AT TIME ZONE %(tz)s, upper(period) AT TIME ZONE %(tz)s) AS span
+        FROM {booking_table}
+        WHERE service_id = %(service_id)s
+          AND status = ANY(%(statuses)s)
+          AND period && tstzrange(%(period_from)s, %(period_to)s)
+    ) AS booking ON open_hours.span && booking.span
+    GROUP BY open_hours.day, open_hours.hour
+)
+SELECT to_char(open_hours.day, 'fmday') AS weekday,
+       open_hours.hour,
+       ROUND((100 * COALESCE(SUM(booked.seat_seconds), 0)
+              / NULLIF(SUM(EXTRACT(EPOCH FROM upper(open_hours.span) - lower(open_hours.span))) * %(capacity)s, 0)
+              )::numeric, 1) AS utilisation
+FROM open_hours
+LEFT JOIN booked ON booked.day = open_hours.day AND booked.hour = open_hours.hour
+GROUP BY EXTRACT(ISODOW FROM open_hours.day), weekday, open_hours.hour
+ORDER BY EXTRACT(ISODOW FROM open_hours.day), open_hours.hour
+""".format(schedule_table=ServiceSchedule._meta.db_table, booking_table=Booking._meta.db_table)
+
+
+def occupancy_heatmap(service, date_from, date_to) -> list[dict]:
+    """
+    Seat utilisation of a service per weekday and hour between two dates, in percent.
+
+    Every open hour in the range is matched against the bookings overlapping it in one
+    query, bookings being picked through the period GiST index; hours outside the
+    schedule are left out. Results are cached for a short while.
+    """
+    cached = availability_cache.get_heatmap(service.pk, date_from, date_to)
+    if cached is not None:
+        return cached
+
+    with connection.cursor() as cursor:
+        cursor.execute(HEATMAP_SQL, {
+            "service_id": service.pk,
+            "date_from": date_from,
+            "date_to": date_to,
+            "period_from": timezone.make_aware(datetime.combine(date_from, time.min)),
+            "period_to": timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min)),
+            "tz": settings.TIME_ZONE,
+            "statuses": list(Booking.OCCUPYING_STATUSES),
+            "capacity": service.capacity,
+        })
+        heatmap = [
+            {"weekday": weekday, "hour": hour, "utilisation": float(utilisation or 0)}
+            for weekday, hour, utilisation in cursor.fetchall()
+        ]
+
+    availability_cache.set_heatmap(service.pk, date_from, date_to, heatmap)
+    return heatmap
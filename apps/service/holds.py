@@ -0,0 +1,178 @@
+import logging
+import time
+import uuid
+
+import orjson
+from django.conf import settings
+from django.utils.functional import cached_property
+from redis import Redis, RedisError
+
+logger = logging.getLogger(__name__)
+
+# KEYS: holds by expiry (zset), held seats by slot (hash), hold items (hash)
+RELEASE_EXPIRED = """
+local function release(id)
+    local item = redis.call('HGET', KEYS[3], id)
+    if not item then
+        return 0
+    end
+    local seats, slots = string.match(item, '^(%d+):(.*)$')
+    for slot in string.gmatch(slots, '[^,]+') do
+        redis.call('HINCRBY', KEYS[2], slot, -tonumber(seats))
+    end
+    redis.call('HDEL', KEYS[3], id)
+    redis.call('ZREM', KEYS[1], id)
+    return 1
+end
+
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])) do
+    release(id)
+end
+"""
+
+# ARGV: now, expires at, hold id, seats, key ttl, then slot / free seats pairs
+HOLD_SCRIPT = RELEASE_EXPIRED + """
+local seats = tonumber(ARGV[4])
+local slots = {}
+for i = 6, #ARGV, 2 do
+    local held = tonumber(redis.call('HGET', KEYS[2], ARGV[i]) or '0')
+    if held + seats > tonumber(ARGV[i + 1]) then
+        return 0
+    end
+    table.insert(slots, ARGV[i])
+end
+for _, slot in ipairs(slots) do
+    redis.call('HINCRBY', KEYS[2], slot, seats)
+end
+redis.call('HSET', KEYS[3], ARGV[3], ARGV[4] .. ':' .. table.concat(slots, ','))
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[3])
+for _, key in ipairs(KEYS) do
+    redis.call('EXPIRE', key, ARGV[5])
+end
+return 1
+"""
+
+# ARGV: now, hold id
+RELEASE_SCRIPT = RELEASE_EXPIRED + """
+return release(ARGV[2])
+"""
+
+# ARGV: now, optional hold id whose own seats are left out
+HELD_SCRIPT = RELEASE_EXPIRED + """
+local held = redis.call('HGETALL', KEYS[2])
+local item = ARGV[2] and redis.call('HGET', KEYS[3], ARGV[2])
+if item then
+    local seats, slots = string.match(item, '^(%d+):(.*)$')
+    local own = {}
+    for slot in string.gmatch(slots, '[^,]+') do
+        own[slot] = true
+    end
+    for i = 1, #held, 2 do
+        if own[held[i]] then
+            held[i + 1] = tostring(tonumber(held[i + 1]) - tonumber(seats))
+        end
+    end
+end
+return held
+"""
+
+
+class SlotHolds:
+    """
+    Seats held in Redis for a short while before a booking is confirmed.
+
+    Every service date keeps its holds in a sorted set by expiry next to a hash of held
+    seats per slot. The Lua scripts first release whatever expired, so a hold disappears
+    on its own when the client walks away, then check and take seats atomically.
+    """
+
+    def __init__(self, expire: int = None):
+        self.expire = expire or settings.SLOT_HOLD_TTL
+
+    @cached_property
+    def redis_client(self) -> Redis:
+        return Redis.from_url(settings.REDIS_URL, decode_responses=False)
+
+    @cached_property
+    def hold_script(self):
+        return self.redis_client.register_script(HOLD_SCRIPT)
+
+    @cached_property
+    def release_script(self):
+        return self.redis_client.register_script(RELEASE_SCRIPT)
+
+    @cached_property
+    def held_script(self):
+        return self.redis_client.register_script(HELD_SCRIPT)
+
+    def _keys(self, service_id, day) -> list[str]:
+        prefix = f"holds:{service_id}:{day}"
+        return [prefix, f"{prefix}:seats", f"{prefix}:items"]
+
+    def _hold_key(self, hold_id, user_id) -> str:
+        return f"hold:{user_id}:{hold_id}"
+
+    def hold(self, *, service_id, day, start_time, duration, seats, user_id, free: dict) -> dict | None:
+        """
+        Hold ``seats`` in every slot of ``free``, a map of slot start minute to seats still bookable.
+
+        Returns the hold, or ``None`` when another hold already took the seats.
+        """
+        now = time.time()
+        hold = {
+            "id": str(uuid.uuid4()),
+            "service": str(service_id),
+            "date": day.isoformat(),
+            "start_time": start_time.isoformat(),
+            "duration": duration.total_seconds(),
+            "seats": seats,
+            "user": str(user_id),
+            "expires_at": now + self.expire,
+        }
+        args = [now, hold["expires_at"], hold["id"], seats, self.expire * 2]
+        for slot_start, seats_free in free.items():
+            args += [slot_start, seats_free]
+        if not self.hold_script(keys=self._keys(service_id, day), args=args):
+            return None
+        self.redis_client.set(self._hold_key(hold["id"], user_id), orjson.dumps(hold), ex=self.expire)
+        return hold
+
+    def get(self, hold_id, user_id) -> dict | None:
+        value = self.redis_client.get(self._hold_key(hold_id, user_id))
+        return orjson.loads(value) if value is not None else None
+
+    def claim(self, hold_id, user_id) -> dict | None:
+        """
+        Take the hold for confirmation, only one caller ever gets it.
+
+        The seats stay held until ``release``, ``restore`` gives the hold back when the
+        booking fails.
+        """
+        value = self.redis_client.getdel(self._hold_key(hold_id, user_id))
+        return orjson.loads(value) if value is not None else None
+
+    def restore(self, hold: dict):
+        expire = int(hold["expires_at"] - time.time())
+        if expire > 0:
+            self.redis_client.set(self._hold_key(hold["id"], hold["user"]), orjson.dumps(hold), ex=expire, nx=True)
+
+    def release(self, hold: dict) -> bool:
+        self.redis_client.delete(self._hold_key(hold["id"], hold["user"]))
+        return bool(self.release_script(keys=self._keys(hold["service"], hold["date"]), args=[time.time(), hold["id"]]))
+
+    def held(self, service_id, day, exclude=None) -> dict:
+        """
+        Seats held per slot start minute, empty when Redis is unavailable.
+
+        The seats of the ``exclude`` hold id aren't counted.
+        """
+        args = [time.time()] if exclude is None else [time.time(), str(exclude)]
+        try:
+            values = self.held_script(keys=self._keys(service_id, day), args=args)
+        except RedisError:
+            logger.exception("Slot hold lookup failed")
+            return {}
+        return {int(slot): int(seats) for slot, seats in zip(values[::2], values[1::2]) if int(seats) > 0}
+
+
+slot_holds = SlotHolds()
@@ -0,0 +1,84 @@
+import hashlib
+import logging
+import time
+
+import orjson
+from django.conf import settings
+from django.utils.functional import cached_property
+from redis import Redis, RedisError
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyConflict(Exception):
+    pass
+
+
+class IdempotencyStore:
+    """
+    Responses of requests sent with an ``Idempotency-Key``, stored in Redis.
+
+    The first request claims the key with a short-lived pending marker, duplicates
+    arriving meanwhile poll until the stored response shows up. Redis failures are
+    logged and the request simply runs without protection.
+    """
+    PENDING = b"pending"
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, expire: int = None, pending_expire: int = None, wait: float = None):
+        self.expire = expire or settings.IDEMPOTENCY_KEY_TTL
+        self.pending_expire = pending_expire or settings.IDEMPOTENCY_PENDING_TTL
+        self.wait = wait or settings.IDEMPOTENCY_WAIT_TIMEOUT
+
+    @cached_property
+    def redis_client(self) -> Redis:
+        return Redis.from_url(settings.REDIS_URL, decode_responses=False)
+
+    def _key(self, scope: str) -> str:
+        return f"idempotency:{scope}"
+
+    @staticmethod
+    def fingerprint(data) -> str:
+        return hashlib.sha256(orjson.dumps(data, default=str, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+    def begin(self, scope: str, fingerprint: str) -> dict | None:
+        """
+        Claim ``scope`` for this request, or return the response stored for it.
+
+        Waits while another request holds the key and raises ``IdempotencyConflict``
+        when the key was used for a different payload or the other request takes too long.
+        """
+        key = self._key(scope)
+        deadline = time.monotonic() + self.wait
+        try:
+            while True:
+                if self.redis_client.set(key, self.PENDING, nx=True, ex=self.pending_expire):
+                    return None
+                value = self.redis_client.get(key)
+                if value not in (None, self.PENDING):
+                    stored = orjson.loads(value)
+                    if stored["fingerprint"] != fingerprint:
+                        raise IdempotencyConflict("Idempotency-Key was already used with a different request")
+                    return stored
+                if time.monotonic() >= deadline:
+                    raise IdempotencyConflict("A request with this Idempotency-Key is still in progress")
+                time.sleep(self.POLL_INTERVAL)
+        except RedisError:
+            logger.exception("Idempotency key lookup failed")
+            return None
+
+    def save(self, scope: str, fingerprint: str, status: int, data):
+        value = {"fingerprint": fingerprint, "status": status, "data": data}
+        try:
+            self.redis_client.set(self._key(scope), orjson.dumps(value, default=str), ex=self.expire)
+        except RedisError:
+            logger.exception("Idempotency key write failed")
+
+    def release(self, scope: str):
+        try:
+            self.redis_client.delete(self._key(scope))
+        except RedisError:
+            logger.exception("Idempotency key release failed")
+
+
+idempotency_store = IdempotencyStore()
@@ -0,0 +1,36 @@
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from service.archive import archive_bookings
+from service.models import Booking
+
+
+class Command(BaseCommand):
+    help = "Move old bookings into the archive table in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.BOOKING_ARCHIVE_AFTER_DAYS,
+                            help="Archive bookings older than this many days")
+        parser.add_argument("--before", type=date.fromisoformat,
+                            help="Archive bookings dated before this day, overrides --days")
+        parser.add_argument("--batch-size", type=int, default=settings.BOOKING_ARCHIVE_BATCH_SIZE)
+        parser.add_argument("--pause", type=float, default=0, help="Seconds to sleep between batches")
+
+    def handle(self, *args, **options):
+        cutoff = options["before"] or timezone.localdate() - timedelta(days=options["days"])
+        if cutoff > timezone.localdate():
+            raise CommandError(f"Cutoff {cutoff} is in the future, only past bookings can be archived")
+        total = Booking.objects.filter(date__lt=cutoff).count()
+        self.stdout.write(f"{total} bookings before {cutoff} to archive")
+
+        archived, started = 0, time.monotonic()
+        for moved in archive_bookings(cutoff, options["batch_size"]):
+            archived += moved
+            elapsed = time.monotonic() - started
+            self.stdout.write(f"Archived {archived}/{total} ({archived / elapsed:.0f} rows/s)")
+            if options["pause"]:
+                time.sleep(options["pause"])
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} bookings"))
@@ -0,0 +1,57 @@
+import random
+import timeit
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand
+from service.availability import build_slots, to_minutes
+from service.occupancy import slot_usage
+
+
+def legacy_slot_usage(start_time: time, end_time: time, duration: timedelta, bookings) -> list[int]:
+    """The old per-slot ``datetime.combine`` walk, scanning every booking for every slot."""
+    taken = []
+    current_time = datetime.combine(datetime.min, start_time)
+    end_datetime = datetime.combine(datetime.min, end_time)
+    while current_time + duration <= end_datetime:
+        slot_start = to_minutes(current_time.time())
+        slot_end = slot_start + int(duration.total_seconds() // 60)
+        taken.append(sum(seats for start, end, seats in bookings if start < slot_end and end > slot_start))
+        current_time += duration
+    return taken
+
+
+class Command(BaseCommand):
+    help = "Compare the vectorized slot usage with the old per-slot loop on a 24h schedule"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bookings", type=int, nargs="+", default=[10, 100, 1000],
+                            help="Bookings per day to benchmark")
+        parser.add_argument("--step", type=int, default=15, help="Slot length in minutes")
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        duration = timedelta(minutes=options["step"])
+        start_time, end_time = time(0, 0), time(23, 59)
+        slots = build_slots(start_time, end_time, duration)
+        self.stdout.write(f"{len(slots)} slots of {options['step']} minutes, best of {options['repeat']} runs")
+
+        for count in options["bookings"]:
+            bookings = []
+            for _ in range(count):
+                slot_start, _ = rng.choice(slots)
+                length = options["step"] * rng.randint(1, 8)
+                bookings.append((slot_start, slot_start + length, rng.randint(1, 4)))
+
+            expected = legacy_slot_usage(start_time, end_time, duration, bookings)
+            assert slot_usage(slots, bookings).tolist() == expected
+
+            legacy = min(timeit.repeat(lambda: legacy_slot_usage(start_time, end_time, duration, bookings),
+                                       number=1, repeat=options["repeat"]))
+            vectorized = min(timeit.repeat(lambda: slot_usage(slots, bookings), number=1,
+                                           repeat=options["repeat"]))
+            self.stdout.write(
+                f"{count:>6} bookings: loop {legacy * 1000:8.3f} ms, "
+                f"numpy {vectorized * 1000:8.3f} ms, x{legacy / vectorized:.1f}"
+            )
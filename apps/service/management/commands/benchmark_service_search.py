@@ -0,0 +1,67 @@
+import random
+import timeit
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from service.models import Service, ServiceCategory
+from service.search import refresh_search_vectors, search_services
+from users.models import User
+
+WORDS = (
+    "yoga", "boxing", "swimming", "football", "tennis", "padel", "karting", "bowling", "sauna", "massage",
+    "barber", "haircut", "manicure", "english", "math", "piano", "guitar", "dance", "chess", "climbing",
+    "studio", "club", "center", "academy", "arena", "court", "pool", "school", "salon", "lounge",
+)
+CATEGORIES = ("Sport", "Beauty", "Education", "Music", "Games", "Health", "Kids", "Relax")
+
+
+def legacy_search(text):
+    """The former ``search_fields`` lookup, one ``ILIKE '%text%'`` per column."""
+    return Service.objects.filter(
+        Q(category__name__icontains=text) | Q(name__icontains=text) | Q(address__icontains=text)
+        | Q(description__icontains=text)
+    ).order_by("name")
+
+
+class Command(BaseCommand):
+    help = "Compare full-text service search with the former icontains search, inside a rolled back transaction"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--services", type=int, default=100_000)
+        parser.add_argument("--queries", nargs="+", default=["yoga", "padel court", "hair", "zzz"])
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self._populate(options["services"], random.Random(options["seed"]))
+            self.stdout.write(f"{options['services']} services, best of {options['repeat']} runs, first page + count")
+            for text in options["queries"]:
+                legacy = self._time(legacy_search(text.split()[0]), options["repeat"])
+                full_text = self._time(search_services(Service.objects.all(), text), options["repeat"])
+                self.stdout.write(
+                    f"{text!r:>14}: icontains {legacy * 1000:9.2f} ms, "
+                    f"full-text {full_text * 1000:9.2f} ms, x{legacy / full_text:.1f}"
+                )
+            transaction.set_rollback(True)
+
+    def _populate(self, count, rng):
+        owner = User.objects.create_user(phone_number="benchmark-search", password=None, type=User.Type.PROVIDER)
+        categories = ServiceCategory.objects.bulk_create(
+            [ServiceCategory(name=f"{name} benchmark", icon="https://example.com/icon.png") for name in CATEGORIES]
+        )
+        for offset in range(0, count, 5000):
+            Service.objects.bulk_create([
+                Service(owner=owner, category=rng.choice(categories), name=f"{' '.join(rng.sample(WORDS, 2))} {index}",
+                        address=f"{rng.choice(WORDS)} street {index}", description=" ".join(rng.choices(WORDS, k=12)),
+                        capacity=5, duration=timedelta(minutes=60), price=1000)
+                for index in range(offset, min(offset + 5000, count))
+            ])
+        refresh_search_vectors(Service.objects.filter(owner=owner))
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Service._meta.db_table}")
+
+    def _time(self, queryset, repeat):
+        return min(timeit.repeat(lambda: (list(queryset[:10]), queryset.count()), number=1, repeat=repeat))
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from service.partitions import create_partitions, detach_partitions
+
+
+class Command(BaseCommand):
+    help = "Create upcoming monthly booking partitions and detach old ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ahead", type=int, default=settings.BOOKING_PARTITIONS_AHEAD,
+                            help="Months to create ahead of the current one")
+        parser.add_argument("--retain", type=int, default=settings.BOOKING_PARTITIONS_RETAIN,
+                            help="Months before the current one to keep attached, nothing is detached if unset")
+
+    def handle(self, *args, **options):
+        for name in create_partitions(options["ahead"]):
+            self.stdout.write(f"Created {name}")
+        if options["retain"] is not None:
+            for name in detach_partitions(options["retain"]):
+                self.stdout.write(f"Detached {name}")
+        self.stdout.write(self.style.SUCCESS("Booking partitions are up to date"))
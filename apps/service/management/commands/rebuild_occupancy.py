@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from service.occupancy import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the slot occupancy table from bookings"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--service", action="append", dest="services",
+                            help="Only rebuild the given service id, can be repeated")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            created = rebuild(options["services"])
+        self.stdout.write(self.style.SUCCESS(f"Slot occupancy rebuilt - {created} rows"))
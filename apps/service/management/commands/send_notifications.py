@@ -0,0 +1,29 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Send queued outbox messages through the Telegram bot"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Send one batch and exit")
+        parser.add_argument("--batch-size", type=int)
+
+    def handle(self, *args, **options):
+        from bot.loader import bot
+        from bot.notifications import OutboxWorker
+
+        worker = OutboxWorker(bot, batch_size=options["batch_size"])
+
+        async def main():
+            try:
+                if options["once"]:
+                    return await worker.run_once()
+                await worker.run()
+            finally:
+                await bot.session.close()
+
+        sent = asyncio.run(main())
+        if options["once"]:
+            self.stdout.write(self.style.SUCCESS(f"Processed {sent} outbox messages"))
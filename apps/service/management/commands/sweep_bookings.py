@@ -0,0 +1,22 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from service.sweeper import mark_passed
+
+
+class Command(BaseCommand):
+    help = "Mark finished pending bookings as passed"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int)
+        parser.add_argument("--loop", action="store_true",
+                            help="Keep sweeping every BOOKING_SWEEP_INTERVAL seconds")
+
+    def handle(self, *args, **options):
+        while True:
+            moved = mark_passed(options["batch_size"])
+            self.stdout.write(f"{moved} bookings marked as passed")
+            if not options["loop"]:
+                return
+            time.sleep(settings.BOOKING_SWEEP_INTERVAL)
@@ -1,10 +1,17 @@
+from datetime import timedelta
+
 from django.db.models import Manager, QuerySet
+from django.utils import timezone
 
 
 class ServiceQuerySet(QuerySet):
     def active(self):
         return self.filter(is_deleted=False)
 
+    def with_details(self):
+        """Location, images and schedules as rendered by ``ServiceModelSerializer``, in a fixed number of queries."""
+        return self.select_related("location").prefetch_related("images", "schedules")
+
     def delete(self):
         return self.update(is_deleted=True)
 
@@ -15,3 +22,22 @@ class ServiceManager(Manager):
 
     def all_with_deleted(self):
         return super().get_queryset()
+
+
+class BookingQuerySet(QuerySet):
+    def active(self):
+        """
+        Pending bookings that haven't ended yet.
+
+        ``sweep_bookings`` moves finished bookings to passed, the end check only
+        covers the ones it hasn't reached yet.
+        """
+        now = timezone.now()
+        # the date bound lets Postgres skip past booking partitions
+        return self.filter(status=self.model.StatusType.PENDING, date__gte=timezone.localdate(now) - timedelta(days=1),
+                           period__endswith__gt=now)
+
+    def finished(self, now=None):
+        now = now or timezone.now()
+        return self.filter(status=self.model.StatusType.PENDING, date__lte=timezone.localdate(now),
+                           period__endswith__lte=now)
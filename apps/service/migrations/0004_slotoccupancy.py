@@ -0,0 +1,80 @@
+# Generated by Django 5.2 on 2026-10-18 11:03
+
+from collections import defaultdict
+from datetime import time
+
+import apps.shared.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+
+def to_minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def occupancy_rows(duration, schedules, bookings):
+    """``(date, slot_start, seats)`` of every slot a booking overlaps, copied here so the app may change."""
+    step = int(duration.total_seconds() // 60)
+    by_date = defaultdict(list)
+    for day, start_time, end_time, seats in bookings:
+        start, end = to_minutes(start_time), to_minutes(end_time)
+        if end <= start:
+            end += 24 * 60
+        by_date[day].append((start, end, seats))
+
+    for day, day_bookings in by_date.items():
+        schedule = schedules.get(WEEKDAYS[day.weekday()])
+        if not schedule:
+            continue
+        opens, closes = to_minutes(schedule[0]), to_minutes(schedule[1])
+        for slot_start in range(opens, closes - step + 1, step):
+            seats = sum(seats for start, end, seats in day_bookings if start < slot_start + step and end > slot_start)
+            if seats:
+                yield day, time(slot_start // 60, slot_start % 60), seats
+
+
+def fill_slot_occupancy(apps, schema_editor):
+    Service = apps.get_model('service', 'Service')
+    Booking = apps.get_model('service', 'Booking')
+    SlotOccupancy = apps.get_model('service', 'SlotOccupancy')
+
+    for service in Service.objects.prefetch_related('schedules').iterator(chunk_size=100):
+        schedules = {schedule.weekday: (schedule.start_time, schedule.end_time) for schedule in
+                     service.schedules.all()}
+        bookings = Booking.objects.filter(
+            service=service,
+            date__isnull=False,
+            end_time__isnull=False
+        ).values_list('date', 'start_time', 'end_time', 'seats')
+        SlotOccupancy.objects.bulk_create(
+            [SlotOccupancy(service=service, date=day, slot_start=slot_start, seats=seats)
+             for day, slot_start, seats in occupancy_rows(service.duration, schedules, bookings)],
+            batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0003_booking_service_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotOccupancy',
+            fields=[
+                ('id', models.UUIDField(db_default=apps.shared.models.GenRandomUUID(), editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('slot_start', models.TimeField()),
+                ('seats', models.PositiveIntegerField(default=0)),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupancy', to='service.service')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('service', 'date', 'slot_start'), name='unique_service_date_slot')],
+            },
+        ),
+        migrations.RunPython(fill_slot_occupancy, migrations.RunPython.noop),
+    ]
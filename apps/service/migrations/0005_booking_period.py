@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-18 11:28
+
+import django.contrib.postgres.fields.ranges
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.db import migrations
+
+BACKFILL_PERIOD = """
+UPDATE service_booking
+SET period = tstzrange((date + start_time) AT TIME ZONE %s, (date + start_time + duration) AT TIME ZONE %s)
+WHERE date IS NOT NULL
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0004_slotoccupancy'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='period',
+            field=django.contrib.postgres.fields.ranges.DateTimeRangeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            [(BACKFILL_PERIOD, [settings.TIME_ZONE, settings.TIME_ZONE])],
+            migrations.RunSQL.noop
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['period'], name='booking_period_gist'),
+        ),
+    ]
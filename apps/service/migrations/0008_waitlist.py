@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-18 11:41
+
+import apps.shared.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0007_booking_status_date_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='booking',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('passed', 'Passed'), ('cancelled', 'Cancelled')], default='pending', max_length=15),
+        ),
+        migrations.AlterField(
+            model_name='outboxmessage',
+            name='kind',
+            field=models.CharField(choices=[('booking_created', 'Booking created'), ('waitlist_promoted', 'Waitlist promoted')], max_length=31),
+        ),
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.UUIDField(db_default=apps.shared.models.GenRandomUUID(), editable=False, primary_key=True, serialize=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('date', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('duration', models.DurationField()),
+                ('end_time', models.TimeField()),
+                ('seats', models.PositiveIntegerField(default=1)),
+                ('status', models.CharField(choices=[('waiting', 'Waiting'), ('promoted', 'Promoted'), ('cancelled', 'Cancelled')], default='waiting', max_length=15)),
+                ('booking', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='waitlist_entry', to='service.booking')),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist', to='service.service')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('created_at',),
+                'indexes': [models.Index(condition=models.Q(('status', 'waiting')), fields=['service', 'date', 'created_at'], name='waitlist_waiting_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status', 'waiting')), fields=('service', 'user', 'date', 'start_time'), name='unique_waiting_user_slot')],
+            },
+        ),
+    ]
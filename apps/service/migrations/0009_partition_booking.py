@@ -0,0 +1,95 @@
+# Generated by Django 5.2 on 2026-10-18 11:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+BACKFILL_DATE = """
+UPDATE service_booking SET date = (created_at AT TIME ZONE 'UTC')::date WHERE date IS NULL
+"""
+
+# 0005 left the period of those rows empty
+BACKFILL_PERIOD = """
+UPDATE service_booking
+SET period = tstzrange((date + start_time) AT TIME ZONE %s, (date + start_time + duration) AT TIME ZONE %s)
+WHERE period IS NULL
+"""
+
+# Indexes and foreign keys of the booking table, created on the partitioned parent
+# they cascade to every partition
+BOOKING_INDEXES = """
+CREATE INDEX service_boo_service_1f9fcc_idx ON service_booking (service_id, weekday, start_time);
+CREATE INDEX service_booking_user_id_471c8c09 ON service_booking (user_id);
+CREATE INDEX service_booking_service_id_952453c9 ON service_booking (service_id);
+CREATE INDEX service_boo_service_2258f3_idx ON service_booking (service_id, date);
+CREATE INDEX service_boo_status_d5828c_idx ON service_booking (status, date);
+CREATE INDEX booking_period_gist ON service_booking USING gist (period);
+ALTER TABLE service_booking ADD CONSTRAINT service_booking_user_id_471c8c09_fk_users_user_id
+    FOREIGN KEY (user_id) REFERENCES users_user (id) DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE service_booking ADD CONSTRAINT service_booking_service_id_952453c9_fk_service_service_id
+    FOREIGN KEY (service_id) REFERENCES service_service (id) DEFERRABLE INITIALLY DEFERRED;
+"""
+
+# Monthly partitions from the oldest booking up to three months ahead, everything
+# else lands in the default partition until manage_booking_partitions creates its month
+PARTITION_BOOKING = """
+ALTER TABLE service_booking RENAME TO service_booking_unpartitioned;
+CREATE TABLE service_booking (LIKE service_booking_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+    PARTITION BY RANGE (date);
+
+DO $$
+DECLARE
+    month date;
+BEGIN
+    FOR month IN
+        SELECT generate_series(
+            date_trunc('month', LEAST((SELECT min(date) FROM service_booking_unpartitioned), current_date)),
+            date_trunc('month', current_date) + interval '3 months',
+            interval '1 month'
+        )::date
+    LOOP
+        EXECUTE format('CREATE TABLE %I PARTITION OF service_booking FOR VALUES FROM (%L) TO (%L)',
+                       'service_booking_p' || to_char(month, 'YYYY_MM'), month, month + interval '1 month');
+    END LOOP;
+END $$;
+CREATE TABLE service_booking_default PARTITION OF service_booking DEFAULT;
+
+INSERT INTO service_booking SELECT * FROM service_booking_unpartitioned;
+DROP TABLE service_booking_unpartitioned;
+
+-- a primary key of a partitioned table has to include the partition key
+ALTER TABLE service_booking ADD CONSTRAINT service_booking_pkey PRIMARY KEY (id, date);
+""" + BOOKING_INDEXES
+
+UNPARTITION_BOOKING = """
+CREATE TABLE service_booking_unpartitioned (LIKE service_booking INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+INSERT INTO service_booking_unpartitioned SELECT * FROM service_booking;
+DROP TABLE service_booking;
+ALTER TABLE service_booking_unpartitioned RENAME TO service_booking;
+ALTER TABLE service_booking ADD CONSTRAINT service_booking_pkey PRIMARY KEY (id);
+""" + BOOKING_INDEXES
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0008_waitlist'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='waitlistentry',
+            name='booking',
+            field=models.OneToOneField(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='waitlist_entry', to='service.booking'),
+        ),
+        migrations.RunSQL(
+            [BACKFILL_DATE, (BACKFILL_PERIOD, [settings.TIME_ZONE, settings.TIME_ZONE])],
+            migrations.RunSQL.noop
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='date',
+            field=models.DateField(blank=True),
+        ),
+        migrations.RunSQL(PARTITION_BOOKING, UNPARTITION_BOOKING),
+    ]
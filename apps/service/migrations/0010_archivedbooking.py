@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2026-10-18 11:48
+
+import apps.shared.models
+import django.contrib.postgres.fields.ranges
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0009_partition_booking'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedBooking',
+            fields=[
+                ('id', models.UUIDField(db_default=apps.shared.models.GenRandomUUID(), editable=False, primary_key=True, serialize=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('weekday', models.CharField(choices=[('monday', 'Monday'), ('tuesday', 'Tuesday'), ('wednesday', 'Wednesday'), ('thursday', 'Thursday'), ('friday', 'Friday'), ('saturday', 'Saturday'), ('sunday', 'Sunday')], max_length=9)),
+                ('date', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('duration', models.DurationField()),
+                ('end_time', models.TimeField(blank=True, null=True)),
+                ('seats', models.PositiveIntegerField(default=1)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('passed', 'Passed'), ('cancelled', 'Cancelled')], max_length=15)),
+                ('period', django.contrib.postgres.fields.ranges.DateTimeRangeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField()),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_bookings', to='service.service')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_bookings', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('-date', '-start_time'),
+                'indexes': [models.Index(fields=['user', 'date'], name='service_arc_user_id_8918d3_idx')],
+            },
+        ),
+    ]
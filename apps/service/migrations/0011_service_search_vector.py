@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-18 11:52
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def fill_search_vectors(apps, schema_editor):
+    Service = apps.get_model('service', 'Service')
+    ServiceCategory = apps.get_model('service', 'ServiceCategory')
+    SearchVector = django.contrib.postgres.search.SearchVector
+    config = settings.SERVICE_SEARCH_CONFIG
+    category_name = Subquery(ServiceCategory.objects.filter(pk=OuterRef('category_id')).values('name')[:1])
+    Service._base_manager.update(search_vector=(
+        SearchVector('name', weight='A', config=config)
+        + SearchVector(category_name, weight='B', config=config)
+        + SearchVector('description', weight='C', config=config)
+        + SearchVector('address', weight='D', config=config)
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0010_archivedbooking'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='service',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='service_search_gin'),
+        ),
+    ]
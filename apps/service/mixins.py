@@ -1,6 +1,46 @@
 from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import status
 from rest_framework.filters import SearchFilter
+from rest_framework.response import Response
+from service.idempotency import IdempotencyConflict, idempotency_store
+from shared.filters import ServiceSearchFilter
 
 
 class FilterSearchMixin:
     filter_backends = (DjangoFilterBackend, SearchFilter)
+
+
+class ServiceFilterSearchMixin:
+    filter_backends = (DjangoFilterBackend, ServiceSearchFilter)
+
+
+class IdempotentCreateMixin:
+    """
+    Replays the stored response when a create is retried with the same ``Idempotency-Key``.
+
+    Keys are scoped to the user. Only successful responses are stored, a failed request
+    releases its key so the client can retry it.
+    """
+    idempotency_header = "Idempotency-Key"
+
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(self.idempotency_header)
+        if not key:
+            return super().create(request, *args, **kwargs)
+
+        scope = f"{request.user.pk}:{request.path}:{key}"
+        fingerprint = idempotency_store.fingerprint(request.data)
+        try:
+            stored = idempotency_store.begin(scope, fingerprint)
+        except IdempotencyConflict as e:
+            return Response({"detail": str(e)}, status=status.HTTP_409_CONFLICT)
+        if stored is not None:
+            return Response(stored["data"], status=stored["status"], headers={"Idempotent-Replayed": "true"})
+
+        try:
+            response = super().create(request, *args, **kwargs)
+        except Exception:
+            idempotency_store.release(scope)
+            raise
+        idempotency_store.save(scope, fingerprint, response.status_code, response.data)
+        return response
@@ -1,18 +1,24 @@
 from datetime import datetime, timedelta
 
-from service.managers import ServiceManager, ServiceQuerySet
+from django.contrib.postgres.fields import DateTimeRangeField
+from django.contrib.postgres.fields.ranges import DateTimeTZRange
+from django.contrib.postgres.indexes import GinIndex, GistIndex
+from django.contrib.postgres.search import SearchVectorField
+from service.managers import BookingQuerySet, ServiceManager, ServiceQuerySet
 from django.core.exceptions import ValidationError
-from django.db.models import (CASCADE, SET_NULL, BooleanField, CharField,
-                              CheckConstraint, DateField, DateTimeField,
-                              DurationField, FloatField, ForeignKey,
-                              ImageField, Index, OneToOneField,
-                              PositiveIntegerField, TextChoices, TextField,
-                              TimeField, UniqueConstraint, URLField)
+from django.db import transaction
+from django.db.models import (CASCADE, SET_NULL, BigIntegerField,
+                              BooleanField, CharField, CheckConstraint,
+                              DateField, DateTimeField, DurationField,
+                              FloatField, ForeignKey, ImageField, Index,
+                              JSONField, OneToOneField, PositiveIntegerField,
+                              Q, TextChoices, TextField, TimeField,
+                              UniqueConstraint, URLField)
 from django.db.models.expressions import RawSQL
 from django.utils import timezone
 from django.utils.text import slugify
 
-from apps.shared.models import CreatedBaseModel
+from apps.shared.models import CreatedBaseModel, UUIDBaseModel
 
 
 def service_image_upload_to(instance, filename):
@@ -82,6 +88,8 @@ class Service(CreatedBaseModel):
     price = PositiveIntegerField()
     description = TextField(blank=True, null=True)
     is_deleted = BooleanField(default=False)
+    # weighted name, category, description and address, kept up to date by signals
+    search_vector = SearchVectorField(blank=True, null=True, editable=False)
     objects = ServiceManager.from_queryset(ServiceQuerySet)()
 
     class Meta:
@@ -95,6 +103,9 @@ class Service(CreatedBaseModel):
                 name="duration_multiple_of_30_check"
             )
         ]
+        indexes = [
+            GinIndex(fields=["search_vector"], name="service_search_gin"),
+        ]
 
     def __str__(self):
         return self.name
@@ -139,20 +150,31 @@ class Booking(CreatedBaseModel):
     class StatusType(TextChoices):
         PENDING = 'pending', 'Pending'
         PASSED = 'passed', 'Passed'
+        CANCELLED = 'cancelled', 'Cancelled'
 
     service = ForeignKey("service.Service", CASCADE, related_name="bookings")
     weekday = CharField(max_length=9, choices=WeekdayChoices.choices)
     user = ForeignKey('users.User', CASCADE, related_name="bookings")
-    date = DateField(blank=True, null=True)
+    # partition key of the table, see migration 0009
+    date = DateField(blank=True)
     start_time = TimeField()
     duration = DurationField()
     end_time = TimeField(blank=True, null=True)
     seats = PositiveIntegerField(default=1)
     status = CharField(max_length=15, choices=StatusType.choices, default=StatusType.PENDING)
+    # [start, end) of the booking as aware datetimes, kept in sync on save
+    period = DateTimeRangeField(blank=True, null=True, editable=False)
+
+    objects = BookingQuerySet.as_manager()
+
+    OCCUPYING_STATUSES = (StatusType.PENDING, StatusType.PASSED)
 
     class Meta:
         indexes = [
             Index(fields=["service", "weekday", "start_time"]),
+            Index(fields=["service", "date"]),
+            Index(fields=["status", "date"]),
+            GistIndex(fields=["period"], name="booking_period_gist"),
         ]
         ordering = ('-created_at',)
 
@@ -179,20 +201,31 @@ class Booking(CreatedBaseModel):
             raise ValidationError(f"Invalid weekday: {self.weekday}")
 
         if not self.date and self.weekday:
-            name = str(self.weekday).lower()
-            target_idx = list(WeekdayChoices.values).index(name)
-            today = timezone.localdate()
-            today_idx = today.weekday()
-            delta_days = (target_idx - today_idx) % 7
+            self.date = self.next_date(self.weekday, self.start_time)
 
-            candidate_date = today + timedelta(days=delta_days)
+        if self.date and self.start_time:
+            from service.occupancy import booking_fits
 
-            if delta_days == 0 and self.start_time is not None:
-                now_time = timezone.localtime().time()
-                if self.start_time <= now_time:
-                    candidate_date += timedelta(days=7)
+            end_time = (datetime.combine(datetime.min, self.start_time) + self.duration).time()
+            if not booking_fits(self, end_time):
+                raise ValidationError("Not enough capacity for this time slot")
 
-            self.date = candidate_date
+    @staticmethod
+    def next_date(weekday, start_time):
+        name = str(weekday).lower()
+        target_idx = list(WeekdayChoices.values).index(name)
+        today = timezone.localdate()
+        today_idx = today.weekday()
+        delta_days = (target_idx - today_idx) % 7
+
+        candidate_date = today + timedelta(days=delta_days)
+
+        if delta_days == 0 and start_time is not None:
+            now_time = timezone.localtime().time()
+            if start_time <= now_time:
+                candidate_date += timedelta(days=7)
+
+        return candidate_date
 
     def save(self, *args, **kwargs):
         if self.start_time:
@@ -204,10 +237,130 @@ class Booking(CreatedBaseModel):
             dt = datetime.combine(datetime.today(), self.start_time)
             end_dt = dt + self.duration
             self.end_time = end_dt.time().replace(microsecond=0)
+        self.period = self.make_period(self.date, self.start_time, self.duration)
+
+        # slot occupancy is updated from the save signals, keep it in the same transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    @staticmethod
+    def make_period(day, start_time, duration):
+        if day is None or start_time is None or duration is None:
+            return None
+        start = timezone.make_aware(datetime.combine(day, start_time))
+        return DateTimeTZRange(start, start + duration)
+
+    @property
+    def occupied_seats(self):
+        return self.seats if self.status in self.OCCUPYING_STATUSES else 0
+
+
+class ArchivedBooking(CreatedBaseModel):
+    """Bookings moved out of the booking table by ``archive_bookings``, read only."""
+    service = ForeignKey("service.Service", CASCADE, related_name="archived_bookings")
+    weekday = CharField(max_length=9, choices=WeekdayChoices.choices)
+    user = ForeignKey('users.User', CASCADE, related_name="archived_bookings")
+    date = DateField()
+    start_time = TimeField()
+    duration = DurationField()
+    end_time = TimeField(blank=True, null=True)
+    seats = PositiveIntegerField(default=1)
+    status = CharField(max_length=15, choices=Booking.StatusType.choices)
+    period = DateTimeRangeField(blank=True, null=True)
+    archived_at = DateTimeField()
+
+    class Meta:
+        ordering = ('-date', '-start_time')
+        indexes = [
+            Index(fields=["user", "date"]),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.service_id} {self.date} {self.start_time} ({self.seats})"
+
+
+class SlotOccupancy(UUIDBaseModel):
+    service = ForeignKey('service.Service', CASCADE, related_name="occupancy")
+    date = DateField()
+    slot_start = TimeField()
+    seats = PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=['service', 'date', 'slot_start'], name='unique_service_date_slot')
+        ]
+
+    def __str__(self):
+        return f"{self.service_id} {self.date} {self.slot_start} ({self.seats})"
+
+
+class WaitlistEntry(CreatedBaseModel):
+    class StatusType(TextChoices):
+        WAITING = 'waiting', 'Waiting'
+        PROMOTED = 'promoted', 'Promoted'
+        CANCELLED = 'cancelled', 'Cancelled'
+
+    service = ForeignKey('service.Service', CASCADE, related_name="waitlist")
+    user = ForeignKey('users.User', CASCADE, related_name="waitlist")
+    date = DateField()
+    start_time = TimeField()
+    duration = DurationField()
+    end_time = TimeField()
+    seats = PositiveIntegerField(default=1)
+    status = CharField(max_length=15, choices=StatusType.choices, default=StatusType.WAITING)
+    # bookings are partitioned by date, their id alone can't be referenced by a foreign key constraint
+    booking = OneToOneField('service.Booking', SET_NULL, null=True, blank=True, related_name="waitlist_entry",
+                            db_constraint=False)
+
+    class Meta:
+        ordering = ("created_at",)
+        indexes = [
+            # promotion only ever reads the head of one service date
+            Index(fields=["service", "date", "created_at"], condition=Q(status="waiting"),
+                  name="waitlist_waiting_idx"),
+        ]
+        constraints = [
+            UniqueConstraint(fields=["service", "user", "date", "start_time"], condition=Q(status="waiting"),
+                             name="unique_waiting_user_slot")
+        ]
 
+    def __str__(self):
+        return f"{self.user} waits for {self.service_id} {self.date} {self.start_time} ({self.seats})"
+
+    def save(self, *args, **kwargs):
+        self.start_time = self.start_time.replace(second=0, microsecond=0)
+        self.end_time = (datetime.combine(self.date, self.start_time) + self.duration).time()
         super().save(*args, **kwargs)
 
 
+class OutboxMessage(CreatedBaseModel):
+    class Kind(TextChoices):
+        BOOKING_CREATED = 'booking_created', 'Booking created'
+        WAITLIST_PROMOTED = 'waitlist_promoted', 'Waitlist promoted'
+
+    class StatusType(TextChoices):
+        PENDING = 'pending', 'Pending'
+        SENT = 'sent', 'Sent'
+        FAILED = 'failed', 'Failed'
+
+    chat_id = BigIntegerField()
+    kind = CharField(max_length=31, choices=Kind.choices)
+    payload = JSONField(default=dict)
+    status = CharField(max_length=15, choices=StatusType.choices, default=StatusType.PENDING)
+    attempts = PositiveIntegerField(default=0)
+    available_at = DateTimeField(default=timezone.now)
+    sent_at = DateTimeField(blank=True, null=True)
+    last_error = TextField(blank=True, default="")
+
+    class Meta:
+        indexes = [
+            Index(fields=["status", "available_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} -> {self.chat_id} ({self.status})"
+
+
 class Demand(CreatedBaseModel):
     user = ForeignKey(
         'users.User',
@@ -0,0 +1,260 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import time
+
+import numpy as np
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from service.availability import booking_interval, build_slots, weekday_of
+from service.models import (Booking, Service, ServiceSchedule, SlotOccupancy,
+                            WeekdayChoices)
+
+LOCK_KEY_MASK = 0x7FFFFFFF
+
+_pending_rebuilds = ContextVar("pending_rebuilds", default=None)
+
+
+def lock_service_days(service_id, days):
+    """
+    Serialise booking writes of the given service dates until the surrounding transaction ends.
+
+    Uses the two-key form of ``pg_advisory_xact_lock`` so other services and dates
+    keep booking in parallel. Dates are locked in order to avoid deadlocks.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_advisory_xact_lock(%s, day) FROM unnest(%s::int[]) AS day ORDER BY day",
+            [service_id.int & LOCK_KEY_MASK, sorted({day.toordinal() for day in days})]
+        )
+
+
+def lock_service_day(service_id, day):
+    lock_service_days(service_id, [day])
+
+
+def minutes_to_time(value: int) -> time:
+    return time(value // 60, value % 60)
+
+
+def slot_usage(slots: list[tuple[int, int]], bookings) -> np.ndarray:
+    """
+    Seats taken in every slot, summed over the bookings overlapping it.
+
+    ``slots`` must be sorted and non-overlapping, ``bookings`` is a sequence of
+    ``(start, end, seats)`` minute triples. Booking bounds are mapped to slot indexes
+    with ``searchsorted``, scattered into a difference array and summed with ``cumsum``.
+    """
+    if not slots:
+        return np.zeros(0, dtype=np.int64)
+    bounds = np.asarray(slots, dtype=np.int64)
+    booked = np.asarray(bookings, dtype=np.int64).reshape(-1, 3)
+
+    first = np.searchsorted(bounds[:, 1], booked[:, 0], side="right")
+    last = np.searchsorted(bounds[:, 0], booked[:, 1], side="left")
+    overlapping = first < last
+
+    diff = np.zeros(len(slots) + 1, dtype=np.int64)
+    np.add.at(diff, first[overlapping], booked[overlapping, 2])
+    np.subtract.at(diff, last[overlapping], booked[overlapping, 2])
+    return np.cumsum(diff[:-1])
+
+
+def occupancy_rows(duration, schedules: dict, bookings):
+    """
+    Turn bookings into ``(date, slot_start, seats)`` rows of the slot occupancy table.
+
+    ``schedules`` maps a weekday to its ``(start_time, end_time)`` and ``bookings`` is an
+    iterable of ``(date, start_time, end_time, seats)``.
+    """
+    by_date = defaultdict(list)
+    for day, start_time, end_time, seats in bookings:
+        by_date[day].append((*booking_interval(start_time, end_time), seats))
+
+    for day, day_bookings in by_date.items():
+        schedule = schedules.get(weekday_of(day))
+        if not schedule:
+            continue
+        slots = build_slots(*schedule, duration)
+        for (slot_start, _), seats in zip(slots, slot_usage(slots, day_bookings).tolist()):
+            if seats:
+                yield day, minutes_to_time(slot_start), seats
+
+
+def booking_slots(service, day, start_time, end_time) -> list[time]:
+    schedule = ServiceSchedule.objects.filter(service=service, weekday=weekday_of(day)).first()
+    if not schedule:
+        return []
+    start, end = booking_interval(start_time, end_time)
+    return [
+        minutes_to_time(slot_start)
+        for slot_start, slot_end in build_slots(schedule.start_time, schedule.end_time, service.duration)
+        if slot_start < end and slot_end > start
+    ]
+
+
+def booking_fits(booking, end_time) -> bool:
+    """
+    Whether every slot ``booking`` covers still has room for its seats in the ledger.
+
+    Seats the saved booking already takes are given back first, so an unchanged booking
+    always fits. ``add_seats`` is what holds under concurrency, this only lets
+    ``Booking.clean()`` refuse a full slot up front.
+    """
+    seats = booking.occupied_seats
+    slot_starts = booking_slots(booking.service, booking.date, booking.start_time, end_time) if seats else []
+    if not slot_starts:
+        return True
+    taken = dict(SlotOccupancy.objects.filter(
+        service=booking.service, date=booking.date, slot_start__in=slot_starts
+    ).values_list("slot_start", "seats"))
+    if not booking._state.adding:
+        previous = Booking.objects.filter(
+            pk=booking.pk, service=booking.service, date=booking.date, status__in=Booking.OCCUPYING_STATUSES
+        ).values_list("start_time", "end_time", "seats").first()
+        if previous and previous[1] is not None:
+            for slot_start in booking_slots(booking.service, booking.date, *previous[:2]):
+                taken[slot_start] = taken.get(slot_start, 0) - previous[2]
+    return all(taken.get(slot_start, 0) + seats <= booking.service.capacity for slot_start in slot_starts)
+
+
+def add_seats(service, day, start_time, end_time, seats):
+    """
+    Move the occupancy of every slot the booking covers by ``seats``.
+
+    Taking seats is a single conditional ``UPDATE`` over the slot rows that still have
+    room, so only those rows are locked and concurrent bookings cannot overbook: when
+    any slot is short the whole change is refused.
+    """
+    if not seats or day is None or end_time is None:
+        return
+    slot_starts = booking_slots(service, day, start_time, end_time)
+    if not slot_starts:
+        return
+    rows = SlotOccupancy.objects.filter(service=service, date=day, slot_start__in=slot_starts)
+    if seats < 0:
+        rows.update(seats=Greatest(F("seats") + seats, 0))
+        return
+
+    SlotOccupancy.objects.bulk_create(
+        [SlotOccupancy(service=service, date=day, slot_start=slot_start) for slot_start in slot_starts],
+        ignore_conflicts=True
+    )
+    if rows.filter(seats__lte=service.capacity - seats).update(seats=F("seats") + seats) != len(slot_starts):
+        raise ValidationError("Not enough capacity for this time slot")
+
+
+def booking_state(booking) -> tuple:
+    return booking.service_id, booking.date, booking.start_time, booking.end_time, booking.occupied_seats
+
+
+def sync_booking(previous: tuple | None, booking):
+    current = booking_state(booking)
+    if previous == current:
+        return
+    if previous is not None:
+        service_id, day, start_time, end_time, seats = previous
+        service = booking.service if service_id == booking.service_id else \
+            Service.objects.all_with_deleted().get(pk=service_id)
+        add_seats(service, day, start_time, end_time, -seats)
+    add_seats(booking.service, booking.date, booking.start_time, booking.end_time, booking.occupied_seats)
+
+
+def release_booking(booking):
+    add_seats(booking.service, booking.date, booking.start_time, booking.end_time, -booking.occupied_seats)
+
+
+def rebuild(service_ids=None) -> int:
+    services = Service.objects.all_with_deleted().prefetch_related("schedules")
+    if service_ids is not None:
+        services = services.filter(pk__in=service_ids)
+
+    created = 0
+    for service in services.iterator(chunk_size=100):
+        schedules = {schedule.weekday: (schedule.start_time, schedule.end_time) for schedule in
+                     service.schedules.all()}
+        bookings = Booking.objects.filter(
+            service=service,
+            status__in=Booking.OCCUPYING_STATUSES,
+            date__isnull=False,
+            end_time__isnull=False
+        ).values_list("date", "start_time", "end_time", "seats")
+
+        SlotOccupancy.objects.filter(service=service).delete()
+        rows = SlotOccupancy.objects.bulk_create(
+            [SlotOccupancy(service=service, date=day, slot_start=slot_start, seats=seats)
+             for day, slot_start, seats in occupancy_rows(service.duration, schedules, bookings)],
+            batch_size=1000
+        )
+        created += len(rows)
+    return created
+
+
+def rebuild_weekdays(service_id, weekdays, date_from=None) -> int:
+    """
+    Rebuild the occupancy of the given weekdays from ``date_from``, today by default, on.
+
+    Past dates are left as they are. Every date with bookings or occupancy is locked
+    like ``create_booking`` locks it before its rows are replaced, so bookings of those
+    dates wait for the rebuild instead of racing it.
+    """
+    service = Service.objects.all_with_deleted().get(pk=service_id)
+    date_from = date_from or timezone.localdate()
+    iso_weekdays = [WeekdayChoices.values.index(weekday) + 1 for weekday in weekdays]
+    bookings = Booking.objects.filter(
+        service=service,
+        status__in=Booking.OCCUPYING_STATUSES,
+        date__gte=date_from,
+        date__iso_week_day__in=iso_weekdays,
+        end_time__isnull=False
+    )
+    occupancy = SlotOccupancy.objects.filter(service=service, date__gte=date_from,
+                                             date__iso_week_day__in=iso_weekdays)
+
+    with transaction.atomic():
+        locked = set()
+        while True:
+            # a booking may land on a new date until its date is locked, so look again
+            days = set(bookings.values_list("date", flat=True).distinct())
+            days |= set(occupancy.values_list("date", flat=True).distinct())
+            days -= locked
+            if not days:
+                break
+            lock_service_days(service.pk, days)
+            locked |= days
+
+        schedules = {schedule.weekday: (schedule.start_time, schedule.end_time) for schedule in
+                     ServiceSchedule.objects.filter(service=service, weekday__in=weekdays)}
+        occupancy.delete()
+        rows = SlotOccupancy.objects.bulk_create(
+            [SlotOccupancy(service=service, date=day, slot_start=slot_start, seats=seats)
+             for day, slot_start, seats in occupancy_rows(
+                service.duration, schedules, bookings.values_list("date", "start_time", "end_time", "seats")
+            )],
+            batch_size=1000
+        )
+    return len(rows)
+
+
+@contextmanager
+def deferred_rebuilds():
+    """Collect the rebuilds requested inside the block and run them once per service on exit."""
+    pending = defaultdict(set)
+    token = _pending_rebuilds.set(pending)
+    try:
+        yield
+    finally:
+        _pending_rebuilds.reset(token)
+    for service_id, weekdays in pending.items():
+        rebuild_weekdays(service_id, weekdays)
+
+
+def request_rebuild(service_id, weekdays):
+    pending = _pending_rebuilds.get()
+    if pending is None:
+        rebuild_weekdays(service_id, weekdays)
+    else:
+        pending[service_id].update(weekdays)
@@ -0,0 +1,123 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from service.models import Booking, OutboxMessage, Service
+from users.models import User
+
+# ``{bookings}`` is any relation with the columns of the booking table, a CTE included
+BOOKING_CREATED_SQL = """
+INSERT INTO {outbox_table} (id, created_at, updated_at, chat_id, kind, payload, status, attempts,
+                            available_at, last_error)
+SELECT gen_random_uuid(), %(now)s, %(now)s, owner.telegram_id, %(outbox_kind)s,
+       jsonb_build_object(
+           'booking', booking.id,
+           'service', service.name,
+           'date', booking.date,
+           'start_time', to_char(booking.start_time, 'HH24:MI'),
+           'end_time', to_char(booking.end_time, 'HH24:MI'),
+           'seats', booking.seats,
+           'customer', customer.phone_number
+       ),
+       %(outbox_status)s, 0, %(now)s, ''
+FROM {{bookings}} AS booking
+JOIN {service_table} AS service ON service.id = booking.service_id
+JOIN {user_table} AS owner ON owner.id = service.owner_id
+JOIN {user_table} AS customer ON customer.id = booking.user_id
+WHERE owner.telegram_id IS NOT NULL
+""".format(outbox_table=OutboxMessage._meta.db_table, service_table=Service._meta.db_table,
+           user_table=User._meta.db_table)
+
+
+def booking_created_params(now=None) -> dict:
+    return {
+        "now": now or timezone.now(),
+        "outbox_kind": OutboxMessage.Kind.BOOKING_CREATED,
+        "outbox_status": OutboxMessage.StatusType.PENDING,
+    }
+
+
+def enqueue_booking_created(booking_ids):
+    """Queue a new booking message to the provider of each booking, in the caller's transaction."""
+    sql = BOOKING_CREATED_SQL.format(
+        bookings=f"(SELECT * FROM {Booking._meta.db_table} WHERE id = ANY(%(booking_ids)s))"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {**booking_created_params(), "booking_ids": list(booking_ids)})
+
+
+def claim_batch(size: int = None) -> list[OutboxMessage]:
+    """
+    Take up to ``size`` due messages for sending.
+
+    Rows are picked with ``SKIP LOCKED`` and leased by pushing ``available_at`` forward,
+    so parallel workers never get the same message and a crashed worker's messages
+    come back once the lease is over. A chat gets one message per ``OUTBOX_CHAT_INTERVAL``,
+    so a batch takes only as many messages of one chat as can be sent in half the lease.
+    """
+    now = timezone.now()
+    due = OutboxMessage.objects.filter(status=OutboxMessage.StatusType.PENDING, available_at__lte=now)
+    if settings.OUTBOX_CHAT_INTERVAL:
+        per_chat = max(int(settings.OUTBOX_LEASE / 2 / settings.OUTBOX_CHAT_INTERVAL), 1)
+        due = due.filter(pk__in=due.annotate(
+            chat_position=Window(RowNumber(), partition_by=F("chat_id"), order_by=F("available_at").asc())
+        ).filter(chat_position__lte=per_chat).values("pk"))
+    with transaction.atomic():
+        messages = list(
+            due.select_for_update(skip_locked=True).order_by("available_at")[:size or settings.OUTBOX_BATCH_SIZE]
+        )
+        OutboxMessage.objects.filter(pk__in=[message.pk for message in messages]).update(
+            available_at=now + timedelta(seconds=settings.OUTBOX_LEASE),
+            attempts=F("attempts") + 1,
+            updated_at=now
+        )
+    for message in messages:
+        message.attempts += 1
+    return messages
+
+
+def mark_sent(message_ids):
+    now = timezone.now()
+    OutboxMessage.objects.filter(pk__in=message_ids).update(
+        status=OutboxMessage.StatusType.SENT, sent_at=now, last_error="", updated_at=now
+    )
+
+
+def mark_failed(message: OutboxMessage, error: str, retry_after: float = None, final: bool = False):
+    """
+    Schedule another attempt with exponential backoff, or give up after ``OUTBOX_MAX_ATTEMPTS``.
+
+    Flood control waits (``retry_after``) are always retried.
+    """
+    now = timezone.now()
+    if retry_after is not None:
+        status, available_at = OutboxMessage.StatusType.PENDING, now + timedelta(seconds=retry_after)
+    elif final or message.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        status, available_at = OutboxMessage.StatusType.FAILED, now
+    else:
+        delay = settings.OUTBOX_RETRY_DELAY * 2 ** (message.attempts - 1)
+        status, available_at = OutboxMessage.StatusType.PENDING, now + timedelta(seconds=delay)
+    OutboxMessage.objects.filter(pk=message.pk).update(
+        status=status, available_at=available_at, last_error=error[:1000], updated_at=now
+    )
+
+
+def enqueue_waitlist_promoted(entry):
+    if entry.user.telegram_id is None:
+        return
+    booking = entry.booking
+    OutboxMessage.objects.create(
+        chat_id=entry.user.telegram_id,
+        kind=OutboxMessage.Kind.WAITLIST_PROMOTED,
+        payload={
+            "booking": str(booking.pk),
+            "service": entry.service.name,
+            "date": booking.date.isoformat(),
+            "start_time": booking.start_time.strftime("%H:%M"),
+            "end_time": booking.end_time.strftime("%H:%M"),
+            "seats": booking.seats,
+        }
+    )
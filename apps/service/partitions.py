@@ -0,0 +1,115 @@
+import re
+import time
+from datetime import date
+
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+from service.models import Booking
+
+BOOKING_TABLE = Booking._meta.db_table
+DEFAULT_PARTITION = f"{BOOKING_TABLE}_default"
+PARTITION_NAME = re.compile(rf"^{BOOKING_TABLE}_p(\d{{4}})_(\d{{2}})$")
+LOCK_TIMEOUT = "1s"
+LOCK_ATTEMPTS = 5
+LOCK_RETRY_DELAY = 1
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{BOOKING_TABLE}_p{month:%Y_%m}"
+
+
+def booking_partitions() -> dict[date, str]:
+    """Monthly partitions currently attached to the booking table, by first day of the month."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = %s::regclass", [BOOKING_TABLE]
+        )
+        names = [name for name, in cursor.fetchall()]
+    partitions = {}
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions[date(int(match[1]), int(match[2]), 1)] = name
+    return partitions
+
+
+def foreign_keys(table: str) -> list[str]:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'", [table])
+        return [name for name, in cursor.fetchall()]
+
+
+def run_with_lock_timeout(statements):
+    """
+    Run ``statements`` in one transaction that gives up on a lock after ``LOCK_TIMEOUT``.
+
+    A DDL statement waiting for its lock queues every booking query behind it, so
+    rather than waiting out a long transaction it is rolled back and retried.
+    """
+    for attempt in range(LOCK_ATTEMPTS):
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+                for sql, params in statements:
+                    cursor.execute(sql, params)
+            return
+        except OperationalError:
+            if attempt == LOCK_ATTEMPTS - 1:
+                raise
+            time.sleep(LOCK_RETRY_DELAY)
+
+
+def create_partitions(ahead: int, today: date = None) -> list[str]:
+    """
+    Make sure the current month and ``ahead`` following months have a partition.
+
+    Each partition is built as a plain table, the rows of its month that already fell
+    into the default partition are moved over, and then it is attached. ATTACH takes
+    ``SHARE UPDATE EXCLUSIVE`` on the booking table, but ``ACCESS EXCLUSIVE`` on the
+    default partition, which it scans to check that no row belongs to the new month.
+    Bookings in the default partition wait for that, so keep months ahead of time.
+    """
+    month = (today or timezone.localdate()).replace(day=1)
+    existing = booking_partitions()
+    created = []
+    for offset in range(ahead + 1):
+        start = add_months(month, offset)
+        if start in existing:
+            continue
+        name, end = partition_name(start), add_months(start, 1)
+        run_with_lock_timeout([
+            (f"CREATE TABLE {name} (LIKE {BOOKING_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)", []),
+            (f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE date >= %s AND date < %s RETURNING *) "
+             f"INSERT INTO {name} SELECT * FROM moved", [start, end]),
+            (f"ALTER TABLE {BOOKING_TABLE} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", [start, end]),
+        ])
+        created.append(name)
+    return created
+
+
+def detach_partitions(retain: int, today: date = None) -> list[str]:
+    """
+    Detach monthly partitions older than the ``retain`` months before the current one.
+
+    Detached partitions stay in the database as ordinary tables, out of the way of
+    every booking query, without the foreign keys that would stop users and services
+    from being deleted. DETACH takes ``ACCESS EXCLUSIVE`` on the booking table, so
+    it only waits ``LOCK_TIMEOUT`` for it at a time. ``DETACH ... CONCURRENTLY`` is
+    not an option: Postgres refuses it while the table has a default partition.
+    """
+    cutoff = add_months((today or timezone.localdate()).replace(day=1), -retain)
+    detached = []
+    for start, name in sorted(booking_partitions().items()):
+        if start >= cutoff:
+            break
+        run_with_lock_timeout([
+            (f"ALTER TABLE {BOOKING_TABLE} DETACH PARTITION {name}", []),
+            *((f"ALTER TABLE {name} DROP CONSTRAINT {constraint}", []) for constraint in foreign_keys(name)),
+        ])
+        detached.append(name)
+    return detached
@@ -0,0 +1,45 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import F, OuterRef, Subquery
+from service.models import Service, ServiceCategory
+
+TERM = re.compile(r"\w+")
+
+
+def service_search_vector():
+    """Weighted document of a service: name, then category, description and address."""
+    config = settings.SERVICE_SEARCH_CONFIG
+    category_name = Subquery(ServiceCategory.objects.filter(pk=OuterRef("category_id")).values("name")[:1])
+    return (
+        SearchVector("name", weight="A", config=config)
+        + SearchVector(category_name, weight="B", config=config)
+        + SearchVector("description", weight="C", config=config)
+        + SearchVector("address", weight="D", config=config)
+    )
+
+
+def refresh_search_vectors(services=None) -> int:
+    """Recompute ``search_vector`` of the given services queryset, or of every service, in one update."""
+    if services is None:
+        services = Service.objects.all_with_deleted()
+    return services.update(search_vector=service_search_vector())
+
+
+def search_query(text: str) -> SearchQuery | None:
+    """Every word of ``text`` has to match as a prefix, so partially typed words still find results."""
+    terms = TERM.findall(text.lower())
+    if not terms:
+        return None
+    return SearchQuery(" & ".join(f"{term}:*" for term in terms), search_type="raw",
+                       config=settings.SERVICE_SEARCH_CONFIG)
+
+
+def search_services(queryset, text: str):
+    query = search_query(text)
+    if query is None:
+        return queryset
+    return queryset.filter(search_vector=query).annotate(
+        rank=SearchRank(F("search_vector"), query)
+    ).order_by("-rank", "name")
@@ -0,0 +1,126 @@
+import struct
+import sys
+from array import array
+
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db.models import OuterRef
+from service.availability import build_slots, to_minutes, weekday_of
+from service.cache import availability_cache
+from service.models import ServiceSchedule, SlotOccupancy
+
+
+class SeatMap:
+    """
+    Remaining seats of one service day, one counter per schedule slot.
+
+    Serialises to a 4 byte header (opening minute, slot length) followed by the
+    counters as little-endian uint32, so a whole day fits in a few hundred bytes of
+    Redis. A closed day has no slots.
+    """
+    HEADER = struct.Struct("<HH")
+    TYPECODE = "I"
+
+    def __init__(self, start: int, step: int, remaining):
+        self.start = start
+        self.step = step
+        self.remaining = array(self.TYPECODE, remaining)
+
+    @classmethod
+    def build(cls, service, schedule, occupied: dict) -> "SeatMap":
+        step = int(service.duration.total_seconds() // 60)
+        slots = build_slots(schedule.start_time, schedule.end_time, service.duration)
+        remaining = [max(service.capacity - occupied.get(slot_start, 0), 0) for slot_start, _ in slots]
+        return cls(to_minutes(schedule.start_time), step, remaining)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "SeatMap":
+        start, step = cls.HEADER.unpack_from(data)
+        remaining = array(cls.TYPECODE)
+        remaining.frombytes(data[cls.HEADER.size:])
+        if sys.byteorder == "big":
+            remaining.byteswap()
+        return cls(start, step, remaining)
+
+    def to_bytes(self) -> bytes:
+        remaining = array(self.TYPECODE, self.remaining)
+        if sys.byteorder == "big":
+            remaining.byteswap()
+        return self.HEADER.pack(self.start, self.step) + remaining.tobytes()
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.remaining) * self.step
+
+    def is_open(self, start: int, end: int) -> bool:
+        return self.start <= start < end <= self.end
+
+    def slot_range(self, start: int, end: int) -> range:
+        """Indexes of the slots overlapping ``[start, end)``."""
+        first = max((start - self.start) // self.step, 0)
+        last = min(-(-(end - self.start) // self.step), len(self.remaining))
+        return range(first, last)
+
+    def available(self, start: int, end: int) -> int:
+        if not self.is_open(start, end):
+            return 0
+        slots = self.slot_range(start, end)
+        return min(self.remaining[slots.start:slots.stop])
+
+    def fits(self, start: int, end: int, seats: int) -> bool:
+        return self.available(start, end) >= seats
+
+    def without(self, held: dict) -> "SeatMap":
+        """Copy with ``held`` seats, keyed by slot start minute, taken out."""
+        remaining = array(self.TYPECODE, self.remaining)
+        for slot_start, seats in held.items():
+            index = (slot_start - self.start) // self.step if self.step else -1
+            if 0 <= index < len(remaining):
+                remaining[index] = max(remaining[index] - seats, 0)
+        return SeatMap(self.start, self.step, remaining)
+
+    def slot_seats(self, start: int, end: int) -> dict:
+        """Remaining seats of the slots overlapping ``[start, end)`` by slot start minute."""
+        return {self.start + index * self.step: self.remaining[index] for index in self.slot_range(start, end)}
+
+    def free_slots(self):
+        for index, value in enumerate(self.remaining):
+            if value > 0:
+                slot_start = self.start + index * self.step
+                yield slot_start, slot_start + self.step, value
+
+
+def get_seat_map(service_id, day) -> SeatMap:
+    """Seat map of a service day, read from Redis and loaded from the database on a miss."""
+    data = availability_cache.get_seat_map(service_id, day)
+    if data is not None:
+        return SeatMap.from_bytes(data)
+
+    seat_map = load_seat_map(service_id, day)
+    availability_cache.set_seat_map(service_id, day, seat_map.to_bytes())
+    return seat_map
+
+
+def load_seat_map(service_id, day) -> SeatMap:
+    """
+    Seat map of a service day, read from the database.
+
+    The day's schedule, its service and the occupied slots come back from a single
+    query, the occupancy rows being folded into two parallel arrays.
+    """
+    occupancy = SlotOccupancy.objects.filter(
+        service=OuterRef("service_id"), date=day, seats__gt=0
+    ).order_by("slot_start")
+    schedule = ServiceSchedule.objects.filter(service_id=service_id, weekday=weekday_of(day)).select_related(
+        "service"
+    ).annotate(
+        occupied_slots=ArraySubquery(occupancy.values("slot_start")),
+        occupied_seats=ArraySubquery(occupancy.values("seats"))
+    ).first()
+
+    if schedule is None:
+        return SeatMap(0, 0, [])
+    occupied = {
+        to_minutes(slot_start): seats
+        for slot_start, seats in zip(schedule.occupied_slots, schedule.occupied_seats)
+    }
+    return SeatMap.build(schedule.service, schedule, occupied)
@@ -1,15 +1,21 @@
 import json
 from datetime import date as date_cls
-from datetime import datetime
+from datetime import datetime, timedelta
 
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db import transaction
-from django.db.models import Sum
-from django.db.models.functions import Coalesce
+from django.utils import timezone
 from rest_framework.exceptions import ValidationError
-from rest_framework.fields import (CurrentUserDefault, HiddenField, ImageField, ListField)
-from rest_framework.serializers import ModelSerializer, TimeField, Serializer
-from service.models import (Booking, Location, Service, ServiceCategory,
-                            ServiceImage, ServiceSchedule)
+from rest_framework.fields import (CharField, CurrentUserDefault, DateField, DurationField, FloatField,
+                                   HiddenField, ImageField, IntegerField, ListField, UUIDField)
+from rest_framework.serializers import ModelSerializer, PrimaryKeyRelatedField, TimeField, Serializer
+from service.availability import booking_interval
+from service.booking import create_booking
+from service.holds import slot_holds
+from service.models import (ArchivedBooking, Booking, Location, Service, ServiceCategory,
+                            ServiceImage, ServiceSchedule, WaitlistEntry)
+from service.occupancy import deferred_rebuilds
+from service.seatmap import get_seat_map
 
 
 class ServiceCategoryModelSerializer(ModelSerializer):
@@ -186,6 +192,13 @@ class BookingHistorySerializer(ModelSerializer):
         fields = "__all__"
 
 
+class ArchivedBookingSerializer(ModelSerializer):
+    class Meta:
+        model = ArchivedBooking
+        fields = ("id", "service", "weekday", "date", "start_time", "end_time", "duration", "seats", "status",
+                  "created_at", "archived_at")
+
+
 class BookingModelSerializer(ModelSerializer):
     user = HiddenField(default=CurrentUserDefault())
 
@@ -218,19 +231,23 @@ class BookingModelSerializer(ModelSerializer):
         if seats > service.capacity:
             raise ValidationError("Seats can't exceed service capacity")
 
-        schedule_match = service.schedules.filter(
-            weekday=weekday,
-            start_time__lte=start_time,
-            end_time__gte=candidate_end_time
-        ).exists()
-        if not schedule_match:
+        day = Booking.next_date(weekday, start_time)
+        # early answer from the cached seat map, create_booking checks again under the day lock
+        # and counts held seats there
+        seat_map = get_seat_map(service.pk, day)
+        start, end = booking_interval(start_time, candidate_end_time)
+        if not seat_map.is_open(start, end):
             raise ValidationError("Service is closed at that time")
 
         service_duration = service.duration
         if duration.total_seconds() % service_duration.total_seconds() != 0:
             raise ValidationError(f"Duration must be a multiple of service duration ({service_duration}).")
 
+        if not seat_map.fits(start, end, seats):
+            raise ValidationError("Not enough capacity for this time slot")
+
         data["duration"] = duration
+        data["date"] = day
         return data
 
     def create(self, validated_data):
@@ -241,36 +258,97 @@ class BookingModelSerializer(ModelSerializer):
         duration = validated_data["duration"]
         seats = validated_data.get("seats", 1)
 
-        start_dt = datetime.combine(date_cls.min, start_time)
-        candidate_end_time = (start_dt + duration).time()
-
-        with transaction.atomic():
-            overlapping = Booking.objects.select_for_update().filter(
-                service=service,
-                weekday=weekday,
-                start_time__lt=candidate_end_time,
-                end_time__gt=start_time
-            )
-
-            total_booked = overlapping.aggregate(
-                total=Coalesce(Sum("seats"), 0)
-            )["total"] or 0
-
-            if total_booked + seats > service.capacity:
-                raise ValidationError("Not enough capacity for this time slot")
-
-            booking = Booking.objects.create(
-                service=service,
-                user=user,
-                weekday=weekday,
-                start_time=start_time,
-                duration=duration,
-                seats=seats
-            )
+        try:
+            booking = create_booking(service=service, user=user, weekday=weekday, start_time=start_time,
+                                     duration=duration, seats=seats, day=validated_data.get("date"))
+        except DjangoValidationError as e:
+            raise ValidationError(e.messages)
 
         return booking
 
 
+class SlotHoldSerializer(Serializer):
+    id = UUIDField()
+    service = UUIDField()
+    date = DateField()
+    start_time = CharField()
+    duration = FloatField(help_text="Seconds")
+    seats = IntegerField()
+    expires_at = FloatField(help_text="Unix timestamp")
+
+
+class RecurringBookingSerializer(Serializer):
+    MAX_WEEKS = 12
+
+    service = PrimaryKeyRelatedField(queryset=Service.objects.all())
+    date = DateField(help_text="Date of the first occurrence")
+    start_time = TimeField(input_formats=['%H:%M:%S', '%H:%M'])
+    duration = DurationField(required=False)
+    seats = IntegerField(min_value=1, default=1)
+    weeks = IntegerField(min_value=1, max_value=MAX_WEEKS)
+
+    def validate(self, data):
+        if timezone.make_aware(datetime.combine(data["date"], data["start_time"])) <= timezone.now():
+            raise ValidationError("Start time can't be in the past")
+        service = data["service"]
+        duration = data.get("duration") or service.duration
+        if data["seats"] > service.capacity:
+            raise ValidationError("Seats can't exceed service capacity")
+        if duration.total_seconds() % service.duration.total_seconds() != 0:
+            raise ValidationError(f"Duration must be a multiple of service duration ({service.duration}).")
+        data["duration"] = duration
+        data["days"] = [data["date"] + timedelta(weeks=week) for week in range(data["weeks"])]
+        return data
+
+
+class RecurringBookingResultSerializer(Serializer):
+    date = DateField()
+    booking = PrimaryKeyRelatedField(read_only=True, allow_null=True, pk_field=UUIDField())
+    error = CharField(allow_null=True)
+
+
+class WaitlistEntrySerializer(ModelSerializer):
+    user = HiddenField(default=CurrentUserDefault())
+    start_time = TimeField(format='%H:%M', input_formats=['%H:%M:%S', '%H:%M'])
+    duration = DurationField(required=False)
+    seats = IntegerField(min_value=1, default=1)
+    booking = PrimaryKeyRelatedField(read_only=True, pk_field=UUIDField())
+
+    class Meta:
+        model = WaitlistEntry
+        fields = ("id", "service", "user", "date", "start_time", "duration", "seats", "status", "booking")
+        read_only_fields = ("id", "status")
+
+    def validate_date(self, value):
+        if value < timezone.localdate():
+            raise ValidationError("Date can't be in the past")
+        return value
+
+    def validate(self, data):
+        service = data["service"]
+        duration = data.get("duration") or service.duration
+        if data["seats"] > service.capacity:
+            raise ValidationError("Seats can't exceed service capacity")
+        if duration.total_seconds() % service.duration.total_seconds() != 0:
+            raise ValidationError(f"Duration must be a multiple of service duration ({service.duration}).")
+
+        start_time = data["start_time"].replace(second=0, microsecond=0)
+        end_time = (datetime.combine(date_cls.min, start_time) + duration).time()
+        start, end = booking_interval(start_time, end_time)
+        seat_map = get_seat_map(service.pk, data["date"])
+        if not seat_map.is_open(start, end):
+            raise ValidationError("Service is closed at that time")
+        # waiters are only promoted when seats are freed, nothing would book this entry
+        if seat_map.without(slot_holds.held(service.pk, data["date"])).fits(start, end, data["seats"]):
+            raise ValidationError("Slot is available, book it")
+        if WaitlistEntry.objects.filter(service=service, user=data["user"], date=data["date"], start_time=start_time,
+                                        status=WaitlistEntry.StatusType.WAITING).exists():
+            raise ValidationError("You are already waiting for this slot")
+
+        data["start_time"], data["duration"] = start_time, duration
+        return data
+
+
 class ServiceUpdateModelSerializer(ModelSerializer):
     owner = HiddenField(default=CurrentUserDefault())
     location = LocationModelSerializer(required=False)
@@ -339,47 +417,96 @@ class ServiceUpdateModelSerializer(ModelSerializer):
                         if not schedules_data:
                             schedules_data = []
 
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
+        # one rebuild of the changed weekdays' occupancy for all the schedule saves below
+        with transaction.atomic(), deferred_rebuilds():
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
 
-        if location_data:
-            try:
-                loc = instance.location
-            except Exception:
-                loc = getattr(instance, "location", None)
-            if loc and getattr(loc, "pk", None):
-                for k, v in location_data.items():
-                    setattr(loc, k, v)
-                loc.save()
-            else:
-                Location.objects.create(service=instance, **location_data)
-        if schedules_data:
-            for sch in schedules_data:
-                if not isinstance(sch, dict):
-                    continue
-                weekday = sch.get("weekday")
-                start_time = sch.get("start_time")
-                end_time = sch.get("end_time")
-                if not weekday or start_time is None or end_time is None:
-                    continue
-                weekday_normalized = str(weekday).lower()
-                existing = ServiceSchedule.objects.filter(service=instance, weekday=weekday_normalized).first()
-                if existing:
-                    existing.start_time = start_time
-                    existing.end_time = end_time
-                    existing.save(update_fields=["start_time", "end_time"])
+            if location_data:
+                try:
+                    loc = instance.location
+                except Exception:
+                    loc = getattr(instance, "location", None)
+                if loc and getattr(loc, "pk", None):
+                    for k, v in location_data.items():
+                        setattr(loc, k, v)
+                    loc.save()
                 else:
-                    ServiceSchedule.objects.create(
-                        service=instance,
-                        weekday=weekday_normalized,
-                        start_time=start_time,
-                        end_time=end_time
-                    )
+                    Location.objects.create(service=instance, **location_data)
+            if schedules_data:
+                for sch in schedules_data:
+                    if not isinstance(sch, dict):
+                        continue
+                    weekday = sch.get("weekday")
+                    start_time = sch.get("start_time")
+                    end_time = sch.get("end_time")
+                    if not weekday or start_time is None or end_time is None:
+                        continue
+                    weekday_normalized = str(weekday).lower()
+                    existing = ServiceSchedule.objects.filter(service=instance, weekday=weekday_normalized).first()
+                    if existing:
+                        existing.start_time = start_time
+                        existing.end_time = end_time
+                        existing.save(update_fields=["start_time", "end_time"])
+                    else:
+                        ServiceSchedule.objects.create(
+                            service=instance,
+                            weekday=weekday_normalized,
+                            start_time=start_time,
+                            end_time=end_time
+                        )
         return instance
 
 
 class BookingSerializer(ModelSerializer):
     class Meta:
         model = Booking
-        fields = "__all__"
\ No newline at end of file
+        fields = "__all__"
+
+
+class AvailabilityRangeSerializer(Serializer):
+    MAX_DAYS = 180
+
+    def get_fields(self):
+        # "from" is a keyword, so the fields can't be declared as attributes
+        return {"from": DateField(), "to": DateField()}
+
+    def validate(self, data):
+        if data["from"] > data["to"]:
+            raise ValidationError("'from' must not be after 'to'")
+        if (data["to"] - data["from"]).days >= self.MAX_DAYS:
+            raise ValidationError(f"Range can't be longer than {self.MAX_DAYS} days")
+        return data
+
+
+class BatchAvailabilitySerializer(Serializer):
+    services = ListField(child=UUIDField(), min_length=1, max_length=50)
+    date = DateField()
+
+    def validate_services(self, value):
+        return list(dict.fromkeys(value))
+
+
+class NextAvailableQuerySerializer(Serializer):
+    limit = IntegerField(min_value=1, max_value=100, default=10)
+    days = IntegerField(min_value=1, max_value=30, default=7)
+
+
+class NextAvailableServiceSerializer(ModelSerializer):
+    class Meta:
+        model = Service
+        fields = ("id", "name", "address", "price", "capacity", "duration")
+
+
+class NextAvailableSerializer(Serializer):
+    service = NextAvailableServiceSerializer()
+    date = CharField()
+    time = CharField()
+    available_capacity = IntegerField()
+
+
+class OccupancyHeatmapSerializer(Serializer):
+    weekday = CharField()
+    hour = IntegerField()
+    utilisation = FloatField()
@@ -0,0 +1,120 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from service import occupancy, outbox, search
+from service.cache import availability_cache
+from service.models import (Booking, Service, ServiceCategory, ServiceSchedule,
+                            WeekdayChoices)
+
+
+@receiver(pre_save, sender=Booking)
+def remember_booking_state(sender, instance, raw=False, **kwargs):
+    instance._previous_state = None
+    if raw or instance._state.adding:
+        return
+    previous = Booking.objects.filter(pk=instance.pk).values_list(
+        "service_id", "date", "start_time", "end_time", "seats", "status"
+    ).first()
+    if previous:
+        *state, seats, status = previous
+        instance._previous_state = (*state, seats if status in Booking.OCCUPYING_STATUSES else 0)
+
+
+@receiver(post_save, sender=Booking)
+def update_booking_occupancy(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_previous_state", None)
+    occupancy.sync_booking(previous, instance)
+
+    transaction.on_commit(partial(availability_cache.invalidate, instance.service_id, instance.date))
+    if previous and previous[:2] != (instance.service_id, instance.date):
+        transaction.on_commit(partial(availability_cache.invalidate, *previous[:2]))
+
+
+@receiver(post_save, sender=Booking)
+def notify_provider(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        outbox.enqueue_booking_created([instance.pk])
+
+
+@receiver(post_delete, sender=Booking)
+def release_booking_occupancy(sender, instance, **kwargs):
+    occupancy.release_booking(instance)
+    transaction.on_commit(partial(availability_cache.invalidate, instance.service_id, instance.date))
+
+
+@receiver(pre_save, sender=Service)
+def remember_service_duration(sender, instance, raw=False, **kwargs):
+    instance._previous_duration = None
+    if raw or instance._state.adding:
+        return
+    instance._previous_duration = Service.objects.all_with_deleted().filter(pk=instance.pk).values_list(
+        "duration", flat=True
+    ).first()
+
+
+@receiver(post_save, sender=Service)
+def update_service_search_vector(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.refresh_search_vectors(Service.objects.all_with_deleted().filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=ServiceCategory)
+def update_category_search_vectors(sender, instance, created=False, raw=False, **kwargs):
+    if not raw and not created:
+        search.refresh_search_vectors(Service.objects.all_with_deleted().filter(category=instance))
+
+
+@receiver(pre_delete, sender=ServiceCategory)
+def remember_category_services(sender, instance, **kwargs):
+    instance._service_ids = list(Service.objects.all_with_deleted().filter(category=instance).values_list(
+        "pk", flat=True
+    ))
+
+
+@receiver(post_delete, sender=ServiceCategory)
+def clear_category_search_vectors(sender, instance, **kwargs):
+    search.refresh_search_vectors(Service.objects.all_with_deleted().filter(pk__in=instance._service_ids))
+
+
+@receiver(post_save, sender=Service)
+def rebuild_service_occupancy(sender, instance, created=False, raw=False, **kwargs):
+    if raw or created:
+        return
+    previous = getattr(instance, "_previous_duration", None)
+    if previous is not None and previous != instance.duration:
+        occupancy.request_rebuild(instance.pk, WeekdayChoices.values)
+    # capacity, duration or soft delete may all change what is free
+    transaction.on_commit(partial(availability_cache.invalidate_service, instance.pk))
+
+
+@receiver(pre_save, sender=ServiceSchedule)
+def remember_schedule_state(sender, instance, raw=False, **kwargs):
+    instance._previous_state = None
+    if not raw and not instance._state.adding:
+        instance._previous_state = ServiceSchedule.objects.filter(pk=instance.pk).values_list(
+            "weekday", "start_time", "end_time"
+        ).first()
+
+
+@receiver(post_save, sender=ServiceSchedule)
+def rebuild_schedule_occupancy(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_previous_state", None)
+    if previous == (instance.weekday, instance.start_time, instance.end_time):
+        return
+    weekdays = {instance.weekday, previous[0]} if previous else {instance.weekday}
+    occupancy.request_rebuild(instance.service_id, weekdays)
+    transaction.on_commit(partial(availability_cache.invalidate_service, instance.service_id))
+
+
+@receiver(post_delete, sender=ServiceSchedule)
+def rebuild_deleted_schedule_occupancy(sender, instance, origin=None, **kwargs):
+    # nothing to rebuild when the schedule goes away together with its service
+    if getattr(origin, "model", type(origin)) is ServiceSchedule:
+        occupancy.request_rebuild(instance.service_id, [instance.weekday])
+        transaction.on_commit(partial(availability_cache.invalidate_service, instance.service_id))
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from service.models import Booking
+
+
+def mark_passed(batch_size: int = None, now=None) -> int:
+    """
+    Move bookings that ended before ``now`` from pending to passed.
+
+    Every batch is one ``UPDATE`` over the ids picked through the ``(status, date)``
+    index, committed on its own so row locks stay short. Returns the number of
+    bookings moved. Seats stay taken, passed bookings still occupy their slots.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or settings.BOOKING_SWEEP_BATCH_SIZE
+    total = 0
+    while True:
+        with transaction.atomic():
+            batch = Booking.objects.finished(now).order_by("date").values("pk")[:batch_size]
+            updated = Booking.objects.filter(pk__in=batch).update(status=Booking.StatusType.PASSED, updated_at=now)
+        total += updated
+        if updated < batch_size:
+            return total
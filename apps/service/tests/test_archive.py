@@ -0,0 +1,81 @@
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.urls import reverse_lazy
+from django.utils import timezone
+from rest_framework import status
+from service.archive import archive_bookings
+from service.models import ArchivedBooking, Booking, Service
+from users.models import User
+
+CUTOFF = date(2030, 1, 1)
+
+
+@pytest.mark.django_db
+class TestArchiveBookings:
+
+    @pytest.fixture(autouse=True)
+    def now(self):
+        with patch("django.utils.timezone.now", return_value=timezone.make_aware(datetime(2030, 1, 2, 12))):
+            yield
+
+    @pytest.fixture
+    def user(self):
+        return User.objects.create_user(phone_number="998900000070", password="1", type=User.Type.PROVIDER)
+
+    @pytest.fixture
+    def bookings(self, user):
+        service = Service.objects.create(owner=user, name="Cinema", address="Mall", capacity=50,
+                                         duration=timedelta(minutes=60), price=1000)
+        days = [CUTOFF - timedelta(days=offset) for offset in (40, 30, 20, 10, 1, 0)] + [CUTOFF + timedelta(days=3)]
+        return [
+            Booking.objects.create(service=service, user=user, weekday=day.strftime("%A").lower(), date=day,
+                                   start_time=time(10, 0), duration=timedelta(minutes=60))
+            for day in days
+        ]
+
+    def test_moves_old_bookings_in_batches(self, bookings, django_assert_num_queries):
+        out = StringIO()
+        # count, then three batches each one statement inside a savepoint
+        with django_assert_num_queries(10):
+            call_command("archive_bookings", before=CUTOFF, batch_size=2, stdout=out)
+
+        lines = out.getvalue().splitlines()
+        assert lines[0] == "5 bookings before 2030-01-01 to archive"
+        assert [line.split()[1] for line in lines[1:-1]] == ["2/5", "4/5", "5/5"]
+        assert lines[-1] == "Archived 5 bookings"
+        assert set(Booking.objects.values_list("pk", flat=True)) == {bookings[-2].pk, bookings[-1].pk}
+
+        archived = ArchivedBooking.objects.get(pk=bookings[0].pk)
+        assert (archived.date, archived.start_time, archived.user_id, archived.status) == (
+            bookings[0].date, time(10, 0), bookings[0].user_id, Booking.StatusType.PENDING
+        )
+        assert archived.period == bookings[0].period
+
+    @pytest.mark.parametrize("options", [{"before": date(2030, 1, 3)}, {"days": -1}])
+    def test_refuses_future_cutoff(self, bookings, options):
+        with pytest.raises(CommandError):
+            call_command("archive_bookings", stdout=StringIO(), **options)
+        assert Booking.objects.count() == len(bookings)
+
+    def test_keeps_upcoming_pending_bookings(self, bookings):
+        assert sum(archive_bookings(date(2030, 2, 1), batch_size=10)) == 6
+        assert list(Booking.objects.values_list("pk", flat=True)) == [bookings[-1].pk]
+
+    def test_archive_endpoint(self, client, user, bookings):
+        call_command("archive_bookings", before=CUTOFF, stdout=StringIO())
+        other = User.objects.create_user(phone_number="998900000071", password="1")
+
+        client.force_login(user)
+        response = client.get(reverse_lazy("users-booking-archive"))
+        assert response.status_code == status.HTTP_200_OK
+        assert [row["date"] for row in response.json()["results"]] == [
+            "2029-12-31", "2029-12-22", "2029-12-12", "2029-12-02", "2029-11-22"
+        ]
+        assert client.post(reverse_lazy("users-booking-archive")).status_code == status.HTTP_405_METHOD_NOT_ALLOWED
+
+        client.force_login(other)
+        assert client.get(reverse_lazy("users-booking-archive")).json()["results"] == []
@@ -0,0 +1,84 @@
+from datetime import date, time, timedelta
+
+import pytest
+
+from service.availability import (booking_interval, build_slots, free_slots,
+                                  next_available)
+from service.models import Booking, Service, ServiceSchedule
+from users.models import User
+
+MONDAY = date(2030, 1, 7)
+
+
+class TestAvailabilityEngine:
+
+    def test_build_slots(self):
+        slots = build_slots(time(9, 0), time(11, 0), timedelta(minutes=30))
+        assert slots == [(540, 570), (570, 600), (600, 630), (630, 660)]
+
+    def test_build_slots_drops_partial_tail(self):
+        slots = build_slots(time(9, 0), time(10, 45), timedelta(minutes=30))
+        assert slots[-1] == (600, 630)
+
+    def test_booking_interval_past_midnight(self):
+        assert booking_interval(time(23, 30), time(0, 30)) == (1410, 1470)
+
+    def test_free_slots_skips_full_slots(self):
+        slots = build_slots(time(9, 0), time(11, 0), timedelta(minutes=60))
+        result = free_slots(slots, [2, 1], capacity=2)
+        assert result == [{"time": "10:00 - 11:00", "available_capacity": 1}]
+
+
+@pytest.mark.django_db
+class TestNextAvailable:
+
+    @pytest.fixture
+    def user(self):
+        return User.objects.create_user(phone_number="998900000012", password="1", type=User.Type.PROVIDER)
+
+    def _service(self, user, name, schedules, capacity=1):
+        service = Service.objects.create(owner=user, name=name, address="Street", capacity=capacity,
+                                         duration=timedelta(minutes=60), price=1000)
+        for weekday, start_time, end_time in schedules:
+            ServiceSchedule.objects.create(service=service, weekday=weekday, start_time=start_time, end_time=end_time)
+        return service
+
+    def _services(self):
+        return Service.objects.order_by("name").prefetch_related("schedules")
+
+    def test_orders_by_earliest_free_slot(self, user):
+        late = self._service(user, "Late", [("monday", time(14, 0), time(16, 0))])
+        busy = self._service(user, "Busy", [("monday", time(9, 0), time(11, 0))])
+        tomorrow = self._service(user, "Tomorrow", [("tuesday", time(8, 0), time(9, 0))])
+        Booking.objects.create(service=busy, user=user, weekday="monday", date=MONDAY, start_time=time(9, 0),
+                               duration=timedelta(minutes=60))
+
+        result = next_available(self._services(), MONDAY, days=7, limit=10)
+
+        assert [(item["service"], item["date"], item["time"]) for item in result] == [
+            (busy, "2030-01-07", "10:00 - 11:00"),
+            (late, "2030-01-07", "14:00 - 15:00"),
+            (tomorrow, "2030-01-08", "08:00 - 09:00"),
+        ]
+
+    def test_skips_past_slots_and_full_days(self, user):
+        service = self._service(user, "Gym", [("monday", time(9, 0), time(11, 0)),
+                                              ("tuesday", time(9, 0), time(10, 0))])
+        Booking.objects.create(service=service, user=user, weekday="monday", date=MONDAY, start_time=time(10, 0),
+                               duration=timedelta(minutes=60))
+
+        result = next_available(self._services(), MONDAY, days=7, limit=10, after=9 * 60 + 30)
+
+        assert [(item["date"], item["time"]) for item in result] == [("2030-01-08", "09:00 - 10:00")]
+
+    def test_stops_at_limit_and_horizon(self, user, django_assert_num_queries):
+        for index in range(5):
+            self._service(user, f"Court {index}", [("monday", time(9 + index, 0), time(10 + index, 0))])
+        self._service(user, "Sunday only", [("sunday", time(9, 0), time(10, 0))])
+
+        with django_assert_num_queries(3):
+            result = next_available(self._services(), MONDAY, days=3, limit=2)
+        assert [item["service"].name for item in result] == ["Court 0", "Court 1"]
+
+        result = next_available(self._services(), MONDAY, days=3, limit=10)
+        assert len(result) == 5
@@ -0,0 +1,129 @@
+import threading
+import uuid
+from datetime import date, time, timedelta
+from unittest.mock import patch
+
+import pytest
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.urls import reverse_lazy
+from rest_framework import status
+from service.booking import create_booking
+from service.cache import availability_cache
+from service.holds import slot_holds
+from service.models import (Booking, Service, ServiceSchedule, SlotOccupancy,
+                            WeekdayChoices)
+from service.occupancy import LOCK_KEY_MASK, lock_service_day
+from service.seatmap import get_seat_map
+from users.models import User
+
+MONDAY = date(2030, 1, 7)
+
+
+def try_lock(service_id, day) -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_xact_lock(%s, %s)", [service_id.int & LOCK_KEY_MASK, day.toordinal()])
+        return cursor.fetchone()[0]
+
+
+@pytest.mark.django_db
+class TestCreateBooking:
+
+    @pytest.fixture
+    def user(self):
+        return User.objects.create_user(phone_number="998900000018", password="1", type=User.Type.PROVIDER)
+
+    @pytest.fixture
+    def service(self, user):
+        service = Service.objects.create(owner=user, name="Karting", address="Track", capacity=2,
+                                         duration=timedelta(minutes=30), price=1000)
+        ServiceSchedule.objects.create(service=service, weekday="monday", start_time=time(9, 0), end_time=time(12, 0))
+        return service
+
+    def _book(self, service, user, seats=1):
+        return create_booking(service=service, user=user, weekday="monday", start_time=time(10, 0),
+                              duration=timedelta(minutes=30), seats=seats, day=MONDAY)
+
+    def test_books_in_one_statement(self, service, user, django_assert_num_queries):
+        # the savepoint pair comes from the surrounding test transaction
+        with django_assert_num_queries(3) as context:
+            booking = self._book(service, user, seats=2)
+        statement = context.captured_queries[1]["sql"]
+        assert "pg_advisory_xact_lock" in statement and "INSERT INTO" in statement
+
+        stored = Booking.objects.get()
+        assert booking == stored
+        assert (booking.date, booking.end_time, booking.seats) == (MONDAY, time(10, 30), 2)
+        assert stored.period == Booking.make_period(MONDAY, time(10, 0), timedelta(minutes=30))
+        assert list(SlotOccupancy.objects.values_list("slot_start", "seats")) == [(time(10, 0), 2)]
+
+    def test_refuses_when_full(self, service, user):
+        self._book(service, user, seats=2)
+        with pytest.raises(ValidationError):
+            self._book(service, user)
+        assert Booking.objects.count() == 1
+
+    def test_partial_fit_rolls_back(self, service, user):
+        self._book(service, user, seats=2)
+        with pytest.raises(ValidationError, match="capacity"):
+            create_booking(service=service, user=user, weekday="monday", start_time=time(9, 30),
+                           duration=timedelta(minutes=60), seats=1, day=MONDAY)
+        assert dict(SlotOccupancy.objects.values_list("slot_start", "seats")) == {time(10, 0): 2}
+
+    def test_refuses_outside_schedule(self, service, user):
+        with pytest.raises(ValidationError, match="closed"):
+            create_booking(service=service, user=user, weekday="monday", start_time=time(11, 30),
+                           duration=timedelta(minutes=60), seats=1, day=MONDAY)
+        with pytest.raises(ValidationError, match="closed"):
+            create_booking(service=service, user=user, weekday="tuesday", start_time=time(10, 0),
+                           duration=timedelta(minutes=30), seats=1, day=MONDAY + timedelta(days=1))
+        assert not Booking.objects.exists()
+
+
+@pytest.mark.django_db
+def test_booking_endpoint_round_trips(client, django_assert_num_queries):
+    user = User.objects.create_user(phone_number="998900000025", password="1", type=User.Type.PROVIDER)
+    service = Service.objects.create(owner=user, name="Paintball", address="Field", capacity=2,
+                                     duration=timedelta(minutes=30), price=1000)
+    for weekday in WeekdayChoices.values:
+        ServiceSchedule.objects.create(service=service, weekday=weekday, start_time=time(0, 0), end_time=time(23, 30))
+    client.force_login(user)
+    payload = {"service": str(service.pk), "weekday": "monday", "start_time": "10:00", "duration": "00:30:00"}
+    get_seat_map(service.pk, Booking.next_date("monday", time(10, 0)))
+
+    with patch.object(slot_holds, "held", wraps=slot_holds.held) as held, \
+            patch.object(availability_cache, "get_seat_map", wraps=availability_cache.get_seat_map) as cached:
+        # session and user, the service, then BOOK_SQL between the test transaction's savepoints,
+        # the seat map comes from Redis
+        with django_assert_num_queries(6) as context:
+            response = client.post(reverse_lazy("booking-create"), payload, content_type="application/json")
+    assert response.status_code == status.HTTP_201_CREATED
+    assert "pg_advisory_xact_lock" in context.captured_queries[4]["sql"]
+    cached.assert_called_once()
+    held.assert_called_once()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_lock_is_per_service_day():
+    service_id = uuid.uuid4()
+    locked, release = threading.Event(), threading.Event()
+
+    def hold():
+        with transaction.atomic():
+            lock_service_day(service_id, MONDAY)
+            locked.set()
+            release.wait(5)
+        connection.close()
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    locked.wait(5)
+    try:
+        with transaction.atomic():
+            assert not try_lock(service_id, MONDAY)
+        with transaction.atomic():
+            assert try_lock(service_id, MONDAY + timedelta(days=7))
+            assert try_lock(uuid.uuid4(), MONDAY)
+    finally:
+        release.set()
+        holder.join()
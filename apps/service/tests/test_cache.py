@@ -0,0 +1,81 @@
+from datetime import date, time, timedelta
+
+from unittest.mock import patch
+
+import pytest
+
+from service.availability import iter_availability
+from service.cache import availability_cache
+from service.models import Booking, Service, ServiceSchedule
+from users.models import User
+
+MONDAY = date(2030, 1, 7)
+NEXT_MONDAY = date(2030, 1, 14)
+
+
+@pytest.mark.django_db
+class TestAvailabilityCache:
+
+    @pytest.fixture
+    def user(self):
+        return User.objects.create_user(phone_number="998900000011", password="1", type=User.Type.PROVIDER)
+
+    @pytest.fixture
+    def service(self, user):
+        service = Service.objects.create(owner=user, name="Pool", address="Street 2", capacity=2,
+                                         duration=timedelta(minutes=60), price=1000)
+        ServiceSchedule.objects.create(service=service, weekday="monday", start_time=time(9, 0), end_time=time(11, 0))
+        return Service.objects.prefetch_related("schedules").get(pk=service.pk)
+
+    def _free_time(self, service, day):
+        return [slot["time"] for slot in next(iter_availability(service, day, day))["free_time"]]
+
+    def test_second_read_skips_database(self, service, django_assert_num_queries):
+        list(iter_availability(service, MONDAY, NEXT_MONDAY))
+        with django_assert_num_queries(0):
+            days = list(iter_availability(service, MONDAY, NEXT_MONDAY))
+        assert [day["date"] for day in days] == ["2030-01-07", "2030-01-14"]
+
+    def test_booking_invalidates_only_its_date(self, service, user, django_capture_on_commit_callbacks):
+        list(iter_availability(service, MONDAY, NEXT_MONDAY))
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Booking.objects.create(service=service, user=user, weekday="monday", date=MONDAY,
+                                   start_time=time(9, 0), duration=timedelta(minutes=60), seats=2)
+
+        cached = availability_cache.get_many([(service.pk, MONDAY), (service.pk, NEXT_MONDAY)])
+        assert (service.pk, MONDAY) not in cached
+        assert (service.pk, NEXT_MONDAY) in cached
+        assert self._free_time(service, MONDAY) == ["10:00 - 11:00"]
+
+    def test_booking_delete_invalidates(self, service, user, django_capture_on_commit_callbacks):
+        booking = Booking.objects.create(service=service, user=user, weekday="monday", date=MONDAY,
+                                         start_time=time(9, 0), duration=timedelta(minutes=60), seats=2)
+        assert self._free_time(service, MONDAY) == ["10:00 - 11:00"]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            booking.delete()
+        assert self._free_time(service, MONDAY) == ["09:00 - 10:00", "10:00 - 11:00"]
+
+    def test_hit_and_miss_counters(self, service):
+        before = availability_cache.stats()
+        list(iter_availability(service, MONDAY, MONDAY + timedelta(days=6)))
+        list(iter_availability(service, MONDAY, MONDAY + timedelta(days=6)))
+        after = availability_cache.stats()
+
+        assert after["misses"] - before["misses"] == 7
+        assert after["hits"] - before["hits"] == 7
+
+    def test_service_change_drops_every_cached_date(self, service, django_capture_on_commit_callbacks,
+                                                    django_assert_num_queries):
+        list(iter_availability(service, MONDAY, NEXT_MONDAY))
+        with patch.object(availability_cache.redis_client, "scan_iter") as scan:
+            with django_capture_on_commit_callbacks(execute=True):
+                service.capacity = 1
+                service.save()
+        scan.assert_not_called()
+        assert availability_cache.get_many([(service.pk, MONDAY), (service.pk, NEXT_MONDAY)]) == {}
+
+        list(iter_availability(service, MONDAY, NEXT_MONDAY))
+        with django_assert_num_queries(0):
+            list(iter_availability(service, MONDAY, NEXT_MONDAY))
@@ -0,0 +1,150 @@
+import time as clock
+import uuid
+from datetime import date, time, timedelta
+
+import pytest
+from django.core.exceptions import ValidationError
+from django.urls import reverse_lazy
+from rest_framework import status
+from service.booking import create_booking, create_recurring_bookings
+from service.holds import slot_holds
+from service.models import Booking, Service, ServiceSchedule
+from users.models import User
+
+MONDAY = date(2030, 1, 7)
+
+
+class TestSlotHolds:
+
+    def _hold(self, service_id, seats, free):
+        return slot_holds.hold(service_id=service_id, day=MONDAY, start_time=time(10, 0),
+                               duration=timedelta(minutes=60), seats=seats, user_id=1, free=free)
+
+    def test_holds_take_seats_atomically(self):
+        service_id = uuid.uuid4()
+        free = {600: 3, 630: 2}
+        assert self._hold(service_id, 2, free)
+        assert self._hold(service_id, 1, free) is None
+        assert slot_holds.held(service_id, MONDAY) == {600: 2, 630: 2}
+
+    def test_release_returns_seats(self):
+        service_id = uuid.uuid4()
+        hold = self._hold(service_id, 2, {600: 2})
+        assert slot_holds.release(hold)
+        assert not slot_holds.release(hold)
+        assert slot_holds.held(service_id, MONDAY) == {}
+        assert slot_holds.get(hold["id"], 1) is None
+
+    def test_claim_is_single_use(self):
+        service_id = uuid.uuid4()
+        hold = self._hold(service_id, 2, {600: 2})
+        assert slot_holds.claim(hold["id"], 2) is None
+        assert slot_holds.claim(hold["id"], 1) == hold
+        assert slot_holds.claim(hold["id"], 1) is None
+        # claimed seats stay held until released
+        assert slot_holds.held(service_id, MONDAY) == {600: 2}
+
+        slot_holds.restore(hold)
+        assert slot_holds.get(hold["id"], 1) == hold
+
+    def test_held_excludes_own_hold(self):
+        service_id = uuid.uuid4()
+        own = self._hold(service_id, 2, {600: 3, 630: 3})
+        self._hold(service_id, 1, {600: 3, 630: 3})
+        assert slot_holds.held(service_id, MONDAY, exclude=own["id"]) == {600: 1, 630: 1}
+        assert slot_holds.held(service_id, MONDAY, exclude=uuid.uuid4()) == {600: 3, 630: 3}
+
+    def test_expired_holds_free_their_seats(self, monkeypatch):
+        service_id = uuid.uuid4()
+        self._hold(service_id, 2, {600: 2})
+        later = clock.time() + slot_holds.expire + 1
+        monkeypatch.setattr("service.holds.time.time", lambda: later)
+
+        assert slot_holds.held(service_id, MONDAY) == {}
+        assert self._hold(service_id, 2, {600: 2})
+
+
+@pytest.mark.django_db
+class TestSlotHoldAPI:
+
+    @pytest.fixture
+    def user(self):
+        return User.objects.create_user(phone_number="998900000021", password="1", type=User.Type.PROVIDER)
+
+    @pytest.fixture
+    def service(self, user):
+        service = Service.objects.create(owner=user, name="Escape room", address="Basement", capacity=2,
+                                         duration=timedelta(minutes=60), price=50000)
+        ServiceSchedule.objects.create(service=service, weekday="monday", start_time=time(9, 0), end_time=time(12, 0))
+        return service
+
+    def _payload(self, service, seats=2):
+        return {"service": str(service.pk), "weekday": "monday", "start_time": "10:00", "duration": "01:00:00",
+                "seats": seats}
+
+    def _hold(self, client, service, seats=2):
+        return client.post(reverse_lazy("booking-hold-create"), self._payload(service, seats),
+                           content_type="application/json")
+
+    def test_hold_blocks_others_until_confirmed(self, client, user, service, django_capture_on_commit_callbacks):
+        client.force_login(user)
+        response = self._hold(client, service)
+        assert response.status_code == status.HTTP_201_CREATED
+        hold = response.json()
+        assert Booking.objects.count() == 0
+
+        assert self._hold(client, service, seats=1).status_code == status.HTTP_400_BAD_REQUEST
+        booking = client.post(reverse_lazy("booking-create"), self._payload(service, 1),
+                              content_type="application/json")
+        assert booking.status_code == status.HTTP_400_BAD_REQUEST
+
+        with django_capture_on_commit_callbacks(execute=True):
+            confirm = client.post(reverse_lazy("booking-hold-confirm", kwargs={"pk": hold["id"]}))
+        assert confirm.status_code == status.HTTP_201_CREATED
+        booking = Booking.objects.get()
+        assert (booking.date.isoformat(), booking.start_time, booking.seats) == (hold["date"], time(10, 0), 2)
+        assert slot_holds.held(service.pk, booking.date) == {}
+
+        again = client.post(reverse_lazy("booking-hold-confirm", kwargs={"pk": hold["id"]}))
+        assert again.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_other_booking_paths_respect_holds(self, client, user, service):
+        client.force_login(user)
+        hold = self._hold(client, service).json()
+        day = date.fromisoformat(hold["date"])
+
+        with pytest.raises(ValidationError, match="capacity"):
+            create_booking(service=service, user=user, weekday="monday", start_time=time(10, 0),
+                           duration=timedelta(minutes=60), day=day)
+        results = create_recurring_bookings(service=service, user=user, start_time=time(10, 0),
+                                            duration=timedelta(minutes=60), seats=1, days=[day])
+        assert results[0]["error"] == "Not enough capacity for this time slot"
+        assert not Booking.objects.exists()
+
+        confirm = client.post(reverse_lazy("booking-hold-confirm", kwargs={"pk": hold["id"]}))
+        assert confirm.status_code == status.HTTP_201_CREATED
+
+    def test_failed_confirm_keeps_hold(self, client, user, service):
+        client.force_login(user)
+        hold = self._hold(client, service).json()
+        ServiceSchedule.objects.filter(service=service).update(start_time=time(11, 0))
+
+        confirm = client.post(reverse_lazy("booking-hold-confirm", kwargs={"pk": hold["id"]}))
+        assert confirm.status_code == status.HTTP_400_BAD_REQUEST
+        assert slot_holds.get(hold["id"], user.pk) is not None
+        assert not Booking.objects.exists()
+
+    def test_cancel_hold(self, client, user, service):
+        client.force_login(user)
+        hold = self._hold(client, service).json()
+        response = client.delete(reverse_lazy("booking-hold-destroy", kwargs={"pk": hold["id"]}))
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert self._hold(client, service).status_code == status.HTTP_201_CREATED
+
+    def test_other_users_hold(self, client, user, service):
+        client.force_login(user)
+        hold = self._hold(client, service).json()
+        other = User.objects.create_user(phone_number="998900000022", password="1")
+        client.force_login(other)
+        response = client.post(reverse_lazy("booking-hold-confirm", kwargs={"pk": hold["id"]}))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,86 @@
+import threading
+import uuid
+from datetime import time, timedelta
+
+import pytest
+from django.urls import reverse_lazy
+from rest_framework import status
+from service.idempotency import IdempotencyConflict, IdempotencyStore, idempotency_store
+from service.models import Booking, Service, ServiceSchedule
+from users.models import User
+
+
+@pytest.mark.django_db
+class TestBookingIdempotency:
+
+    @pytest.fixture
+    def user(self):
+        return User.objects.create_user(phone_number="998900000020", password="1", type=User.Type.PROVIDER)
+
+    @pytest.fixture
+    def service(self, user):
+        service = Service.objects.create(owner=user, name="Yoga", address="Studio", capacity=5,
+                                         duration=timedelta(minutes=60), price=10000)
+        ServiceSchedule.objects.create(service=service, weekday="monday", start_time=time(9, 0), end_time=time(12, 0))
+        return service
+
+    def _post(self, client, service, key=None, seats=1):
+        headers = {"Idempotency-Key": key} if key else {}
+        data = {"service": str(service.pk), "weekday": "monday", "start_time": "10:00", "duration": "01:00:00",
+                "seats": seats}
+        return client.post(reverse_lazy("booking-create"), data, content_type="application/json", headers=headers)
+
+    def test_retry_replays_stored_response(self, client, user, service, django_assert_num_queries):
+        client.force_login(user)
+        key = str(uuid.uuid4())
+        first = self._post(client, service, key)
+        assert first.status_code == status.HTTP_201_CREATED
+
+        # session and user lookups only
+        with django_assert_num_queries(2):
+            retry = self._post(client, service, key)
+        assert retry.status_code == status.HTTP_201_CREATED
+        assert retry.json() == first.json()
+        assert retry.headers["Idempotent-Replayed"] == "true"
+        assert Booking.objects.count() == 1
+
+    def test_key_reused_with_other_payload(self, client, user, service):
+        client.force_login(user)
+        key = str(uuid.uuid4())
+        self._post(client, service, key)
+        response = self._post(client, service, key, seats=2)
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert Booking.objects.count() == 1
+
+    def test_failed_request_releases_key(self, client, user, service):
+        client.force_login(user)
+        key = str(uuid.uuid4())
+        assert self._post(client, service, key, seats=6).status_code == status.HTTP_400_BAD_REQUEST
+        assert self._post(client, service, key, seats=6).status_code == status.HTTP_400_BAD_REQUEST
+        assert self._post(client, service, key).status_code == status.HTTP_201_CREATED
+
+    def test_without_key(self, client, user, service):
+        client.force_login(user)
+        self._post(client, service)
+        self._post(client, service)
+        assert Booking.objects.count() == 2
+
+
+class TestIdempotencyStore:
+
+    def test_duplicate_waits_for_first_response(self):
+        scope = str(uuid.uuid4())
+        assert idempotency_store.begin(scope, "abc") is None
+
+        timer = threading.Timer(0.2, idempotency_store.save, args=(scope, "abc", 201, {"id": 1}))
+        timer.start()
+        stored = idempotency_store.begin(scope, "abc")
+        timer.join()
+        assert stored == {"fingerprint": "abc", "status": 201, "data": {"id": 1}}
+
+    def test_gives_up_after_timeout(self):
+        store = IdempotencyStore(wait=0.1)
+        scope = str(uuid.uuid4())
+        assert store.begin(scope, "abc") is None
+        with pytest.raises(IdempotencyConflict):
+            store.begin(scope, "abc")
@@ -1,8 +1,9 @@
-from datetime import time, timedelta, datetime
+from datetime import date, datetime, time, timedelta
 
 import pytest
 from django.core.exceptions import ValidationError
 from django.test import TestCase  # noqa
+from django.utils import timezone
 
 from service.models import ServiceCategory, Service, ServiceImage, Location, ServiceSchedule, Booking
 from users.models import User, RoleChange
@@ -193,6 +194,17 @@ class TestServiceModels:
         assert booking.end_time.hour == expected_end.hour
         assert booking.end_time.minute == expected_end.minute
 
+    def test_booking_period_follows_date_and_wraps_midnight(self, service, user):
+        booking = Booking.objects.create(service=service, user=user, weekday="monday", date=date(2030, 1, 7),
+                                         start_time=time(23, 30), duration=timedelta(minutes=60))
+        start = timezone.make_aware(datetime(2030, 1, 7, 23, 30))
+        assert (booking.period.lower, booking.period.upper) == (start, start + timedelta(minutes=60))
+
+        booking.date = date(2030, 1, 14)
+        booking.save()
+        booking.refresh_from_db()
+        assert booking.period.lower == start + timedelta(days=7)
+
     def test_service_capacity_limit(self, service):
         assert service.capacity == 10
 
@@ -0,0 +1,231 @@
+from datetime import date, time, timedelta
+
+import threading
+from unittest.mock import Mock, patch
+
+import pytest
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.urls import reverse
+
+from service.availability import build_slots
+from service.models import Booking, Service, ServiceSchedule, SlotOccupancy
+from service.occupancy import lock_service_day, rebuild_weekdays, slot_usage
+from service.serializers import ServiceUpdateModelSerializer
+from users.models import User
+
+MONDAY = date(2030, 1, 7)
+
+
+class TestSlotUsage:
+
+    def test_sums_overlapping_bookings(self):
+        slots = build_slots(time(9, 0), time(12, 0), timedelta(minutes=60))
+        bookings = [
+            (540, 600, 2),
+            (570, 660, 1),
+            (660, 720, 3),
+        ]
+        assert slot_usage(slots, bookings).tolist() == [3, 1, 3]
+
+    def test_ignores_touching_bookings(self):
+        slots = build_slots(time(9, 0), time(10, 0), timedelta(minutes=30))
+        assert slot_usage(slots, [(480, 540, 5), (600, 660, 5)]).tolist() == [0, 0]
+
+    def test_empty_inputs(self):
+        slots = build_slots(time(9, 0), time(10, 0), timedelta(minutes=30))
+        assert slot_usage(slots, []).tolist() == [0, 0]
+        assert slot_usage([], [(540, 600, 1)]).tolist() == []
+
+    def test_same_slot_booked_repeatedly(self):
+        slots = build_slots(time(9, 0), time(12, 0), timedelta(minutes=15))
+        usage = slot_usage(slots, [(540, 555, 1)] * 1000 + [(660, 720, 2)])
+        assert usage[0] == 1000
+        assert usage[1:8].tolist() == [0] * 7
+        assert usage[8:].tolist() == [2, 2, 2, 2]
+
+
+@pytest.mark.django_db
+class TestSlotOccupancy:
+
+    @pytest.fixture
+    def user(self):
+        return User.objects.create_user(phone_number="998900000010", password="1", type=User.Type.PROVIDER)
+
+    @pytest.fixture
+    def service(self, user):
+        service = Service.objects.create(owner=user, name="Sauna", address="Street 1", capacity=5,
+                                         duration=timedelta(minutes=30), price=1000)
+        ServiceSchedule.objects.create(service=service, weekday="monday", start_time=time(9, 0), end_time=time(12, 0))
+        return service
+
+    def _book(self, service, user, start_time, minutes=30, seats=1):
+        return Booking.objects.create(service=service, user=user, weekday="monday", date=MONDAY,
+                                      start_time=start_time, duration=timedelta(minutes=minutes), seats=seats)
+
+    def _occupancy(self, service):
+        return dict(SlotOccupancy.objects.filter(service=service, seats__gt=0).values_list("slot_start", "seats"))
+
+    def test_create_adds_seats_to_every_overlapping_slot(self, service, user):
+        self._book(service, user, time(9, 0), minutes=60, seats=2)
+        self._book(service, user, time(9, 30), seats=1)
+        assert self._occupancy(service) == {time(9, 0): 2, time(9, 30): 3}
+
+    def test_delete_releases_seats(self, service, user):
+        booking = self._book(service, user, time(10, 0), seats=3)
+        self._book(service, user, time(10, 0), seats=1)
+        booking.delete()
+        assert self._occupancy(service) == {time(10, 0): 1}
+
+    def test_update_moves_seats(self, service, user):
+        booking = self._book(service, user, time(10, 0), seats=2)
+        booking.start_time = time(11, 0)
+        booking.seats = 1
+        booking.save()
+        assert self._occupancy(service) == {time(11, 0): 1}
+
+    def test_status_change_without_release_keeps_seats(self, service, user):
+        booking = self._book(service, user, time(10, 0), seats=2)
+        booking.status = Booking.StatusType.PASSED
+        booking.save()
+        assert self._occupancy(service) == {time(10, 0): 2}
+
+    def test_schedule_change_rebuilds_slots(self, service, user):
+        self._book(service, user, time(9, 30), seats=1)
+        schedule = service.schedules.get()
+        schedule.start_time = time(9, 15)
+        schedule.save()
+        assert self._occupancy(service) == {time(9, 15): 1, time(9, 45): 1}
+
+    def test_schedule_change_keeps_past_dates(self, service, user):
+        past = MONDAY - timedelta(days=7 * 52 * 10)
+        Booking.objects.create(service=service, user=user, weekday="monday", date=past, start_time=time(9, 30),
+                               duration=timedelta(minutes=30), seats=1)
+        self._book(service, user, time(9, 30), seats=2)
+        schedule = service.schedules.get()
+        schedule.start_time = time(9, 15)
+        schedule.save()
+        assert dict(SlotOccupancy.objects.filter(date=past).values_list("slot_start", "seats")) == {time(9, 30): 1}
+        assert self._occupancy(service) == {time(9, 30): 1, time(9, 15): 2, time(9, 45): 2}
+
+    def test_unchanged_schedule_save_skips_rebuild(self, service):
+        with patch("service.occupancy.rebuild_weekdays") as rebuild_weekdays:
+            service.schedules.get().save()
+        rebuild_weekdays.assert_not_called()
+
+    def test_service_update_rebuilds_once(self, service, user):
+        self._book(service, user, time(9, 30), seats=1)
+        schedules = [
+            {"weekday": "monday", "start_time": time(9, 15), "end_time": time(12, 15)},
+            {"weekday": "tuesday", "start_time": time(9, 0), "end_time": time(12, 0)},
+            {"weekday": "friday", "start_time": time(9, 0), "end_time": time(12, 0)},
+        ]
+        serializer = ServiceUpdateModelSerializer(service, data={"schedules": schedules}, partial=True,
+                                                  context={"request": Mock(user=user)})
+        assert serializer.is_valid(), serializer.errors
+        with patch("service.occupancy.rebuild_weekdays", wraps=rebuild_weekdays) as rebuild:
+            serializer.save()
+        rebuild.assert_called_once_with(service.pk, {"monday", "tuesday", "friday"})
+        assert self._occupancy(service) == {time(9, 15): 1, time(9, 45): 1}
+
+    def test_rebuild_command_matches_incremental_updates(self, service, user):
+        self._book(service, user, time(9, 0), minutes=90, seats=2)
+        self._book(service, user, time(10, 0), seats=1)
+        expected = self._occupancy(service)
+
+        SlotOccupancy.objects.all().delete()
+        call_command("rebuild_occupancy")
+        assert self._occupancy(service) == expected
+
+    def test_full_slot_refuses_booking(self, service, user):
+        self._book(service, user, time(10, 0), seats=4)
+        self._book(service, user, time(9, 30), minutes=60, seats=1)
+
+        with pytest.raises(ValidationError):
+            self._book(service, user, time(9, 30), minutes=60, seats=1)
+        assert self._occupancy(service) == {time(9, 30): 1, time(10, 0): 5}
+        assert Booking.objects.count() == 2
+
+    def test_clean_checks_the_ledger(self, service, user):
+        booking = self._book(service, user, time(10, 0), seats=4)
+        booking.full_clean()
+        booking.seats = 5
+        booking.full_clean()
+        booking.seats = 1
+
+        extra = Booking(service=service, user=user, weekday="monday", date=MONDAY, start_time=time(9, 30),
+                        duration=timedelta(minutes=60), seats=2)
+        with pytest.raises(ValidationError):
+            extra.full_clean()
+        extra.seats = 1
+        extra.full_clean()
+
+    def test_admin_refuses_full_slot(self, client, service, user):
+        self._book(service, user, time(10, 0), seats=5)
+        client.force_login(User.objects.create_superuser(phone_number="998900000011", password="1"))
+        response = client.post(reverse("admin:service_booking_add"), {
+            "service": service.pk, "user": user.pk, "weekday": "monday", "date": MONDAY, "start_time": "10:00",
+            "duration": "00:30:00", "seats": 1, "status": Booking.StatusType.PENDING,
+        })
+        assert response.status_code == 200
+        assert "Not enough capacity for this time slot" in response.content.decode()
+        assert Booking.objects.count() == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_first_bookings_do_not_overbook():
+    user = User.objects.create_user(phone_number="998900000017", password="1", type=User.Type.PROVIDER)
+    service = Service.objects.create(owner=user, name="Boat", address="Pier", capacity=3,
+                                     duration=timedelta(minutes=30), price=1000)
+    ServiceSchedule.objects.create(service=service, weekday="monday", start_time=time(9, 0), end_time=time(12, 0))
+
+    barrier, results = threading.Barrier(6), []
+
+    def book():
+        try:
+            barrier.wait()
+            Booking.objects.create(service=service, user=user, weekday="monday", date=MONDAY,
+                                   start_time=time(10, 0), duration=timedelta(minutes=60), seats=1)
+            results.append(True)
+        except ValidationError:
+            results.append(False)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=book) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == [False] * 3 + [True] * 3
+    assert Booking.objects.filter(service=service).count() == 3
+    assert set(SlotOccupancy.objects.filter(service=service).values_list("seats", flat=True)) == {3}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_rebuild_waits_for_booking_locks():
+    user = User.objects.create_user(phone_number="998900000019", password="1", type=User.Type.PROVIDER)
+    service = Service.objects.create(owner=user, name="Ferry", address="Pier", capacity=3,
+                                     duration=timedelta(minutes=30), price=1000)
+    ServiceSchedule.objects.create(service=service, weekday="monday", start_time=time(9, 0), end_time=time(12, 0))
+    Booking.objects.create(service=service, user=user, weekday="monday", date=MONDAY, start_time=time(9, 0),
+                           duration=timedelta(minutes=30), seats=1)
+    rebuilt = threading.Event()
+
+    def rebuild():
+        rebuild_weekdays(service.pk, ["monday"])
+        rebuilt.set()
+        connection.close()
+
+    rebuilder = threading.Thread(target=rebuild)
+    try:
+        with transaction.atomic():
+            lock_service_day(service.pk, MONDAY)
+            rebuilder.start()
+            assert not rebuilt.wait(0.5)
+        assert rebuilt.wait(5)
+    finally:
+        rebuilder.join()
+    assert dict(SlotOccupancy.objects.values_list("slot_start", "seats")) == {time(9, 0): 1}
@@ -0,0 +1,188 @@
+import asyncio
+from datetime import date, time, timedelta
+
+import pytest
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.utils import timezone
+from service.booking import create_booking, create_recurring_bookings
+from service.models import Booking, OutboxMessage, Service, ServiceSchedule
+from service.outbox import claim_batch, mark_failed
+from users.models import User
+
+from bot.notifications import OutboxWorker, RateLimiter, render
+
+MONDAY = date(2030, 1, 7)
+
+
+@pytest.fixture
+def owner():
+    return User.objects.create_user(phone_number="998900000030", password="1", type=User.Type.PROVIDER,
+                                    telegram_id=1001)
+
+
+@pytest.fixture
+def customer():
+    return User.objects.create_user(phone_number="998900000031", password="1")
+
+
+@pytest.fixture
+def service(owner):
+    service = Service.objects.create(owner=owner, name="Sauna", address="Spa", capacity=3,
+                                     duration=timedelta(minutes=60), price=1000)
+    ServiceSchedule.objects.create(service=service, weekday="monday", start_time=time(9, 0), end_time=time(12, 0))
+    return service
+
+
+def book(service, user, day=MONDAY):
+    return create_booking(service=service, user=user, weekday="monday", start_time=time(10, 0),
+                          duration=timedelta(minutes=60), day=day)
+
+
+@pytest.mark.django_db
+class TestOutboxWrites:
+
+    def test_booking_queues_provider_message(self, service, customer):
+        booking = book(service, customer)
+        message = OutboxMessage.objects.get()
+        assert message.chat_id == 1001
+        assert message.payload == {"booking": str(booking.pk), "service": "Sauna", "date": "2030-01-07",
+                                   "start_time": "10:00", "end_time": "11:00", "seats": 1,
+                                   "customer": "998900000031"}
+        assert "Sauna" in render(message)
+
+    def test_refused_booking_queues_nothing(self, service, customer):
+        with pytest.raises(Exception):
+            create_booking(service=service, user=customer, weekday="monday", start_time=time(13, 0),
+                           duration=timedelta(minutes=60), day=MONDAY)
+        assert not OutboxMessage.objects.exists()
+
+    def test_provider_without_telegram(self, service, owner, customer):
+        User.objects.filter(pk=owner.pk).update(telegram_id=None)
+        book(service, customer)
+        assert not OutboxMessage.objects.exists()
+
+    def test_other_write_paths(self, service, customer):
+        Booking.objects.create(service=service, user=customer, weekday="monday", date=MONDAY,
+                               start_time=time(9, 0), duration=timedelta(minutes=60))
+        create_recurring_bookings(service=service, user=customer, start_time=time(11, 0),
+                                  duration=timedelta(minutes=60), seats=1,
+                                  days=[MONDAY, MONDAY + timedelta(days=7)])
+        assert OutboxMessage.objects.count() == 3
+
+
+@pytest.mark.django_db
+class TestOutboxQueue:
+
+    def test_claimed_messages_are_leased(self, service, customer):
+        book(service, customer)
+        [message] = claim_batch()
+        assert message.attempts == 1
+        assert claim_batch() == []
+
+    def test_batch_fits_chat_messages_in_the_lease(self, service, customer, settings):
+        settings.OUTBOX_LEASE, settings.OUTBOX_CHAT_INTERVAL = 6, 1
+        create_recurring_bookings(service=service, user=customer, start_time=time(10, 0),
+                                  duration=timedelta(minutes=60), seats=1,
+                                  days=[MONDAY + timedelta(weeks=week) for week in range(5)])
+        other = OutboxMessage.objects.create(chat_id=2002, kind=OutboxMessage.Kind.BOOKING_CREATED, payload={})
+
+        first = claim_batch()
+        assert len(first) == 4
+        assert sorted(message.chat_id for message in first) == [1001, 1001, 1001, 2002]
+        assert other.pk in {message.pk for message in first}
+
+        OutboxMessage.objects.filter(pk__in=[message.pk for message in first]).update(
+            status=OutboxMessage.StatusType.SENT
+        )
+        assert [message.chat_id for message in claim_batch()] == [1001, 1001]
+
+    def test_failures_back_off_then_give_up(self, service, customer, settings):
+        settings.OUTBOX_MAX_ATTEMPTS = 2
+        book(service, customer)
+        [message] = claim_batch()
+        mark_failed(message, "timeout")
+        message.refresh_from_db()
+        assert message.status == OutboxMessage.StatusType.PENDING
+        assert message.available_at > timezone.now() + timedelta(seconds=settings.OUTBOX_RETRY_DELAY - 5)
+
+        OutboxMessage.objects.update(available_at=timezone.now())
+        [message] = claim_batch()
+        mark_failed(message, "timeout")
+        message.refresh_from_db()
+        assert (message.status, message.attempts, message.last_error) == (OutboxMessage.StatusType.FAILED, 2,
+                                                                          "timeout")
+
+
+class FakeBot:
+
+    def __init__(self, errors=None):
+        self.sent = []
+        self.errors = errors or {}
+
+    async def send_message(self, chat_id, text):
+        if chat_id in self.errors:
+            raise self.errors[chat_id]
+        self.sent.append((chat_id, text))
+
+
+def drain(worker) -> int:
+    async def run_once():
+        try:
+            return await worker.run_once()
+        finally:
+            # the worker's queries run in a sync_to_async thread with a connection of its own
+            await sync_to_async(connections.close_all)()
+
+    return asyncio.run(run_once())
+
+
+@pytest.mark.django_db(transaction=True)
+class TestOutboxWorker:
+
+    def test_sends_and_marks_batch(self, service, customer):
+        book(service, customer)
+        book(service, customer, day=MONDAY + timedelta(days=7))
+        bot = FakeBot()
+        worker = OutboxWorker(bot, limiter=RateLimiter(rate=1000, chat_interval=0))
+
+        assert drain(worker) == 2
+        assert [chat_id for chat_id, _ in bot.sent] == [1001, 1001]
+        assert set(OutboxMessage.objects.values_list("status", flat=True)) == {OutboxMessage.StatusType.SENT}
+        assert drain(worker) == 0
+
+    def test_telegram_errors(self, service, owner, customer):
+        book(service, customer)
+        method = SendMessage(chat_id=1001, text="")
+        worker = OutboxWorker(FakeBot({1001: TelegramRetryAfter(method, "Flood control", 7)}),
+                              limiter=RateLimiter(rate=1000, chat_interval=0))
+        drain(worker)
+        message = OutboxMessage.objects.get()
+        assert message.status == OutboxMessage.StatusType.PENDING
+        assert message.available_at > timezone.now() + timedelta(seconds=5)
+
+        OutboxMessage.objects.update(available_at=timezone.now())
+        worker.bot = FakeBot({1001: TelegramForbiddenError(method, "bot was blocked by the user")})
+        worker.limiter = RateLimiter(rate=1000, chat_interval=0)
+        drain(worker)
+        assert OutboxMessage.objects.get().status == OutboxMessage.StatusType.FAILED
+
+
+def test_rate_limiter_spaces_chats(monkeypatch):
+    waits = []
+
+    async def sleep(seconds):
+        waits.append(round(seconds, 2))
+
+    monkeypatch.setattr("bot.notifications.asyncio.sleep", sleep)
+    monkeypatch.setattr("bot.notifications.time.monotonic", lambda: 100.0)
+    limiter = RateLimiter(rate=10, chat_interval=1)
+
+    async def run():
+        for chat_id in (1, 2, 1):
+            await limiter.wait(chat_id)
+
+    asyncio.run(run())
+    assert waits == [0.1, 1.0]
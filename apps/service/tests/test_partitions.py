@@ -0,0 +1,98 @@
+import threading
+from datetime import date, time, timedelta
+from unittest.mock import patch
+
+import pytest
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+from service import partitions
+from service.models import Booking, Service
+from service.partitions import (DEFAULT_PARTITION, add_months, booking_partitions, create_partitions,
+                                detach_partitions)
+from users.models import User
+
+MONDAY = date(2030, 1, 7)
+
+
+def partition_of(booking) -> str:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT tableoid::regclass::text FROM service_booking WHERE id = %s", [booking.pk])
+        return cursor.fetchone()[0]
+
+
+def check_foreign_keys():
+    # foreign keys are deferred, check them now instead of at the commit that never comes
+    with connection.cursor() as cursor:
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+
+@pytest.mark.django_db
+class TestBookingPartitions:
+
+    @pytest.fixture
+    def booking(self):
+        owner = User.objects.create_user(phone_number="998900000060", password="1", type=User.Type.PROVIDER)
+        service = Service.objects.create(owner=owner, name="Spa", address="Hotel", capacity=5,
+                                         duration=timedelta(minutes=60), price=1000)
+        return Booking.objects.create(service=service, user=owner, weekday="monday", date=MONDAY,
+                                      start_time=time(10, 0), duration=timedelta(minutes=60))
+
+    def test_add_months(self):
+        assert add_months(date(2030, 11, 1), 3) == date(2031, 2, 1)
+        assert add_months(date(2030, 1, 1), -1) == date(2029, 12, 1)
+
+    def test_upcoming_months_take_rows_from_default(self, booking):
+        assert partition_of(booking) == DEFAULT_PARTITION
+
+        assert create_partitions(ahead=1, today=MONDAY) == ["service_booking_p2030_01", "service_booking_p2030_02"]
+        assert create_partitions(ahead=1, today=MONDAY) == []
+        assert partition_of(booking) == "service_booking_p2030_01"
+
+        plan = Booking.objects.filter(date=MONDAY).explain()
+        assert "service_booking_p2030_01" in plan
+        assert "service_booking_p2030_02" not in plan and DEFAULT_PARTITION not in plan
+
+    def test_detach_old_months(self, booking):
+        create_partitions(ahead=1, today=MONDAY)
+        check_foreign_keys()
+        assert detach_partitions(retain=0, today=date(2030, 2, 15))[-1] == "service_booking_p2030_01"
+        assert set(booking_partitions()) == {date(2030, 2, 1)}
+        assert not Booking.objects.filter(pk=booking.pk).exists()
+
+        booking.user.delete()
+        check_foreign_keys()
+
+    def test_command(self, booking):
+        call_command("manage_booking_partitions", ahead=0, retain=None)
+        assert timezone.localdate().replace(day=1) in booking_partitions()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_detach_gives_up_on_a_busy_table():
+    create_partitions(ahead=0, today=MONDAY)
+    reading, release = threading.Event(), threading.Event()
+
+    def read():
+        with transaction.atomic():
+            Booking.objects.filter(date=MONDAY).exists()
+            reading.set()
+            release.wait(10)
+        connection.close()
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    reading.wait(5)
+    try:
+        with patch.object(partitions, "LOCK_TIMEOUT", "50ms"), patch.object(partitions, "LOCK_ATTEMPTS", 2), \
+                patch.object(partitions.time, "sleep") as sleep, pytest.raises(OperationalError):
+            detach_partitions(retain=0, today=date(2030, 2, 15))
+    finally:
+        release.set()
+        reader.join()
+    sleep.assert_called_once()
+    detached = detach_partitions(retain=0, today=date(2030, 2, 15))
+    with connection.cursor() as cursor:
+        # detached tables aren't flushed, a later test may create the month again
+        cursor.execute(f"DROP TABLE {', '.join(detached)}")
+    assert detached[-1] == "service_booking_p2030_01"
@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.urls import reverse_lazy
+from service.models import Service, ServiceCategory
+from service.search import search_query, search_services
+from users.models import User
+
+
+@pytest.mark.django_db
+class TestServiceSearch:
+
+    @pytest.fixture
+    def owner(self):
+        return User.objects.create_user(phone_number="998900000090", password="1", type=User.Type.PROVIDER)
+
+    @pytest.fixture
+    def category(self):
+        return ServiceCategory.objects.create(name="Yoga", icon="https://example.com/yoga.png")
+
+    def _service(self, owner, name, category=None, description="", address="Tashkent"):
+        return Service.objects.create(owner=owner, category=category, name=name, description=description,
+                                      address=address, capacity=5, duration=timedelta(minutes=60), price=1000)
+
+    def _search(self, text):
+        return list(search_services(Service.objects.all(), text).values_list("name", flat=True))
+
+    def test_ranks_name_over_category_over_description(self, owner, category):
+        self._service(owner, "Morning stretch", description="Gentle yoga flow")
+        self._service(owner, "Sunrise class", category=category)
+        self._service(owner, "Yoga studio")
+        self._service(owner, "Boxing gym", address="Yoga street")
+        self._service(owner, "Swimming pool")
+
+        assert self._search("yoga") == ["Yoga studio", "Sunrise class", "Morning stretch", "Boxing gym"]
+        assert self._search("yog stud") == ["Yoga studio"]
+
+    def test_category_changes_reach_services(self, owner, category):
+        service = self._service(owner, "Sunrise class", category=category)
+        category.name = "Pilates"
+        category.save()
+        assert self._search("pilates") == ["Sunrise class"]
+        assert self._search("yoga") == []
+
+        category.delete()
+        service.refresh_from_db()
+        assert service.category is None
+        assert self._search("pilates") == []
+
+    def test_search_query(self):
+        assert search_query("  ") is None
+        assert search_query("'); DROP") is not None
+        assert search_query("!!!") is None
+
+    def test_uses_gin_index(self, owner):
+        self._service(owner, "Yoga studio")
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        assert "service_search_gin" in search_services(Service.objects.all(), "yoga").explain()
+
+    def test_list_endpoint(self, client, owner, category):
+        self._service(owner, "Yoga studio")
+        self._service(owner, "Boxing gym")
+        url = reverse_lazy("service-create")
+        assert [s["name"] for s in client.get(url, {"search": "yoga"}).json()["results"]] == ["Yoga studio"]
+        assert client.get(url, {"search": ""}).json()["count"] == 2
@@ -0,0 +1,73 @@
+from datetime import date, time, timedelta
+
+import pytest
+
+from service.models import Booking, Service, ServiceSchedule
+from service.seatmap import SeatMap, get_seat_map
+from users.models import User
+
+MONDAY = date(2030, 1, 7)
+
+
+class TestSeatMap:
+
+    @pytest.fixture
+    def seat_map(self):
+        # 09:00 - 12:00 in 30 minute slots
+        return SeatMap(540, 30, [3, 0, 2, 2, 1, 3])
+
+    def test_bytes_round_trip(self, seat_map):
+        data = seat_map.to_bytes()
+        assert len(data) == 4 + 6 * 4
+
+        restored = SeatMap.from_bytes(data)
+        assert (restored.start, restored.step, list(restored.remaining)) == (540, 30, [3, 0, 2, 2, 1, 3])
+
+    def test_range_fits(self, seat_map):
+        assert seat_map.available(600, 660) == 2
+        assert seat_map.fits(600, 720, 1)
+        assert not seat_map.fits(600, 720, 2)
+        assert seat_map.available(615, 645) == 2
+        assert not seat_map.is_open(690, 750)
+        assert seat_map.available(690, 750) == 0
+
+    def test_closed_day(self):
+        seat_map = SeatMap(0, 30, [])
+        assert not seat_map.is_open(540, 570)
+        assert seat_map.available(540, 570) == 0
+        assert SeatMap.from_bytes(seat_map.to_bytes()).remaining.tolist() == []
+
+
+@pytest.mark.django_db
+class TestGetSeatMap:
+
+    @pytest.fixture
+    def user(self):
+        return User.objects.create_user(phone_number="998900000014", password="1", type=User.Type.PROVIDER)
+
+    @pytest.fixture
+    def service(self, user):
+        service = Service.objects.create(owner=user, name="Bowling", address="Street 3", capacity=4,
+                                         duration=timedelta(minutes=60), price=1000)
+        ServiceSchedule.objects.create(service=service, weekday="monday", start_time=time(9, 0), end_time=time(12, 0))
+        return service
+
+    def test_builds_from_occupancy_then_reads_cache(self, service, user, django_assert_num_queries):
+        Booking.objects.create(service=service, user=user, weekday="monday", date=MONDAY, start_time=time(10, 0),
+                               duration=timedelta(minutes=60), seats=3)
+
+        with django_assert_num_queries(1):
+            seat_map = get_seat_map(service.pk, MONDAY)
+        assert list(seat_map.remaining) == [4, 1, 4]
+
+        with django_assert_num_queries(0):
+            cached = get_seat_map(service.pk, MONDAY)
+        assert list(cached.remaining) == [4, 1, 4]
+        assert not cached.fits(600, 660, 2) and cached.fits(660, 720, 2)
+
+    def test_closed_day_is_cached(self, service, django_assert_num_queries):
+        tuesday = MONDAY + timedelta(days=1)
+        with django_assert_num_queries(1):
+            assert list(get_seat_map(service.pk, tuesday).free_slots()) == []
+        with django_assert_num_queries(0):
+            assert not get_seat_map(service.pk, tuesday).is_open(540, 600)
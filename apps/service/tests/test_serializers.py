@@ -332,6 +332,19 @@ class TestBookingModelSerializer:
             seats=2
         )
 
+        data = {
+            "service": service.id,
+            "weekday": "monday",
+            "start_time": "10:00",
+            "duration": "0:30:00",
+            "seats": 1,
+        }
+        ser = BookingModelSerializer(data=data, context=self.context)
+        assert not ser.is_valid()
+        assert "Not enough capacity" in str(ser.errors)
+
+    def test_exceeds_capacity_on_save(self):
+        service = self._create_service_with_schedule(capacity=2)
         data = {
             "service": service.id,
             "weekday": "monday",
@@ -341,6 +354,15 @@ class TestBookingModelSerializer:
         }
         ser = BookingModelSerializer(data=data, context=self.context)
         assert ser.is_valid(), ser.errors
+
+        Booking.objects.create(
+            user=self.user,
+            service=service,
+            weekday="monday",
+            start_time=time(10, 0),
+            duration=timedelta(minutes=30),
+            seats=2
+        )
         with pytest.raises(ValidationError) as excinfo:
             ser.save()
         assert "Not enough capacity" in str(excinfo.value)
@@ -0,0 +1,58 @@
+from datetime import datetime, time, timedelta
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+from service.models import Booking, Service
+from service.sweeper import mark_passed
+from users.models import User
+
+
+@pytest.mark.django_db
+class TestMarkPassed:
+
+    @pytest.fixture
+    def user(self):
+        return User.objects.create_user(phone_number="998900000040", password="1", type=User.Type.PROVIDER)
+
+    @pytest.fixture
+    def service(self, user):
+        return Service.objects.create(owner=user, name="Bowling", address="Mall", capacity=50,
+                                      duration=timedelta(minutes=60), price=1000)
+
+    @pytest.fixture
+    def now(self):
+        return timezone.make_aware(datetime(2030, 1, 9, 12, 0))
+
+    def _book(self, service, user, day, start_time):
+        return Booking.objects.create(service=service, user=user, weekday=day.strftime("%A").lower(), date=day,
+                                      start_time=start_time, duration=timedelta(minutes=60))
+
+    def test_moves_only_finished_bookings(self, service, user, now, django_assert_num_queries):
+        today = now.date()
+        finished = [
+            self._book(service, user, today - timedelta(days=2), time(10, 0)),
+            self._book(service, user, today - timedelta(days=1), time(23, 0)),
+            self._book(service, user, today, time(10, 0)),
+        ]
+        running = self._book(service, user, today, time(11, 30))
+        upcoming = self._book(service, user, today + timedelta(days=1), time(9, 0))
+
+        # two batches, each one update wrapped in a savepoint
+        with django_assert_num_queries(6):
+            assert mark_passed(batch_size=2, now=now) == 3
+
+        passed = set(Booking.objects.filter(status=Booking.StatusType.PASSED).values_list("pk", flat=True))
+        assert passed == {booking.pk for booking in finished}
+        assert mark_passed(now=now) == 0
+        assert set(Booking.objects.finished(now + timedelta(days=2))) == {running, upcoming}
+
+    def test_active_bookings(self, service, user):
+        now = timezone.localtime()
+        ended = self._book(service, user, (now - timedelta(days=1)).date(), time(10, 0))
+        upcoming = self._book(service, user, (now + timedelta(days=1)).date(), time(10, 0))
+        assert list(Booking.objects.active()) == [upcoming]
+
+        call_command("sweep_bookings")
+        ended.refresh_from_db()
+        assert ended.status == Booking.StatusType.PASSED
@@ -1,8 +1,14 @@
-from datetime import timedelta
+import json
+import uuid
+from datetime import date, datetime, time, timedelta
+from unittest.mock import patch
+
 import pytest
 from django.urls import reverse_lazy
+from django.utils import timezone
 from rest_framework import status
-from service.models import ServiceCategory, Service
+from service.models import (Booking, Location, Service, ServiceCategory, ServiceImage, ServiceSchedule,
+                            SlotOccupancy)
 from users.models import User
 
 
@@ -58,6 +64,46 @@ class TestMyServicesListApiView:
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
 
 
+@pytest.mark.django_db
+class TestServiceListQueryCount:
+
+    @pytest.fixture
+    def provider_user(self):
+        return User.objects.create_user(phone_number="998900000080", password="1", type=User.Type.PROVIDER)
+
+    def _services(self, owner, count):
+        category = ServiceCategory.objects.create(name="Games")
+        for index in range(count):
+            service = Service.objects.create(owner=owner, category=category, name=f"Room {index}", address="Mall",
+                                             capacity=4, duration=timedelta(minutes=60), price=1000)
+            Location.objects.create(service=service, name="Mall", lat=41.3, lng=69.2)
+            ServiceImage.objects.create(service=service, image=f"uploads/room-{index}/images/1.png")
+            ServiceImage.objects.create(service=service, image=f"uploads/room-{index}/images/2.png")
+            for weekday in ("monday", "tuesday"):
+                ServiceSchedule.objects.create(service=service, weekday=weekday, start_time=time(9, 0),
+                                               end_time=time(18, 0))
+
+    # count, services with their location, images, schedules
+    @pytest.mark.parametrize("count", [1, 15])
+    def test_service_list(self, client, provider_user, django_assert_num_queries, count):
+        self._services(provider_user, count)
+        with django_assert_num_queries(4):
+            response = client.get(reverse_lazy("service-create"), {"limit": 100})
+        results = response.json()["results"]
+        assert len(results) == count
+        assert len(results[0]["images"]) == 2 and len(results[0]["schedules"]) == 2
+        assert results[0]["location"]["name"] == "Mall"
+
+    # session and user on top of the list queries
+    @pytest.mark.parametrize("count", [1, 15])
+    def test_my_services(self, client, provider_user, django_assert_num_queries, count):
+        self._services(provider_user, count)
+        client.force_login(provider_user)
+        with django_assert_num_queries(6):
+            response = client.get(reverse_lazy("my-services-list"))
+        assert len(response.json()["results"]) == min(count, 10)
+
+
 @pytest.mark.django_db
 class TestServiceListCreateAPIView:
 
@@ -104,6 +150,74 @@ class TestServiceListCreateAPIView:
         assert Service.objects.filter(name="Makeup").exists()
 
 
+@pytest.mark.django_db
+class TestRecurringBookingCreateAPIView:
+
+    @pytest.fixture
+    def user(self):
+        return User.objects.create_user(phone_number="998900000019", password="1", type=User.Type.PROVIDER)
+
+    @pytest.fixture
+    def service(self, user):
+        service = Service.objects.create(owner=user, name="Climbing wall", address="Gym 2", capacity=2,
+                                         duration=timedelta(minutes=30), price=20000)
+        ServiceSchedule.objects.create(service=service, weekday="monday", start_time=time(9, 0), end_time=time(12, 0))
+        return service
+
+    def _post(self, client, service, **data):
+        url = reverse_lazy("booking-recurring")
+        payload = {"service": str(service.pk), "date": "2030-01-07", "start_time": "10:00", "duration": "01:00:00",
+                   "seats": 1, "weeks": 4, **data}
+        return client.post(url, payload, content_type="application/json")
+
+    def test_books_free_weeks_and_reports_conflicts(self, client, user, service):
+        Booking.objects.create(service=service, user=user, weekday="monday", date=date(2030, 1, 14),
+                               start_time=time(10, 30), duration=timedelta(minutes=30), seats=2)
+        client.force_login(user)
+
+        response = self._post(client, service)
+        assert response.status_code == status.HTTP_201_CREATED
+        data = response.json()
+        assert [item["date"] for item in data] == ["2030-01-07", "2030-01-14", "2030-01-21", "2030-01-28"]
+        assert [item["error"] for item in data] == [None, "Not enough capacity for this time slot", None, None]
+        assert data[1]["booking"] is None
+
+        booked = Booking.objects.filter(pk__in=[item["booking"] for item in data if item["booking"]])
+        assert sorted(booked.values_list("date", flat=True)) == [date(2030, 1, 7), date(2030, 1, 21),
+                                                                 date(2030, 1, 28)]
+        assert all(booking.end_time == time(11, 0) for booking in booked)
+        occupancy = SlotOccupancy.objects.filter(service=service, date=date(2030, 1, 21))
+        assert dict(occupancy.values_list("slot_start", "seats")) == {time(10, 0): 1, time(10, 30): 1}
+
+    def test_query_count_does_not_grow_with_weeks(self, client, user, service, django_assert_max_num_queries):
+        client.force_login(user)
+        with django_assert_max_num_queries(12):
+            response = self._post(client, service, weeks=12)
+        assert response.status_code == status.HTTP_201_CREATED
+        assert Booking.objects.filter(service=service).count() == 12
+
+    def test_nothing_bookable(self, client, user, service):
+        client.force_login(user)
+        response = self._post(client, service, start_time="11:30")
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert {item["error"] for item in response.json()} == {"Service is closed at that time"}
+
+    @pytest.mark.parametrize("day, start_time", [("2030-01-07", "09:30"), ("2030-01-07", "10:00"),
+                                                 ("2029-12-31", "11:00")])
+    def test_start_in_the_past(self, client, user, service, day, start_time):
+        with patch("django.utils.timezone.now", return_value=timezone.make_aware(datetime(2030, 1, 7, 10))):
+            client.force_login(user)
+            response = self._post(client, service, date=day, start_time=start_time)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {"non_field_errors": ["Start time can't be in the past"]}
+        assert not Booking.objects.exists()
+
+    def test_too_many_weeks(self, client, user, service):
+        client.force_login(user)
+        response = self._post(client, service, weeks=13)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
 @pytest.mark.django_db
 class TestPendingBookingListAPIView:
 
@@ -144,3 +258,271 @@ class TestUserBookingHistoryListAPIView:
         assert response.status_code == status.HTTP_200_OK
         assert response.data["results"] == []
 
+
+@pytest.mark.django_db
+class TestServiceDeleteUpdateGetAPIView:
+
+    @pytest.fixture
+    def provider_user(self):
+        return User.objects.create_user(phone_number="998900000007", password="1", type=User.Type.PROVIDER)
+
+    @pytest.fixture
+    def service(self, provider_user):
+        service = Service.objects.create(
+            owner=provider_user,
+            name="Football",
+            address="Stadium 1",
+            capacity=4,
+            duration=timedelta(minutes=30),
+            price=50000
+        )
+        for weekday in ("monday", "tuesday", "wednesday"):
+            ServiceSchedule.objects.create(service=service, weekday=weekday, start_time=time(8, 0),
+                                           end_time=time(20, 0))
+        return service
+
+    @pytest.mark.parametrize("now", [
+        datetime(2030, 1, 5, 9, 0),  # saturday
+        datetime(2030, 1, 7, 9, 0),  # monday, before the bookings
+        datetime(2030, 1, 7, 12, 0),  # monday, after the bookings
+    ])
+    def test_retrieve_free_time(self, client, provider_user, service, now):
+        with patch("django.utils.timezone.now", return_value=timezone.make_aware(now)):
+            Booking.objects.create(service=service, user=provider_user, weekday="monday", start_time=time(10, 0),
+                                   duration=timedelta(minutes=60), seats=3)
+            Booking.objects.create(service=service, user=provider_user, weekday="monday", start_time=time(10, 30),
+                                   duration=timedelta(minutes=30), seats=1)
+
+            url = reverse_lazy("service-detail", kwargs={"pk": service.pk})
+            response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+
+        monday = next(day for day in response.data["weekday"] if day["weekday"] == "monday")
+        free_time = {slot["time"]: slot["available_capacity"] for slot in monday["free_time"]}
+        assert free_time["10:00 - 10:30"] == 1
+        assert "10:30 - 11:00" not in free_time
+        assert free_time["11:00 - 11:30"] == 4
+        assert len(monday["free_time"]) == 23
+
+    def test_retrieve_splits_today_at_now(self, client, provider_user, service):
+        now = timezone.make_aware(datetime(2030, 1, 7, 12, 0))  # monday
+        with patch("django.utils.timezone.now", return_value=now):
+            for day in (date(2030, 1, 7), date(2030, 1, 14)):
+                for start_time in (time(10, 0), time(14, 0)):
+                    Booking.objects.create(service=service, user=provider_user, weekday="monday", date=day,
+                                           start_time=start_time, duration=timedelta(minutes=30),
+                                           seats=1 if day.day == 7 else 2)
+
+            url = reverse_lazy("service-detail", kwargs={"pk": service.pk})
+            response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+
+        monday = next(day for day in response.data["weekday"] if day["weekday"] == "monday")
+        slots = {slot["time"]: slot for slot in monday["free_time"]}
+        # 10:00 has already started today, so it books next monday
+        assert slots["10:00 - 10:30"]["date"] == "2030-01-14"
+        assert slots["10:00 - 10:30"]["available_capacity"] == 2
+        assert slots["14:00 - 14:30"]["date"] == "2030-01-07"
+        assert slots["14:00 - 14:30"]["available_capacity"] == 3
+        assert slots["12:00 - 12:30"]["date"] == "2030-01-14"
+        assert slots["12:30 - 13:00"]["date"] == "2030-01-07"
+
+    def test_retrieve_query_count_is_constant(self, client, provider_user, service, django_assert_max_num_queries):
+        for hour in range(8, 20):
+            Booking.objects.create(service=service, user=provider_user, weekday="tuesday", start_time=time(hour, 0),
+                                   duration=timedelta(minutes=30), seats=1)
+
+        url = reverse_lazy("service-detail", kwargs={"pk": service.pk})
+        with django_assert_max_num_queries(4):
+            response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+class TestServiceAvailabilityAPIView:
+
+    @pytest.fixture
+    def provider_user(self):
+        return User.objects.create_user(phone_number="998900000008", password="1", type=User.Type.PROVIDER)
+
+    @pytest.fixture
+    def service(self, provider_user):
+        service = Service.objects.create(
+            owner=provider_user,
+            name="Tennis court",
+            address="Court 1",
+            capacity=2,
+            duration=timedelta(minutes=60),
+            price=30000
+        )
+        ServiceSchedule.objects.create(service=service, weekday="monday", start_time=time(9, 0), end_time=time(12, 0))
+        return service
+
+    def _get(self, client, service, **params):
+        url = reverse_lazy("service-availability", kwargs={"pk": service.pk})
+        return client.get(url, params)
+
+    def test_booking_only_affects_its_date(self, client, provider_user, service):
+        Booking.objects.create(service=service, user=provider_user, weekday="monday", date=date(2030, 1, 7),
+                               start_time=time(9, 0), duration=timedelta(minutes=60), seats=2)
+
+        response = self._get(client, service, **{"from": "2030-01-01", "to": "2030-01-14"})
+        assert response.status_code == status.HTTP_200_OK
+        data = json.loads(b"".join(response.streaming_content))
+
+        assert [day["date"] for day in data] == ["2030-01-07", "2030-01-14"]
+        assert [slot["time"] for slot in data[0]["free_time"]] == ["10:00 - 11:00", "11:00 - 12:00"]
+        assert len(data[1]["free_time"]) == 3
+
+    def test_long_range_uses_constant_queries(self, client, provider_user, service, django_assert_max_num_queries):
+        for days in range(0, 84, 7):
+            Booking.objects.create(service=service, user=provider_user, weekday="monday",
+                                   date=date(2030, 1, 7) + timedelta(days=days), start_time=time(10, 0),
+                                   duration=timedelta(minutes=60), seats=1)
+
+        with django_assert_max_num_queries(3):
+            response = self._get(client, service, **{"from": "2030-01-01", "to": "2030-03-31"})
+            data = json.loads(b"".join(response.streaming_content))
+        assert len(data) == 12
+        assert all(len(day["free_time"]) == 3 for day in data)
+
+    def test_invalid_range(self, client, service):
+        response = self._get(client, service, **{"from": "2030-02-01", "to": "2030-01-01"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        response = self._get(client, service, **{"from": "2030-01-01", "to": "2031-01-01"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestServiceOccupancyHeatmapAPIView:
+
+    @pytest.fixture
+    def provider_user(self):
+        return User.objects.create_user(phone_number="998900000015", password="1", type=User.Type.PROVIDER)
+
+    @pytest.fixture
+    def service(self, provider_user):
+        service = Service.objects.create(owner=provider_user, name="Squash", address="Court 3", capacity=2,
+                                         duration=timedelta(minutes=30), price=30000)
+        ServiceSchedule.objects.create(service=service, weekday="monday", start_time=time(9, 0), end_time=time(12, 0))
+        return service
+
+    def _get(self, client, service, **params):
+        url = reverse_lazy("service-occupancy-heatmap", kwargs={"pk": service.pk})
+        return client.get(url, params)
+
+    def test_utilisation_per_weekday_and_hour(self, client, provider_user, service, django_assert_num_queries):
+        Booking.objects.create(service=service, user=provider_user, weekday="monday", date=date(2030, 1, 7),
+                               start_time=time(9, 0), duration=timedelta(minutes=60), seats=2)
+        Booking.objects.create(service=service, user=provider_user, weekday="monday", date=date(2030, 1, 14),
+                               start_time=time(10, 30), duration=timedelta(minutes=60), seats=1)
+        client.force_login(provider_user)
+
+        response = self._get(client, service, **{"from": "2030-01-07", "to": "2030-01-14"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == [
+            {"weekday": "monday", "hour": 9, "utilisation": 50.0},
+            {"weekday": "monday", "hour": 10, "utilisation": 12.5},
+            {"weekday": "monday", "hour": 11, "utilisation": 12.5},
+        ]
+
+        # session, user and service only
+        with django_assert_num_queries(3):
+            cached = self._get(client, service, **{"from": "2030-01-07", "to": "2030-01-14"})
+        assert cached.json() == response.json()
+
+    def test_only_owner(self, client, service):
+        other = User.objects.create_user(phone_number="998900000016", password="1", type=User.Type.PROVIDER)
+        client.force_login(other)
+        response = self._get(client, service, **{"from": "2030-01-07", "to": "2030-01-14"})
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+class TestBatchAvailabilityAPIView:
+
+    @pytest.fixture
+    def provider_user(self):
+        return User.objects.create_user(phone_number="998900000009", password="1", type=User.Type.PROVIDER)
+
+    @pytest.fixture
+    def services(self, provider_user):
+        services = []
+        for index in range(20):
+            service = Service.objects.create(
+                owner=provider_user,
+                name=f"Court {index}",
+                address="Court street",
+                capacity=1,
+                duration=timedelta(minutes=60),
+                price=30000
+            )
+            ServiceSchedule.objects.create(service=service, weekday="monday", start_time=time(9, 0),
+                                           end_time=time(11, 0))
+            services.append(service)
+        return services
+
+    def test_batch_costs_constant_queries(self, client, provider_user, services, django_assert_max_num_queries):
+        for service in services[:10]:
+            Booking.objects.create(service=service, user=provider_user, weekday="monday", date=date(2030, 1, 7),
+                                   start_time=time(9, 0), duration=timedelta(minutes=60), seats=1)
+
+        url = reverse_lazy("service-availability-batch")
+        payload = {"services": [str(service.pk) for service in services], "date": "2030-01-07"}
+        with django_assert_max_num_queries(2):
+            response = client.post(url, payload, content_type="application/json")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data) == 20
+        assert response.data[0]["service"] == services[0].pk
+        assert response.data[0]["next_free"] == "10:00 - 11:00"
+        assert response.data[15]["next_free"] == "09:00 - 10:00"
+        assert len(response.data[15]["free_time"]) == 2
+
+    def test_closed_day(self, client, services):
+        url = reverse_lazy("service-availability-batch")
+        payload = {"services": [str(services[0].pk)], "date": "2030-01-08"}
+        response = client.post(url, payload, content_type="application/json")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == [{"service": services[0].pk, "next_free": None, "free_time": []}]
+
+    def test_too_many_services(self, client):
+        url = reverse_lazy("service-availability-batch")
+        payload = {"services": [str(uuid.uuid4()) for _ in range(51)], "date": "2030-01-07"}
+        response = client.post(url, payload, content_type="application/json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestCategoryNextAvailableAPIView:
+
+    @pytest.fixture
+    def provider_user(self):
+        return User.objects.create_user(phone_number="998900000013", password="1", type=User.Type.PROVIDER)
+
+    @pytest.fixture
+    def category(self):
+        return ServiceCategory.objects.create(name="Sport")
+
+    def test_lists_services_with_free_slots(self, client, provider_user, category):
+        for index in range(3):
+            service = Service.objects.create(owner=provider_user, category=category, name=f"Field {index}",
+                                             address="Street", capacity=2, duration=timedelta(minutes=30),
+                                             price=1000)
+            for weekday in ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"):
+                ServiceSchedule.objects.create(service=service, weekday=weekday, start_time=time(0, 0),
+                                               end_time=time(23, 30))
+
+        url = reverse_lazy("category-next-available", kwargs={"pk": category.pk})
+        response = client.get(url, {"limit": 2})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data) == 2
+        assert set(response.data[0]) == {"service", "date", "time", "available_capacity"}
+        assert response.data[0]["available_capacity"] == 2
+
+    def test_unknown_category(self, client):
+        url = reverse_lazy("category-next-available", kwargs={"pk": uuid.uuid4()})
+        response = client.get(url)
+        assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,211 @@
+import threading
+from datetime import date, time, timedelta
+from unittest.mock import patch
+
+import pytest
+from django.db import connection, transaction
+from django.urls import reverse_lazy
+from rest_framework import status
+from service.booking import create_booking, promote_waiters
+from service.models import Booking, OutboxMessage, Service, ServiceSchedule, SlotOccupancy, WaitlistEntry
+from users.models import User
+
+MONDAY = date(2030, 1, 7)
+
+
+@pytest.fixture
+def owner():
+    return User.objects.create_user(phone_number="998900000050", password="1", type=User.Type.PROVIDER)
+
+
+@pytest.fixture
+def service(owner):
+    service = Service.objects.create(owner=owner, name="Padel", address="Court", capacity=2,
+                                     duration=timedelta(minutes=60), price=1000)
+    ServiceSchedule.objects.create(service=service, weekday="monday", start_time=time(9, 0), end_time=time(12, 0))
+    return service
+
+
+def make_user(number, telegram_id=None):
+    return User.objects.create_user(phone_number=f"9989000001{number:02}", password="1", telegram_id=telegram_id)
+
+
+def book(service, user, seats=1):
+    return create_booking(service=service, user=user, weekday="monday", start_time=time(10, 0),
+                          duration=timedelta(minutes=60), seats=seats, day=MONDAY)
+
+
+def wait(service, user, seats=1, start_time=time(10, 0)):
+    return WaitlistEntry.objects.create(service=service, user=user, date=MONDAY, start_time=start_time,
+                                        duration=timedelta(minutes=60), seats=seats)
+
+
+@pytest.mark.django_db
+class TestCancelBooking:
+
+    def _cancel(self, client, booking):
+        return client.post(reverse_lazy("booking-cancel", kwargs={"pk": booking.pk}))
+
+    def test_cancel_promotes_earliest_waiter(self, client, service, django_capture_on_commit_callbacks):
+        customer = make_user(1)
+        booking = book(service, customer, seats=2)
+        first, second = make_user(2, telegram_id=2002), make_user(3)
+        first_entry, second_entry, later_entry = wait(service, first), wait(service, second), wait(service, second,
+                                                                                                   start_time=time(11))
+
+        client.force_login(customer)
+        with django_capture_on_commit_callbacks(execute=True):
+            response = self._cancel(client, booking)
+        assert response.status_code == status.HTTP_200_OK
+        booking.refresh_from_db()
+        assert booking.status == Booking.StatusType.CANCELLED
+
+        for entry in (first_entry, second_entry, later_entry):
+            entry.refresh_from_db()
+        assert (first_entry.status, second_entry.status) == (WaitlistEntry.StatusType.PROMOTED,) * 2
+        assert later_entry.status == WaitlistEntry.StatusType.WAITING
+        assert first_entry.booking.user == first
+        assert SlotOccupancy.objects.get(slot_start=time(10, 0)).seats == 2
+        assert OutboxMessage.objects.filter(kind=OutboxMessage.Kind.WAITLIST_PROMOTED, chat_id=2002).exists()
+
+    def test_waiter_that_does_not_fit_keeps_the_queue(self, service):
+        book(service, make_user(1))
+        book(service, make_user(2))
+        entry, behind = wait(service, make_user(3), seats=2), wait(service, make_user(4))
+        Booking.objects.filter(user__phone_number="998900000101").first().delete()
+
+        assert promote_waiters(service.pk, MONDAY, time(10, 0), time(11, 0)) == []
+        entry.refresh_from_db()
+        behind.refresh_from_db()
+        assert (entry.status, behind.status) == (WaitlistEntry.StatusType.WAITING,) * 2
+
+    def test_waiter_of_a_closed_time_is_skipped(self, service):
+        book(service, make_user(1), seats=2)
+        closed = WaitlistEntry.objects.create(service=service, user=make_user(2), date=MONDAY,
+                                              start_time=time(10, 0), duration=timedelta(minutes=120))
+        behind = wait(service, make_user(3))
+        ServiceSchedule.objects.filter(service=service).update(end_time=time(11, 0))
+        Booking.objects.get().delete()
+
+        promoted = promote_waiters(service.pk, MONDAY, time(10, 0), time(11, 0))
+        assert [booking.user_id for booking in promoted] == [behind.user_id]
+        closed.refresh_from_db()
+        assert closed.status == WaitlistEntry.StatusType.CANCELLED
+
+    def test_waiters_of_a_deleted_service_are_not_booked(self, service):
+        book(service, make_user(1), seats=2)
+        entry = wait(service, make_user(2))
+        Booking.objects.get().delete()
+        Service.objects.filter(pk=service.pk).delete()
+
+        assert promote_waiters(service.pk, MONDAY, time(10, 0), time(11, 0)) == []
+        entry.refresh_from_db()
+        assert entry.status == WaitlistEntry.StatusType.CANCELLED
+        assert not Booking.objects.exists()
+
+    def test_failed_promotion_keeps_the_cancellation(self, client, service, django_capture_on_commit_callbacks):
+        customer = make_user(1)
+        booking = book(service, customer)
+        client.force_login(customer)
+        with patch("service.booking.promote_waiters", side_effect=RuntimeError("outbox is down")):
+            with django_capture_on_commit_callbacks(execute=True):
+                response = self._cancel(client, booking)
+        assert response.status_code == status.HTTP_200_OK
+        booking.refresh_from_db()
+        assert booking.status == Booking.StatusType.CANCELLED
+
+    @pytest.mark.parametrize("change", [{"duration": timedelta(minutes=90)}, {"capacity": 1}])
+    def test_cancel_after_service_change(self, client, service, change):
+        customer = make_user(1)
+        booking = book(service, customer, seats=2)
+        for field, value in change.items():
+            setattr(service, field, value)
+        service.save()
+
+        client.force_login(customer)
+        assert self._cancel(client, booking).status_code == status.HTTP_200_OK
+        booking.refresh_from_db()
+        assert booking.status == Booking.StatusType.CANCELLED
+        assert not SlotOccupancy.objects.filter(seats__gt=0).exists()
+
+    def test_cancel_rules(self, client, service):
+        customer = make_user(1)
+        booking = book(service, customer)
+
+        client.force_login(make_user(2))
+        assert self._cancel(client, booking).status_code == status.HTTP_404_NOT_FOUND
+
+        client.force_login(customer)
+        assert self._cancel(client, booking).status_code == status.HTTP_200_OK
+        assert self._cancel(client, booking).status_code == status.HTTP_400_BAD_REQUEST
+
+        started = Booking.objects.create(service=service, user=customer, weekday="monday",
+                                         date=date.today() - timedelta(days=7), start_time=time(10, 0),
+                                         duration=timedelta(minutes=60))
+        assert self._cancel(client, started).status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestWaitlistAPI:
+
+    def _join(self, client, service, **data):
+        payload = {"service": str(service.pk), "date": MONDAY.isoformat(), "start_time": "10:00", **data}
+        return client.post(reverse_lazy("booking-waitlist"), payload, content_type="application/json")
+
+    def test_join_list_and_leave(self, client, service):
+        book(service, make_user(2), seats=2)
+        user = make_user(1)
+        client.force_login(user)
+        response = self._join(client, service)
+        assert response.status_code == status.HTTP_201_CREATED
+        entry = response.json()
+        assert (entry["status"], entry["duration"]) == ("waiting", "01:00:00")
+
+        assert self._join(client, service).status_code == status.HTTP_400_BAD_REQUEST
+        assert [e["id"] for e in client.get(reverse_lazy("booking-waitlist")).json()["results"]] == [entry["id"]]
+
+        response = client.delete(reverse_lazy("booking-waitlist-destroy", kwargs={"pk": entry["id"]}))
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert WaitlistEntry.objects.get().status == WaitlistEntry.StatusType.CANCELLED
+
+    def test_join_validation(self, client, service, django_capture_on_commit_callbacks):
+        client.force_login(make_user(1))
+        response = self._join(client, service)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {"non_field_errors": ["Slot is available, book it"]}
+        with django_capture_on_commit_callbacks(execute=True):
+            book(service, make_user(2))
+        assert self._join(client, service, seats=2).status_code == status.HTTP_201_CREATED
+
+        assert self._join(client, service, start_time="13:00").status_code == status.HTTP_400_BAD_REQUEST
+        assert self._join(client, service, seats=3).status_code == status.HTTP_400_BAD_REQUEST
+        assert self._join(client, service, date="2020-01-06").status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db(transaction=True)
+def test_promotion_skips_locked_waiters(owner):
+    service = Service.objects.create(owner=owner, name="Padel", address="Court", capacity=2,
+                                     duration=timedelta(minutes=60), price=1000)
+    ServiceSchedule.objects.create(service=service, weekday="monday", start_time=time(9, 0), end_time=time(12, 0))
+    first, second = wait(service, make_user(1)), wait(service, make_user(2))
+    locked, release = threading.Event(), threading.Event()
+
+    def hold_first():
+        with transaction.atomic():
+            WaitlistEntry.objects.select_for_update().get(pk=first.pk)
+            locked.set()
+            release.wait(5)
+        connection.close()
+
+    holder = threading.Thread(target=hold_first)
+    holder.start()
+    locked.wait(5)
+    try:
+        promoted = promote_waiters(service.pk, MONDAY, time(10, 0), time(11, 0))
+    finally:
+        release.set()
+        holder.join()
+
+    assert [booking.user_id for booking in promoted] == [second.user_id]
+    first.refresh_from_db()
+    assert first.status == WaitlistEntry.StatusType.WAITING
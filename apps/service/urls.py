@@ -2,19 +2,38 @@ from service.views import (BookingCreateAPIView, MyServicesListApiView,
                            PendingBookingListAPIView, ServiceCategoryListAPIView,
                            ServiceDeleteUpdateGetAPIView, ServiceListCreateAPIView,
                            UserBookingHistoryListAPIView, ServiceImageListCreateAPIView, ServiceImageDestroyAPIView,
-                           ListBookingsForOwnerAPIView)
+                           ListBookingsForOwnerAPIView, ServiceAvailabilityAPIView,
+                           BatchAvailabilityAPIView, CategoryNextAvailableAPIView,
+                           ServiceOccupancyHeatmapAPIView, RecurringBookingCreateAPIView,
+                           SlotHoldCreateAPIView, SlotHoldDestroyAPIView, SlotHoldConfirmAPIView,
+                           BookingCancelAPIView, WaitlistEntryListCreateAPIView, WaitlistEntryDestroyAPIView,
+                           ArchivedBookingListAPIView)
 from django.urls import path
 
 urlpatterns = [
     path("category/services/", ServiceCategoryListAPIView.as_view(), name="service-category-list"),
+    path("category/<uuid:pk>/next-available/", CategoryNextAvailableAPIView.as_view(),
+         name="category-next-available"),
 
     path("services/", ServiceListCreateAPIView.as_view(), name="service-create"),
     path("services/<uuid:pk>/", ServiceDeleteUpdateGetAPIView.as_view(), name="service-detail"),
+    path("services/<uuid:pk>/availability/", ServiceAvailabilityAPIView.as_view(), name="service-availability"),
+    path("services/<uuid:pk>/occupancy-heatmap/", ServiceOccupancyHeatmapAPIView.as_view(),
+         name="service-occupancy-heatmap"),
+    path("services/availability/batch/", BatchAvailabilityAPIView.as_view(), name="service-availability-batch"),
     path("services/my-services/", MyServicesListApiView.as_view(), name="my-services-list"),
 
     path("bookings/", BookingCreateAPIView.as_view(), name="booking-create"),
+    path("bookings/recurring/", RecurringBookingCreateAPIView.as_view(), name="booking-recurring"),
+    path("bookings/holds/", SlotHoldCreateAPIView.as_view(), name="booking-hold-create"),
+    path("bookings/holds/<uuid:pk>/", SlotHoldDestroyAPIView.as_view(), name="booking-hold-destroy"),
+    path("bookings/holds/<uuid:pk>/confirm/", SlotHoldConfirmAPIView.as_view(), name="booking-hold-confirm"),
+    path("bookings/<uuid:pk>/cancel/", BookingCancelAPIView.as_view(), name="booking-cancel"),
+    path("bookings/waitlist/", WaitlistEntryListCreateAPIView.as_view(), name="booking-waitlist"),
+    path("bookings/waitlist/<uuid:pk>/", WaitlistEntryDestroyAPIView.as_view(), name="booking-waitlist-destroy"),
     path("users/booking/pending/", PendingBookingListAPIView.as_view(), name="users-booking-history-pending"),
     path("users/booking/history/", UserBookingHistoryListAPIView.as_view(), name="users-booking-history"),
+    path("users/booking/archive/", ArchivedBookingListAPIView.as_view(), name="users-booking-archive"),
 
     path("services/<uuid:pk>/images/", ServiceImageListCreateAPIView.as_view()),
     path("services/<uuid:service_pk>/images/<uuid:image_pk>/", ServiceImageDestroyAPIView.as_view(), name="service-image-destroy"),
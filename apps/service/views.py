@@ -1,19 +1,30 @@
-from datetime import datetime, timezone
-
-from starlette.responses import JSONResponse
-
-from service.mixins import FilterSearchMixin
-from service.models import Booking, Service, ServiceCategory, ServiceImage
+import orjson
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from service.availability import (batch_availability, iter_availability,
+                                  next_available, to_minutes,
+                                  weekly_availability)
+from service.booking import (cancel_booking, confirm_hold, create_recurring_bookings,
+                             hold_seats)
+from service.heatmap import occupancy_heatmap
+from service.holds import slot_holds
+from service.mixins import FilterSearchMixin, IdempotentCreateMixin, ServiceFilterSearchMixin
+from service.models import ArchivedBooking, Booking, Service, ServiceCategory, ServiceImage, WaitlistEntry
 from service.permissions import IsProvider
-from service.serializers import (BookingHistorySerializer, BookingModelSerializer,
+from service.serializers import (ArchivedBookingSerializer, AvailabilityRangeSerializer, BatchAvailabilitySerializer,
+                                 BookingHistorySerializer, BookingModelSerializer,
+                                 NextAvailableQuerySerializer, NextAvailableSerializer,
+                                 OccupancyHeatmapSerializer, RecurringBookingResultSerializer,
+                                 RecurringBookingSerializer, SlotHoldSerializer, WaitlistEntrySerializer,
                                  ServiceCategoryModelSerializer,
                                  ServiceModelSerializer,
                                  ServiceUpdateModelSerializer, ServiceImageModelSerializer, BookingSerializer)
-from django.db.models.aggregates import Sum
-from django.utils import timezone
-from drf_spectacular.utils import extend_schema
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema
 from rest_framework import status
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
 from rest_framework.generics import (CreateAPIView, ListAPIView,
                                      ListCreateAPIView,
                                      RetrieveUpdateDestroyAPIView,
@@ -21,6 +32,7 @@ from rest_framework.generics import (CreateAPIView, ListAPIView,
 from rest_framework.permissions import (IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from shared.filters import ServiceFilter
 from shared.paginations import CustomLimitOffsetPagination
 
@@ -36,10 +48,26 @@ class ServiceCategoryListAPIView(FilterSearchMixin, ListAPIView):
     search_fields = 'name',
 
 
+@extend_schema(tags=['Service'], parameters=[NextAvailableQuerySerializer])
+class CategoryNextAvailableAPIView(APIView):
+    serializer_class = NextAvailableSerializer
+
+    def get(self, request, *args, **kwargs):
+        category = get_object_or_404(ServiceCategory, pk=self.kwargs["pk"])
+        params = NextAvailableQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        now = timezone.localtime()
+        services = Service.objects.filter(category=category).prefetch_related("schedules")
+        found = next_available(services, now.date(), params.validated_data["days"], params.validated_data["limit"],
+                               after=to_minutes(now.time()))
+        return Response(self.serializer_class(found, many=True).data)
+
+
 @extend_schema(tags=['Service'])
 class MyServicesListApiView(ListAPIView):
     serializer_class = ServiceModelSerializer
-    queryset = Service.objects.all()
+    queryset = Service.objects.with_details()
     permission_classes = IsProvider, IsAuthenticated
 
     def get_queryset(self):
@@ -49,14 +77,13 @@ class MyServicesListApiView(ListAPIView):
 
 
 @extend_schema(tags=['Service'])
-class ServiceListCreateAPIView(FilterSearchMixin, ListCreateAPIView):
-    queryset = Service.objects.select_related("owner", "category")
+class ServiceListCreateAPIView(ServiceFilterSearchMixin, ListCreateAPIView):
+    queryset = Service.objects.with_details()
     serializer_class = ServiceModelSerializer
     permission_classes = [IsAuthenticatedOrReadOnly, IsProvider]
 
     pagination_class = CustomLimitOffsetPagination
     filterset_class = ServiceFilter
-    search_fields = 'category', 'name', 'address', 'capacity', 'price', 'description'
 
 
 @extend_schema(tags=["Service"])
@@ -66,57 +93,12 @@ class ServiceDeleteUpdateGetAPIView(RetrieveUpdateDestroyAPIView):
 
     def retrieve(self, request, *args, **kwargs):
         service = get_object_or_404(
-            Service.objects.prefetch_related("schedules", "bookings"),
+            Service.objects.select_related("location").prefetch_related("schedules"),
             pk=self.kwargs["pk"]
         )
         serializer = self.get_serializer(service)
         data = serializer.data
-
-        duration = service.duration
-        capacity = service.capacity
-
-        weekdays_data = []
-
-        for schedule in service.schedules.all():
-            weekday_name = schedule.weekday
-            start_time = schedule.start_time
-            end_time = schedule.end_time
-
-            free_slots = []
-
-            current_time = datetime.combine(timezone.now().date(), start_time)
-            end_datetime = datetime.combine(timezone.now().date(), end_time)
-
-            while current_time + duration <= end_datetime:
-                slot_start = current_time.time()
-                slot_end = (current_time + duration).time()
-
-                overlapping_bookings = Booking.objects.filter(
-                    service=service,
-                    weekday=weekday_name,
-                    start_time__lt=slot_end,
-                    end_time__gt=slot_start
-                )
-
-                total_booked = overlapping_bookings.aggregate(total=Sum("seats"))["total"] or 0
-                available_capacity = capacity - total_booked
-
-                if available_capacity > 0:
-                    free_slots.append({
-                        "time": f"{slot_start.strftime('%H:%M')} - {slot_end.strftime('%H:%M')}",
-                        "available_capacity": available_capacity
-                    })
-
-                current_time += duration
-
-            weekdays_data.append({
-                "weekday": weekday_name,
-                "start_time": start_time.strftime("%H:%M"),
-                "end_time": end_time.strftime("%H:%M"),
-                "free_time": free_slots
-            })
-
-        data["weekday"] = weekdays_data
+        data["weekday"] = weekly_availability(service)
         return Response(data)
 
     def get_queryset(self):
@@ -145,12 +127,176 @@ class ServiceDeleteUpdateGetAPIView(RetrieveUpdateDestroyAPIView):
         )
 
 
-@extend_schema(tags=['Booking'])
-class BookingCreateAPIView(CreateAPIView):
+@extend_schema(
+    tags=["Service"],
+    parameters=[
+        OpenApiParameter("from", OpenApiTypes.DATE, required=True),
+        OpenApiParameter("to", OpenApiTypes.DATE, required=True),
+    ]
+)
+class ServiceAvailabilityAPIView(APIView):
+    serializer_class = None
+
+    def get(self, request, *args, **kwargs):
+        service = get_object_or_404(Service.objects.prefetch_related("schedules"), pk=self.kwargs["pk"])
+        serializer = AvailabilityRangeSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        days = iter_availability(service, serializer.validated_data["from"], serializer.validated_data["to"])
+        return StreamingHttpResponse(self.stream(days), content_type="application/json")
+
+    @staticmethod
+    def stream(days):
+        yield b"["
+        for index, day in enumerate(days):
+            if index:
+                yield b","
+            yield orjson.dumps(day)
+        yield b"]"
+
+
+@extend_schema(
+    tags=["Service"],
+    parameters=[
+        OpenApiParameter("from", OpenApiTypes.DATE, required=True),
+        OpenApiParameter("to", OpenApiTypes.DATE, required=True),
+    ],
+    responses=OccupancyHeatmapSerializer(many=True)
+)
+class ServiceOccupancyHeatmapAPIView(APIView):
+    permission_classes = (IsAuthenticated, IsProvider)
+
+    def get(self, request, *args, **kwargs):
+        service = get_object_or_404(Service, pk=self.kwargs["pk"])
+        if service.owner_id != request.user.id:
+            raise PermissionDenied()
+        serializer = AvailabilityRangeSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return Response(occupancy_heatmap(service, serializer.validated_data["from"], serializer.validated_data["to"]))
+
+
+@extend_schema(tags=["Service"])
+class BatchAvailabilityAPIView(APIView):
+    serializer_class = BatchAvailabilitySerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = batch_availability(serializer.validated_data["services"], serializer.validated_data["date"])
+        return Response(data)
+
+
+@extend_schema(tags=['Booking'], parameters=[OpenApiParameter("Idempotency-Key", str, OpenApiParameter.HEADER)])
+class BookingCreateAPIView(IdempotentCreateMixin, CreateAPIView):
     serializer_class = BookingModelSerializer
     permission_classes = [IsAuthenticated]
 
 
+@extend_schema(tags=['Booking'], request=BookingModelSerializer, responses=SlotHoldSerializer)
+class SlotHoldCreateAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = BookingModelSerializer(data=request.data, context={"request": request})
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            hold = hold_seats(service=data["service"], user=request.user, day=data["date"],
+                              start_time=data["start_time"], duration=data["duration"], seats=data["seats"])
+        except DjangoValidationError as e:
+            raise ValidationError(e.messages)
+        if hold is None:
+            raise ValidationError("Not enough capacity for this time slot")
+        return Response(SlotHoldSerializer(hold).data, status=status.HTTP_201_CREATED)
+
+
+@extend_schema(tags=['Booking'], responses={204: None})
+class SlotHoldDestroyAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def delete(self, request, *args, **kwargs):
+        hold = slot_holds.get(self.kwargs["pk"], request.user.pk)
+        if hold is None:
+            raise NotFound("Hold not found or expired")
+        slot_holds.release(hold)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@extend_schema(tags=['Booking'], request=None, responses=BookingModelSerializer)
+class SlotHoldConfirmAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        try:
+            booking = confirm_hold(self.kwargs["pk"], request.user)
+        except Service.DoesNotExist:
+            booking = None
+        except DjangoValidationError as e:
+            raise ValidationError(e.messages)
+        if booking is None:
+            raise NotFound("Hold not found or expired")
+        return Response(BookingModelSerializer(booking).data, status=status.HTTP_201_CREATED)
+
+
+@extend_schema(tags=['Booking'], responses=RecurringBookingResultSerializer(many=True))
+class RecurringBookingCreateAPIView(APIView):
+    serializer_class = RecurringBookingSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            results = create_recurring_bookings(service=data["service"], user=request.user,
+                                                start_time=data["start_time"], duration=data["duration"],
+                                                seats=data["seats"], days=data["days"])
+        except DjangoValidationError as e:
+            raise ValidationError(e.messages)
+
+        booked = any(result["booking"] for result in results)
+        return Response(RecurringBookingResultSerializer(results, many=True).data,
+                        status=status.HTTP_201_CREATED if booked else status.HTTP_409_CONFLICT)
+
+
+@extend_schema(tags=['Booking'], request=None, responses=BookingModelSerializer)
+class BookingCancelAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        booking = get_object_or_404(
+            Booking.objects.filter(Q(user=request.user) | Q(service__owner=request.user)), pk=self.kwargs["pk"]
+        )
+        try:
+            booking = cancel_booking(booking)
+        except DjangoValidationError as e:
+            raise ValidationError(e.messages)
+        return Response(BookingModelSerializer(booking).data)
+
+
+class WaitlistEntryMixin:
+    queryset = WaitlistEntry.objects.all()
+    serializer_class = WaitlistEntrySerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return WaitlistEntry.objects.none()
+        return super().get_queryset().filter(user=self.request.user, status=WaitlistEntry.StatusType.WAITING)
+
+
+@extend_schema(tags=['Booking'])
+class WaitlistEntryListCreateAPIView(WaitlistEntryMixin, ListCreateAPIView):
+    pass
+
+
+@extend_schema(tags=['Booking'])
+class WaitlistEntryDestroyAPIView(WaitlistEntryMixin, DestroyAPIView):
+
+    def perform_destroy(self, instance):
+        instance.status = WaitlistEntry.StatusType.CANCELLED
+        instance.save(update_fields=["status", "updated_at"])
+
+
 @extend_schema(tags=['Booking'])
 class PendingBookingListAPIView(ListAPIView):
     queryset = Booking.objects.all()
@@ -160,7 +306,7 @@ class PendingBookingListAPIView(ListAPIView):
         qs = super().get_queryset()
         if not self.request.user.is_authenticated:
             return Booking.objects.none()
-        return qs.filter(status=Booking.StatusType.PENDING, user=self.request.user)
+        return qs.active().filter(user=self.request.user)
 
 
 @extend_schema(tags=['Booking'])
@@ -178,6 +324,22 @@ class UserBookingHistoryListAPIView(FilterSearchMixin, ListAPIView):
         return qs.filter(user=self.request.user)
 
 
+@extend_schema(tags=['Booking'])
+class ArchivedBookingListAPIView(FilterSearchMixin, ListAPIView):
+    serializer_class = ArchivedBookingSerializer
+    queryset = ArchivedBooking.objects.all()
+    permission_classes = [IsAuthenticated]
+
+    pagination_class = CustomLimitOffsetPagination
+    filterset_fields = 'date',
+    search_fields = 'service__name', 'weekday'
+
+    def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return ArchivedBooking.objects.none()
+        return super().get_queryset().filter(user=self.request.user)
+
+
 @extend_schema(tags=['ServiceImage'])
 class ServiceImageListCreateAPIView(ListCreateAPIView):
     serializer_class = ServiceImageModelSerializer
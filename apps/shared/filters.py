@@ -1,6 +1,8 @@
 from django_filters import (CharFilter, DateFromToRangeFilter, FilterSet,
                             NumberFilter)
+from rest_framework.filters import SearchFilter
 from service.models import Service
+from service.search import search_services
 
 
 class ServiceFilter(FilterSet):
@@ -12,3 +14,11 @@ class ServiceFilter(FilterSet):
     class Meta:
         model = Service
         fields = ["category", "min_price", "max_price", "created_at"]
+
+
+class ServiceSearchFilter(SearchFilter):
+    """Full-text ``search`` over the service search vector, best matches first."""
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, "")
+        return search_services(queryset, text) if text.strip() else queryset
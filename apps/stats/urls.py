@@ -1,8 +1,10 @@
 from django.urls import path
-from stats.views import UserCountAPIView, ServiceCountAPIView, ServiceLocationsAPIView
+from stats.views import (AvailabilityCacheStatsAPIView, ServiceCountAPIView,
+                         ServiceLocationsAPIView, UserCountAPIView)
 
 urlpatterns = [
     path("users/count/", UserCountAPIView.as_view(), name="user-count"),
     path("service/count/", ServiceCountAPIView.as_view(), name="user-count"),
     path('locations-with-service/', ServiceLocationsAPIView.as_view(), name='locations-with-service'),
+    path('availability-cache/', AvailabilityCacheStatsAPIView.as_view(), name='availability-cache-stats'),
 ]
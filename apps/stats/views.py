@@ -3,7 +3,9 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from service.cache import availability_cache
 from service.models import Service, Location
+from service.permissions import IsAdmin
 from stats.serializers import LocationWithServiceSerializer
 from users.models import User
 
@@ -38,3 +40,11 @@ class ServiceLocationsAPIView(APIView):
         serializer = LocationWithServiceSerializer(qs, many=True)
         return Response(serializer.data)
 
+
+@extend_schema(tags=['Stats'])
+class AvailabilityCacheStatsAPIView(APIView):
+    serializer_class = None  # Add explicit serializer_class for schema generation
+    permission_classes = (IsAuthenticated, IsAdmin)
+
+    def get(self, request, *args, **kwargs):
+        return Response(availability_cache.stats())
@@ -1,4 +1,4 @@
-from datetime import datetime, timedelta
+from datetime import timedelta
 from math import ceil
 
 from aiogram.types import InlineKeyboardButton
@@ -55,34 +55,39 @@ def build_services_markup(services, category_id, page=0):
     return builder.as_markup()
 
 
-def get_free_slots(service, target_date):
-    from service.models import Booking
-    weekday_name = target_date.strftime("%A").lower()
-    schedules = service.schedules.filter(weekday=weekday_name)
-    if not schedules.exists():
-        return []
+def get_free_slots(service_id, target_date):
+    from service.availability import format_minutes
+    from service.seatmap import get_seat_map
 
-    duration: timedelta = service.duration or timedelta(minutes=30)
-    free_slots = []
-
-    for sch in schedules:
-        start_dt = datetime.combine(target_date, sch.start_time)
-        end_dt = datetime.combine(target_date, sch.end_time)
-        current = start_dt
-
-        while current + duration <= end_dt:
-            slot_start = current.time()
-            slot_end = (current + duration).time()
-            booked_count = Booking.objects.filter(
-                service=service,
-                date=target_date,
-                start_time=slot_start
-            ).count()
-
-            free_seats = max(service.capacity - booked_count, 0)
+    return [
+        f"{format_minutes(slot_start)}-{format_minutes(slot_end)} ({free_seats} places)"
+        for slot_start, slot_end, free_seats in get_seat_map(service_id, target_date).free_slots()
+    ]
 
-            if free_seats > 0:
-                free_slots.append(f"{slot_start.strftime('%H:%M')}-{slot_end.strftime('%H:%M')} ({free_seats} places)")
-            current += duration
 
-    return free_slots
+def get_open_days(service, start_date, days=14, limit=7, mark_full=False):
+    """
+    Up to ``limit`` dates from ``start_date`` on which the service is open, paired with
+    whether every slot of that date is fully booked.
+    """
+    from django.db.models import Count
+    from service.availability import build_slots, weekday_of
+    from service.models import SlotOccupancy
+
+    slot_counts = {
+        weekday: len(build_slots(start_time, end_time, service.duration))
+        for weekday, start_time, end_time in service.schedules.values_list("weekday", "start_time", "end_time")
+    }
+    open_days = [
+        day for day in (start_date + timedelta(days=i) for i in range(days))
+        if weekday_of(day) in slot_counts
+    ][:limit]
+
+    full_days = set()
+    if mark_full and open_days:
+        full_slots = SlotOccupancy.objects.filter(
+            service=service, date__in=open_days, seats__gte=service.capacity
+        ).values("date").annotate(slots=Count("id")).values_list("date", "slots")
+        full_days = {day for day, slots in full_slots if slots >= slot_counts[weekday_of(day)]}
+
+    return [(day, day in full_days) for day in open_days]
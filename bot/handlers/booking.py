@@ -6,12 +6,15 @@ from datetime import timedelta
 from aiogram import F, Router
 from aiogram.types import CallbackQuery, Message, ReplyKeyboardRemove
 from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.utils import timezone
+from service.booking import create_booking
 from service.models import Booking, Service, ServiceCategory
 from users.models import User
 
 from bot.buttons.inline import (build_services_markup, get_free_slots,
-                                make_inline_btn_azim)
+                                get_open_days, make_inline_btn_azim)
 from bot.buttons.reply import main_menu_buttons
 from bot.const import CATEGORY_, LAST_SERVICE_, MY_ORDERS_
 
@@ -43,30 +46,22 @@ async def last_orders(message: Message):
 
 @router.message(F.text == MY_ORDERS_)
 async def process_orders(message: Message):
-    now = timezone.localtime()
     user = await User.objects.filter(telegram_id=message.from_user.id).afirst()
     if not user:
         await message.answer("❌ Siz ro‘yxatdan o‘tmagansiz!")
         return
 
     orders = await sync_to_async(lambda: list(
-        Booking.objects.filter(user=user).select_related("service")
+        Booking.objects.active().filter(user=user).select_related("service").order_by("date", "start_time")
     ))()
 
-    active_orders = []
-    for o in orders:
-        naive_end_dt = datetime.combine(o.date, o.start_time) + o.duration
-        end_dt = timezone.make_aware(naive_end_dt)  # ✅ aware qilyapmiz
-
-        if end_dt > now:
-            active_orders.append((o, end_dt))
-
-    if not active_orders:
+    if not orders:
         await message.answer("❌ Sizda faol buyurtmalar yo‘q.")
     else:
         text = "\n".join([
-            f"📌 {o.service.name} | {o.date} {o.start_time.strftime('%H:%M')} - {end_dt.strftime('%H:%M')}"
-            for o, end_dt in active_orders
+            f"📌 {o.service.name} | {o.date} {o.start_time.strftime('%H:%M')} - "
+            f"{timezone.localtime(o.period.upper).strftime('%H:%M')}"
+            for o in orders
         ])
         await message.answer(text)
 
@@ -81,25 +76,7 @@ async def process_categories(message: Message):
 
 @router.callback_query()
 async def process_category_callback(callback: CallbackQuery):
-    categories = await sync_to_async(lambda: list(ServiceCategory.objects.all()))()
-    category_names = [c.name for c in categories]
-
-    if callback.data in category_names:
-        category = await ServiceCategory.objects.aget(name=callback.data)
-        services = await sync_to_async(lambda: list(category.services.all()))()
-
-        if not services:
-            await callback.message.edit_text("❌ Bu kategoriyada hozircha xizmatlar yo‘q.")
-            return
-
-        markup = build_services_markup(services, category.id, page=0)
-        await callback.message.edit_text(
-            f"✅ Siz kategoriya tanladingiz: {category.name}\nXizmatni tanlang:",
-            reply_markup=markup
-        )
-        await callback.answer()
-
-    elif callback.data.startswith("service_page_"):
+    if callback.data.startswith("service_page_"):
         payload = callback.data.replace("service_page_", "", 1)
         cat_id, page = payload.rsplit("_", 1)
         page = int(page)
@@ -113,18 +90,18 @@ async def process_category_callback(callback: CallbackQuery):
         service_id = callback.data.replace("service_", "", 1)
         service = await Service.objects.aget(id=service_id)
 
-        today = timezone.localdate()
-        days = [today + timedelta(days=i) for i in range(14)]
+        open_days = await sync_to_async(get_open_days)(
+            service, timezone.localdate(), mark_full=settings.BOT_MARK_FULL_DAYS
+        )
 
         buttons, data_list = [], []
-        for d in days:
-            weekday_name = d.strftime("%A").lower()
-            exists = await service.schedules.filter(weekday=weekday_name).aexists()
-            if exists:
+        for d, is_full in open_days:
+            if is_full:
+                buttons.append(f"🚫 {d.strftime('%d-%m %A')}")
+                data_list.append(f"full_{service.id}")
+            else:
                 buttons.append(d.strftime("%d-%m %A"))
                 data_list.append(f"day_{service.id}_{d.isoformat()}")
-                if len(buttons) == 7:
-                    break
 
         if not buttons:
             await callback.message.edit_text("❌ Bu xizmat uchun mavjud kunlar yo‘q.")
@@ -142,18 +119,20 @@ async def process_category_callback(callback: CallbackQuery):
         )
         await callback.answer()
 
+    elif callback.data.startswith("full_"):
+        await callback.answer("❌ Bu kunda bo‘sh vaqt yo‘q.", show_alert=True)
+
     elif callback.data.startswith("day_"):
         _, service_id, date_str = callback.data.split("_", 2)
-        service = await Service.objects.aget(id=service_id)
         target_date = datetime.fromisoformat(date_str).date()
-        free_slots = await sync_to_async(get_free_slots)(service, target_date)
+        free_slots = await sync_to_async(get_free_slots)(service_id, target_date)
         if not free_slots:
             await callback.message.edit_text("❌ Bu kunda bo‘sh vaqt yo‘q.")
             return
 
         markup = make_inline_btn_azim(
             free_slots, sizes=[2],
-            data_list=[f"slot_{service.id}_{target_date}_{s.split()[0]}" for s in free_slots]
+            data_list=[f"slot_{service_id}_{target_date}_{s.split()[0]}" for s in free_slots]
         )
 
         await callback.message.edit_text(
@@ -171,26 +150,39 @@ async def process_category_callback(callback: CallbackQuery):
         end_time = (datetime.combine(target_date, start_time) + duration).time()
         user = await User.objects.aget(telegram_id=callback.from_user.id)
 
-        exists = await Booking.objects.filter(
-            service=service, date=target_date, start_time=start_time
-        ).aexists()
-        if exists:
+        try:
+            await sync_to_async(create_booking)(
+                service=service,
+                user=user,
+                weekday=target_date.strftime("%A").lower(),
+                start_time=start_time,
+                duration=duration,
+                seats=1,
+                day=target_date
+            )
+        except ValidationError:
             await callback.message.edit_text("❌ Afsuski, bu vaqt endigina band qilindi.")
             return
 
-        booking = Booking(
-            user=user,
-            service=service,
-            date=target_date,
-            weekday=target_date.strftime("%A").lower(),
-            start_time=start_time,
-            duration=duration,
-            seats=1
-        )
-        await booking.asave()
-
         await callback.message.edit_text(
             f"✅ Siz muvaffaqiyatli buyurtma qildingiz: {service.name}\n"
             f"📅 Sana: {target_date.strftime('%d-%m-%Y')}\n"
             f"🕒 Vaqt: {start_time.strftime('%H:%M')} - {end_time.strftime('%H:%M')}"
         )
+
+    else:
+        category = await ServiceCategory.objects.filter(name=callback.data).afirst()
+        if category is None:
+            return
+        services = await sync_to_async(lambda: list(category.services.all()))()
+
+        if not services:
+            await callback.message.edit_text("❌ Bu kategoriyada hozircha xizmatlar yo‘q.")
+            return
+
+        markup = build_services_markup(services, category.id, page=0)
+        await callback.message.edit_text(
+            f"✅ Siz kategoriya tanladingiz: {category.name}\nXizmatni tanlang:",
+            reply_markup=markup
+        )
+        await callback.answer()
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+
+from aiogram.exceptions import (TelegramBadRequest, TelegramForbiddenError,
+                                TelegramRetryAfter)
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from service.models import OutboxMessage
+from service.outbox import claim_batch, mark_failed, mark_sent
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES = {
+    OutboxMessage.Kind.BOOKING_CREATED: (
+        "🆕 Yangi buyurtma!\n"
+        "📌 {service}\n"
+        "📅 {date} {start_time} - {end_time}\n"
+        "👥 {seats} ta joy\n"
+        "📞 {customer}"
+    ),
+    OutboxMessage.Kind.WAITLIST_PROMOTED: (
+        "✅ Navbatingiz keldi, joy band qilindi!\n"
+        "📌 {service}\n"
+        "📅 {date} {start_time} - {end_time}\n"
+        "👥 {seats} ta joy"
+    ),
+}
+
+
+def render(message: OutboxMessage) -> str:
+    return TEMPLATES[message.kind].format(**message.payload)
+
+
+class RateLimiter:
+    """Spaces sends to ``rate`` per second overall and one per ``chat_interval`` seconds per chat."""
+    MAX_CHATS = 10000
+
+    def __init__(self, rate: float = None, chat_interval: float = None):
+        self.interval = 1 / (rate or settings.OUTBOX_RATE_LIMIT)
+        self.chat_interval = settings.OUTBOX_CHAT_INTERVAL if chat_interval is None else chat_interval
+        self.next_send = 0.0
+        self.next_chat_send = {}
+
+    async def wait(self, chat_id):
+        now = time.monotonic()
+        if len(self.next_chat_send) > self.MAX_CHATS:
+            self.next_chat_send = {chat: at for chat, at in self.next_chat_send.items() if at > now}
+        send_at = max(now, self.next_send, self.next_chat_send.get(chat_id, 0))
+        self.next_send = send_at + self.interval
+        self.next_chat_send[chat_id] = send_at + self.chat_interval
+        if send_at > now:
+            await asyncio.sleep(send_at - now)
+
+    def pause(self, seconds: float):
+        self.next_send = max(self.next_send, time.monotonic() + seconds)
+
+
+class OutboxWorker:
+    """
+    Drains the outbox in batches and sends the messages through the Telegram bot.
+
+    Messages of different chats are sent concurrently within the rate limit, failures
+    are retried with backoff and flood control replies pause the whole worker.
+    """
+
+    def __init__(self, bot, batch_size: int = None, poll_interval: float = None, limiter: RateLimiter = None):
+        self.bot = bot
+        self.batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+        self.poll_interval = settings.OUTBOX_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.limiter = limiter or RateLimiter()
+
+    async def run_once(self) -> int:
+        messages = await sync_to_async(claim_batch)(self.batch_size)
+        by_chat = defaultdict(list)
+        for message in messages:
+            by_chat[message.chat_id].append(message)
+
+        sent = await asyncio.gather(*(self._send_chat(chat_messages) for chat_messages in by_chat.values()))
+        sent_ids = [message_id for chat_sent in sent for message_id in chat_sent]
+        if sent_ids:
+            await sync_to_async(mark_sent)(sent_ids)
+        return len(messages)
+
+    async def run(self):
+        while True:
+            try:
+                count = await self.run_once()
+            except Exception:
+                logger.exception("Outbox batch failed")
+                count = 0
+            if count < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    async def _send_chat(self, messages: list[OutboxMessage]) -> list:
+        sent = []
+        for message in messages:
+            await self.limiter.wait(message.chat_id)
+            try:
+                await self.bot.send_message(message.chat_id, render(message))
+            except TelegramRetryAfter as e:
+                self.limiter.pause(e.retry_after)
+                await sync_to_async(mark_failed)(message, str(e), retry_after=e.retry_after)
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                await sync_to_async(mark_failed)(message, str(e), final=True)
+            except Exception as e:
+                logger.exception("Outbox message %s failed", message.pk)
+                await sync_to_async(mark_failed)(message, str(e))
+            else:
+                sent.append(message.pk)
+        return sent
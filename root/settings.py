@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # My Apps
     'service',
@@ -185,6 +186,10 @@ SPECTACULAR_SETTINGS = {
     'VERSION': '1.0.0',
     'SERVE_INCLUDE_SCHEMA': False,
     'COMPONENT_SPLIT_REQUEST': True,
+    'ENUM_NAME_OVERRIDES': {
+        'BookingStatusEnum': 'service.models.Booking.StatusType',
+        'WaitlistStatusEnum': 'service.models.WaitlistEntry.StatusType',
+    },
     # OTHER SETTINGS
 }
 
@@ -195,6 +200,32 @@ REDIS_DB = os.getenv('REDIS_DB')
 
 REDIS_URL = f"redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}"
 
+AVAILABILITY_CACHE_TTL = int(os.getenv('AVAILABILITY_CACHE_TTL', 600))
+HEATMAP_CACHE_TTL = int(os.getenv('HEATMAP_CACHE_TTL', 60))
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+IDEMPOTENCY_PENDING_TTL = int(os.getenv('IDEMPOTENCY_PENDING_TTL', 30))
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT', 10))
+SLOT_HOLD_TTL = int(os.getenv('SLOT_HOLD_TTL', 600))
+BOT_MARK_FULL_DAYS = os.getenv('BOT_MARK_FULL_DAYS', 'true').lower() == 'true'
+
+SERVICE_SEARCH_CONFIG = os.getenv('SERVICE_SEARCH_CONFIG', 'simple')
+
+BOOKING_SWEEP_BATCH_SIZE = int(os.getenv('BOOKING_SWEEP_BATCH_SIZE', 1000))
+BOOKING_SWEEP_INTERVAL = int(os.getenv('BOOKING_SWEEP_INTERVAL', 60))
+BOOKING_ARCHIVE_AFTER_DAYS = int(os.getenv('BOOKING_ARCHIVE_AFTER_DAYS', 180))
+BOOKING_ARCHIVE_BATCH_SIZE = int(os.getenv('BOOKING_ARCHIVE_BATCH_SIZE', 5000))
+BOOKING_PARTITIONS_AHEAD = int(os.getenv('BOOKING_PARTITIONS_AHEAD', 3))
+BOOKING_PARTITIONS_RETAIN = int(os.getenv('BOOKING_PARTITIONS_RETAIN')) if os.getenv('BOOKING_PARTITIONS_RETAIN') else None
+
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', 100))
+OUTBOX_POLL_INTERVAL = float(os.getenv('OUTBOX_POLL_INTERVAL', 1))
+OUTBOX_LEASE = int(os.getenv('OUTBOX_LEASE', 60))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 5))
+OUTBOX_RETRY_DELAY = int(os.getenv('OUTBOX_RETRY_DELAY', 30))
+# Telegram allows about 30 messages per second per bot and one per second per chat
+OUTBOX_RATE_LIMIT = float(os.getenv('OUTBOX_RATE_LIMIT', 25))
+OUTBOX_CHAT_INTERVAL = float(os.getenv('OUTBOX_CHAT_INTERVAL', 1))
+
 # Hash Password : Argon2
 
 PASSWORD_HASHERS = [